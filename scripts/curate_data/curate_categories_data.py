@@ -1,7 +1,7 @@
+import sys
 import pandas as pd
 from pathlib import Path
 import time
-from datetime import datetime
 
 ########################### SUMMARY ###########################
 '''
@@ -13,40 +13,18 @@ from datetime import datetime
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.schemas import get_read_csv_args
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
 
-
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
+storage = LocalStorage(repo_root + "/data")
 
 
 # Gets recent processed category data
 def get_processed_category_data(day_date_id, time_of_day_id):
     data_path = repo_root + f"/data/twitch_project_processed_layer/processed_categories_data/{day_date_id}/processed_categories_data_{day_date_id}_{time_of_day_id}.csv"
-    processed_category_df = pd.read_csv(data_path, keep_default_na=False)
+    processed_category_df = pd.read_csv(data_path, **get_read_csv_args("processed_categories_data", ["category_id", "category_name", "igdb_id"]))
     processed_category_df = processed_category_df[["category_id", "category_name", "igdb_id"]]
 
     return processed_category_df
@@ -56,11 +34,11 @@ def get_processed_category_data(day_date_id, time_of_day_id):
 def get_current_categories():
     data_path = repo_root + "/data/twitch_project_miscellaneous/current_data/current_categories.csv"
     try:
-        current_category_df = pd.read_csv(data_path, keep_default_na = False)
+        current_category_df = pd.read_csv(data_path, **get_read_csv_args("current_categories"))
     except FileNotFoundError: # create new categories file if it does not exist already
         with open(data_path, 'w') as f:
             f.write("category_id,igdb_id,category_name")
-        current_category_df = pd.read_csv(data_path, keep_default_na = False)
+        current_category_df = pd.read_csv(data_path, **get_read_csv_args("current_categories"))
 
     return current_category_df
 
@@ -78,8 +56,8 @@ def add_new_category_data(processed_category_df, current_category_df):
 
 
 def main():
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
 
     # Normally, these values will be passed by the event variable in the lambda function
     # day_date_id = "20260111" # test value
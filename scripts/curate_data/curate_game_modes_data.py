@@ -1,13 +1,15 @@
+import sys
 from pathlib import Path
 import pandas as pd
-import os
 
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.schemas import get_read_csv_args
 
 
 def main():
     processed_game_mode_data_path = repo_root + "/data/twitch_project_processed_layer/processed_game_modes_data/processed_game_modes_data.csv"
-    game_mode_df = pd.read_csv(processed_game_mode_data_path)
+    game_mode_df = pd.read_csv(processed_game_mode_data_path, **get_read_csv_args("processed_game_modes_data", ["game_mode_id", "game_mode_name"]))
     game_mode_df = game_mode_df[["game_mode_id", "game_mode_name"]] # Limit only to columns we need
     game_mode_df.loc[len(game_mode_df)] = ["NA", "Not Available"]
     game_mode_df.to_csv(repo_root + "/data/twitch_project_curated_layer/curated_game_modes_data/curated_game_modes_data.csv", index=False)
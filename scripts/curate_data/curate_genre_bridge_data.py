@@ -1,7 +1,7 @@
+import sys
 import pandas as pd
 from pathlib import Path
 import time
-from datetime import datetime
 
 ########################### SUMMARY ###########################
 '''
@@ -12,47 +12,24 @@ from datetime import datetime
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.schemas import get_read_csv_args
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
 
-
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
-
+storage = LocalStorage(repo_root + "/data")
 
 
 def main():
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
 
     day_date_id = "20260111" # test value
     time_of_day_id = "1645" # test value
 
     # Get processed genre bridge dataframe
     file_path = repo_root + f"/data/twitch_project_processed_layer/processed_genre_bridge_data/{day_date_id}/processed_genre_bridge_data_{day_date_id}_{time_of_day_id}.csv"
-    processed_genre_bridge_df = pd.read_csv(file_path, keep_default_na = False)
+    processed_genre_bridge_df = pd.read_csv(file_path, **get_read_csv_args("processed_genre_bridge_data", ["category_id", "genre_id"]))
 
     # Curate processed data to only include relevant data
     curated_genre_bridge_df = processed_genre_bridge_df[["category_id", "genre_id"]]
@@ -1,3 +1,4 @@
+import sys
 from pathlib import Path
 import pandas as pd
 
@@ -12,11 +13,13 @@ import pandas as pd
 
 
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.schemas import get_read_csv_args
 
 
 def main():
     processed_genre_data_path = repo_root + "/data/twitch_project_processed_layer/processed_genres_data/processed_genres_data.csv"
-    genre_df = pd.read_csv(processed_genre_data_path)
+    genre_df = pd.read_csv(processed_genre_data_path, **get_read_csv_args("processed_genres_data", ["genre_id", "genre_name"]))
     genre_df = genre_df[["genre_id", "genre_name"]] # Limit only to columns we need
     genre_df.loc[len(genre_df)] = ["NA", "Not Available"]
     genre_df.to_csv(repo_root + "/data/twitch_project_curated_layer/curated_genres_data/curated_genres_data.csv", index=False)
@@ -1,7 +1,7 @@
+import sys
 from pathlib import Path
 import pandas as pd
 import time
-import os
 
 ####################### SUMMARY #######################
 '''
@@ -13,6 +13,8 @@ import os
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.schemas import get_read_csv_args
 pd.options.mode.chained_assignment = None  # default='warn'
 
 
@@ -23,7 +25,7 @@ def main():
     time_of_day_id = "1715"
 
     processed_data_path = repo_root + f"/data/twitch_project_processed_layer/processed_streams_data/{day_date_id}/processed_streams_data_{day_date_id}_{time_of_day_id}.csv"
-    processed_stream_df = pd.read_csv(processed_data_path)
+    processed_stream_df = pd.read_csv(processed_data_path, **get_read_csv_args("processed_streams_data", ["id", "user_id", "game_id", "language", "viewer_count"]))
 
     # Limit columns to only relevant ones
     curated_stream_df = processed_stream_df[["id", "user_id", "game_id", "language", "viewer_count"]]
@@ -1,7 +1,7 @@
+import sys
 import pandas as pd
 from pathlib import Path
 import time
-from datetime import datetime
 
 ########################### SUMMARY ###########################
 '''
@@ -11,40 +11,18 @@ from datetime import datetime
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.schemas import get_read_csv_args
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
 
-
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
+storage = LocalStorage(repo_root + "/data")
 
 
 # Gets recent processed user data
 def get_processed_user_data(day_date_id, time_of_day_id):
     data_path = repo_root + f"/data/twitch_project_processed_layer/processed_users_data/{day_date_id}/processed_users_data_{day_date_id}_{time_of_day_id}.csv"
-    processed_user_df = pd.read_csv(data_path, keep_default_na=False)
+    processed_user_df = pd.read_csv(data_path, **get_read_csv_args("processed_users_data", ["id", "login", "display_name", "broadcaster_type"]))
     processed_user_df = processed_user_df[["id", "login", "display_name", "broadcaster_type"]]
 
     return processed_user_df
@@ -54,11 +32,11 @@ def get_processed_user_data(day_date_id, time_of_day_id):
 def get_user_dim_info():
     user_dim_path = repo_root + "/data/twitch_project_curated_layer/curated_users_data/curated_users_data.csv"
     try:
-        user_dim_df = pd.read_csv(user_dim_path, keep_default_na = False)
+        user_dim_df = pd.read_csv(user_dim_path, **get_read_csv_args("curated_users_data"))
     except FileNotFoundError: # create new users file if it does not exist already
         with open(user_dim_path, 'w') as f:
             f.write("user_id,user_name,login_name,broadcaster_type")
-        user_dim_df = pd.read_csv(user_dim_path, keep_default_na = False)
+        user_dim_df = pd.read_csv(user_dim_path, **get_read_csv_args("curated_users_data"))
 
     return user_dim_df
 
@@ -67,7 +45,7 @@ def get_user_dim_info():
 def get_current_users():
     current_user_path = repo_root + "/data/twitch_project_miscellaneous/current_data/current_users.csv"
     try:
-        current_user_df = pd.read_csv(current_user_path, keep_default_na = False)
+        current_user_df = pd.read_csv(current_user_path, **get_read_csv_args("current_users"))
     except FileNotFoundError: # create new current users file if it does not exist already
         current_user_df = pd.DataFrame(columns=["user_id", "user_name", "login_name", "broadcaster_type"])
 
@@ -88,8 +66,8 @@ def add_new_user_data(processed_user_df, current_user_df):
 
 
 def main():
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
 
     day_date_id = "20260111" # test
     time_of_day_id = "1715" # test
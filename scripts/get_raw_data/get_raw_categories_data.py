@@ -1,8 +1,6 @@
-import os
+import sys
 import requests
-import pandas as pd
-from zoneinfo import ZoneInfo
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 import json
 import time
@@ -18,57 +16,12 @@ import time
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
+from pipeline_core.twitch_api import get_twitch_headers
 
-
-# Gets client id and credentials
-def get_credentials():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Client-Id": f"{client_id}"
-    }
-
-    return headers
-
-
-# Gets current date id based of date when script is executed
-def get_day_date_id(current_date):
-    current_date = current_date.astimezone(ZoneInfo("US/Pacific")).replace(tzinfo=None)
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-   
-    # If later than 23:52, the day will be considered the next day
-    if current_date.hour == 23 and current_date.minute > 52:
-        current_date += timedelta(days=1)
-        day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-    else:
-        day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id(current_date):
-    current_date = current_date.astimezone(ZoneInfo("US/Pacific")).replace(tzinfo=None)
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-   
-    # If later than 23:52, next nearest time will be 00:00
-    if current_date.hour == 23 and current_date.minute > 52:
-        return "0000"
-    
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(current_date.year, current_date.month, current_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((current_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
+storage = LocalStorage(repo_root + "/data")
 
 
 # Calls the "Get Top Games" Twitch endpoint to get data on currently streamed categories
@@ -95,10 +48,10 @@ def call_get_top_games_endpoint(headers, raw_category_data):
 
 
 def main():
-    headers = get_credentials() # gets access token and client id needed to call Twitch API
+    headers = get_twitch_headers() # gets access token and client id needed to call Twitch API
     todays_date = datetime.today()
-    day_date_id = get_day_date_id(todays_date)
-    time_of_day_id = get_time_of_day_id(todays_date)
+    day_date_id = get_day_date_id(storage, todays_date)
+    time_of_day_id = get_time_of_day_id(storage, todays_date)
 
     raw_category_data = {
                     "day_date_id": day_date_id,
@@ -1,10 +1,11 @@
+import sys
 import json
-from igdb.wrapper import IGDBWrapper
-import os
 from datetime import datetime
 from pathlib import Path
 
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.igdb_api import make_wrapper
 
 ################### SUMMARY ###################
 '''
@@ -21,15 +22,6 @@ def byte_to_json(byte_array):
     return output
 
 
-# Makes IGDB wrapper to interact with IGDB API
-def make_wrapper():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    wrapper = IGDBWrapper(client_id, access_token)
-
-    return wrapper
-
-
 # Calls IGDB API to get data on all IGDB game modes
 def get_game_mode_data(wrapper):
     byte_array = wrapper.api_request(
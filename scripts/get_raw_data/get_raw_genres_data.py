@@ -1,10 +1,11 @@
+import sys
 import json
 from datetime import datetime
-from igdb.wrapper import IGDBWrapper
-import os
 from pathlib import Path
 
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.igdb_api import make_wrapper
 
 ################# SUMMARY #################
 '''
@@ -24,15 +25,6 @@ def byte_to_json(byte_array):
 
 ########## High-level functions ##########
 
-# Makes IGDB wrapper to interact with IGDB API
-def make_wrapper():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    wrapper = IGDBWrapper(client_id, access_token)
-
-    return wrapper
-
-
 # Calls IGDB API to get data on all game genres
 def get_IGDB_genre_data(wrapper):
     byte_array = wrapper.api_request(
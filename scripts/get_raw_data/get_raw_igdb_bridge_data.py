@@ -0,0 +1,80 @@
+import sys
+import argparse
+from pathlib import Path
+import time
+
+############################## SUMMARY ##############################
+'''
+    This script calls the IGDB API to get raw genre and game mode
+    data for categories in the category dimension. Local version of
+    src/get_raw_data/get_raw_igdb_bridge_data.py, which it shares the
+    IGDB requests of pipeline_core with, replacing the separate genre bridge and game
+    mode bridge scripts.
+
+    Games are read through the same persistent IGDB game cache as
+    the Lambda, kept in the local miscellaneous data directory, so
+    games already cached are not requested again. With --rebuild
+    the raw bridge data of every current category is rebuilt, which
+    runs from the cache once it has been filled.
+'''
+#####################################################################
+
+start = time.time()
+repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+sys.path.append(repo_root + "/src/get_raw_data")
+
+from pipeline_core.partitions import Partition, DataPath, raw_bucket_name, curated_bucket_name, misc_bucket_name
+from pipeline_core.storage import LocalStorage
+from pipeline_core.igdb_api import make_wrapper, get_raw_igdb_game_data
+from pipeline_core.igdb_game_cache import IGDBGameCache
+from get_raw_igdb_bridge_data import get_igdb_ids, get_raw_bridge_data, igdb_game_fields, igdb_game_cache_path, igdb_bridge_outputs
+
+storage = LocalStorage(repo_root + "/data")
+
+
+# Gets the categories to get IGDB data for, either one curated categories file or every current category
+def get_category_data(partition, rebuild):
+    if rebuild:
+        return storage.read_csv(DataPath(misc_bucket_name, "current_data/current_categories.csv"), schema="current_categories", columns=["igdb_id"])
+
+    return storage.read_csv(DataPath.for_partition(curated_bucket_name, "curated_categories_data", partition), schema="curated_categories_data", columns=["igdb_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gets raw genre and game mode bridge data from IGDB.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the bridge data of every current category")
+    args = parser.parse_args()
+
+    # Actual values will be provided by event input coming from SNS topic
+    partition = Partition("20260111", "1645") # test value
+    day_date_id, time_of_day_id = partition
+
+    category_df = get_category_data(partition, args.rebuild)
+    igdb_ids = get_igdb_ids(category_df)
+
+    # Only games that are not cached are requested from IGDB
+    wrapper = None
+    def fetch_games(missing_ids):
+        nonlocal wrapper
+        wrapper = wrapper or make_wrapper()
+        return get_raw_igdb_game_data(wrapper, missing_ids, igdb_game_fields)
+
+    igdb_game_cache = IGDBGameCache(storage, igdb_game_cache_path, igdb_game_fields)
+    games = igdb_game_cache.get_games(igdb_ids, fetch_games)
+    igdb_game_cache.save()
+
+    # Write the raw data of every bridge to its own JSON file
+    for bridge_name, field in igdb_bridge_outputs.items():
+        raw_bridge_data_dict = get_raw_bridge_data(games, field, day_date_id, time_of_day_id)
+        storage.write_json(raw_bridge_data_dict, DataPath.for_partition(raw_bucket_name, f"raw_{bridge_name}_data", partition, extension="json"), indent=4)
+
+
+
+if __name__ == "__main__":
+    main()
+
+
+end = time.time()
+duration = end - start
+print("Duration: " + str(duration))
@@ -1,17 +1,22 @@
+import sys
 import os
 import requests
 import json
 import ast
 from requests.exceptions import ConnectionError
 from pathlib import Path
-from datetime import datetime
-import pandas as pd
 import time
 import random
 
 start = time.time()
 
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
+from pipeline_core.twitch_api import get_twitch_headers
+
+storage = LocalStorage(repo_root + "/data")
 
 ###################################### SUMMARY #####################################
 '''
@@ -19,35 +24,6 @@ repo_root = str(Path(__file__).parents[2])
 '''
 ####################################################################################
 
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-    print(time_of_day_df)
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
-
-
 # Expected input would be a batch of SQS messages in JSON format
 # Obtains category data that would later be processed
 def get_categories_to_process():
@@ -62,18 +38,6 @@ def get_categories_to_process():
     return set(categories_to_process)
 
 
-# Gets client id and credentials
-def get_credentials():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Client-Id": f"{client_id}"
-    }
-
-    return headers
-
-
 # Calls Get Stream Twitch API to get stream data for specified categories
 def get_raw_stream_data_from_API(raw_stream_data, category_set, headers):
     cursor = ""
@@ -102,10 +66,10 @@ def get_raw_stream_data_from_API(raw_stream_data, category_set, headers):
 
 
 def main():
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
     categories_to_process = get_categories_to_process()
-    headers = get_credentials()
+    headers = get_twitch_headers()
 
     day_date_id = "20260111" # test value
     time_of_day_id = "1715" # test value
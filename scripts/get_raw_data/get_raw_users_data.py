@@ -1,7 +1,6 @@
-import os
+import sys
 import requests
 import pandas as pd
-from datetime import datetime
 from pathlib import Path
 import json
 import time
@@ -20,53 +19,19 @@ import time
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.schemas import get_read_csv_args
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
+from pipeline_core.twitch_api import get_twitch_headers
 
-
-# Gets client id and credentials
-def get_credentials():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Client-Id": f"{client_id}"
-    }
-
-    return headers
-
-
-# MAKE SURE TO CHANGE TO SO IT IS BASED OFF OF WHEN SCRIPT IS EXECUTED
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-# MAKE SURE TO CHANGE TO SO IT IS BASED OFF OF WHEN SCRIPT IS EXECUTED
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
+storage = LocalStorage(repo_root + "/data")
 
 
 # Gets user ids that we will potentially call the API to get data on
 def get_potential_new_users(day_date_id, time_of_day_id):
     curated_stream_data_path = repo_root + f"/data/twitch_project_curated_layer/curated_streams_data/{day_date_id}/curated_stream_data_{day_date_id}_{time_of_day_id}.csv"
-    stream_df = pd.read_csv(curated_stream_data_path, dtype={"user_id": "string"})
+    stream_df = pd.read_csv(curated_stream_data_path, **get_read_csv_args("curated_streams_data", ["user_id"]))
     user_list = list(set(stream_df["user_id"].tolist()))
 
     return user_list
@@ -77,7 +42,7 @@ def get_potential_new_users(day_date_id, time_of_day_id):
 def get_current_users():
     current_user_data_path = repo_root + f"/data/twitch_project_miscellaneous/current_data/current_users.csv"
     try:
-        current_user_df = pd.read_csv(current_user_data_path, index_col=False, dtype={"user_id": "string", "user_name": "string", "login_name": "string", "broadcaster_type": "string"})
+        current_user_df = pd.read_csv(current_user_data_path, **get_read_csv_args("current_users", ["user_id"]))
         current_users = list(set(current_user_df["user_id"].tolist()))
     except FileNotFoundError:
         current_users = []
@@ -114,9 +79,9 @@ def get_data_from_API(user_list, raw_user_data, headers):
 
 
 def main():
-    headers = get_credentials()
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    headers = get_twitch_headers()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
 
     # Actual values will come from lambda function's event which will come from SNS topic
     day_date_id = "20260111" # test
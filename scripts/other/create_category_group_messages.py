@@ -1,8 +1,7 @@
+import sys
 import pandas as pd
 from pathlib import Path
-import time
 import numpy as np
-from datetime import datetime
 
 
 # This script triggers once processed_categories is uploaded
@@ -24,34 +23,12 @@ from datetime import datetime
 ###########################################################
 
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.schemas import get_read_csv_args
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
 
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
-
+storage = LocalStorage(repo_root + "/data")
 
 # Split categories into equal groups in terms of their number of channels/streamers using greedy algorithm
 def split_categories_into_groups(weighted_category_df): 
@@ -82,21 +59,21 @@ def split_categories_into_groups(weighted_category_df):
 
 
 def main():
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
 
     day_date_id = "20260111" # testing value
     time_of_day_id = "1645" # testing value
 
     # Get current streamed categories based off of processed_categories file
     processed_category_data_path = repo_root + f"/data/twitch_project_processed_layer/processed_categories_data/{day_date_id}/processed_categories_data_{day_date_id}_{time_of_day_id}.csv"
-    curr_streamed_categories_df = pd.read_csv(processed_category_data_path, keep_default_na=False)
+    curr_streamed_categories_df = pd.read_csv(processed_category_data_path, **get_read_csv_args("processed_categories_data", ["category_id", "category_name"]))
     
     # Check if popularity data exists or not
     popularity_data_exists = False
     category_popularity_df = ""
     try:
-        category_popularity_df = pd.read_csv(repo_root + "/data/twitch_project_miscellaneous/category_popularity_data/category_popularity_data.csv")
+        category_popularity_df = pd.read_csv(repo_root + "/data/twitch_project_miscellaneous/category_popularity_data/category_popularity_data.csv", **get_read_csv_args("category_popularity_data"))
         popularity_data_exists = True
     except FileNotFoundError:
         popularity_data_exists = False
@@ -109,7 +86,7 @@ def main():
         category_groups, wvg = split_categories_into_groups(merged_df)
     else: # if no recent category popularity data found, use default popularity data
         default_popularity_path = repo_root + "/data/twitch_project_miscellaneous/category_popularity_data/default_category_weights.csv"
-        default_pop_df = pd.read_csv(default_popularity_path)
+        default_pop_df = pd.read_csv(default_popularity_path, **get_read_csv_args("default_category_weights"))
         category_pop_df = pd.concat([curr_streamed_categories_df, default_pop_df], axis=1)
         category_pop_df = category_pop_df[["category_id", "category_name", "num_of_streamers"]].fillna(1)
         category_groups, wvg = split_categories_into_groups(category_pop_df)
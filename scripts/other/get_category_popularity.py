@@ -1,7 +1,6 @@
+import sys
 import pandas as pd
-from datetime import datetime
 from pathlib import Path
-import json
 import time
 
 ################################# SUMMARY #################################
@@ -13,13 +12,15 @@ import time
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.schemas import get_read_csv_args
 
 
 def main():
     day_date_id = "20251230" # test value, event input should provide this
     time_of_day_id = "1330" # test value, event input should provide this
 
-    curated_stream_df = pd.read_csv(repo_root + f"/data/twitch_project_curated_layer/curated_streams_data/{day_date_id}/curated_stream_data_{day_date_id}_{time_of_day_id}.csv")
+    curated_stream_df = pd.read_csv(repo_root + f"/data/twitch_project_curated_layer/curated_streams_data/{day_date_id}/curated_stream_data_{day_date_id}_{time_of_day_id}.csv", **get_read_csv_args("curated_streams_data", ["stream_id", "category_id"]))
     category_popularity_df = curated_stream_df.groupby(["category_id"], as_index=False).agg(
                                         category_id=('category_id', 'first'),
                                         num_of_streamers=('stream_id', 'count')
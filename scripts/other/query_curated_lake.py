@@ -0,0 +1,156 @@
+import sys
+import argparse
+from datetime import datetime
+from pathlib import Path
+import duckdb
+
+################################# SUMMARY #################################
+'''
+    This script runs SQL queries with DuckDB directly over the curated
+    layer, either the local data directory or the S3 buckets. The stream
+    fact data and every dimension are registered as views named after
+    the PostgreSQL tables, including the users and categories history
+    tables, so the same dashboard queries can be run
+    without touching the database. Only the day_date_id folders in the
+    requested date range are read for the streams view.
+
+    Example:
+        python query_curated_lake.py --start 20260111 --end 20260111 \\
+            --query "SELECT category_id, SUM(hours_watched) FROM streams GROUP BY 1 ORDER BY 2 DESC LIMIT 10"
+'''
+###########################################################################
+
+repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.dates import get_day_date_ids
+
+default_curated_root = repo_root + "/data/twitch_project_curated_layer"
+default_raw_root = repo_root + "/data/twitch_project_raw_layer"
+
+
+# Column types of every view, IDs are kept as strings to match the PostgreSQL schema
+streams_columns = {
+    "stream_id": "VARCHAR",
+    "day_date_id": "VARCHAR",
+    "time_of_day_id": "VARCHAR",
+    "user_id": "VARCHAR",
+    "category_id": "VARCHAR",
+    "language_id": "VARCHAR",
+    "viewer_count": "INTEGER",
+    "hours_watched": "DOUBLE"
+}
+
+# View name, which layer it comes from, file pattern under that layer and column types
+dimension_views = {
+    "genre_bridge": ("curated", "curated_genre_bridge_data/*/*.csv", {"category_id": "VARCHAR", "genre_id": "VARCHAR"}),
+    "game_mode_bridge": ("curated", "curated_game_mode_bridge_data/*/*.csv", {"category_id": "VARCHAR", "game_mode_id": "VARCHAR"}),
+    "genres": ("curated", "curated_genres_data/*.csv", {"genre_id": "VARCHAR", "genre_name": "VARCHAR"}),
+    "game_modes": ("curated", "curated_game_modes_data/*.csv", {"game_mode_id": "VARCHAR", "game_mode_name": "VARCHAR"}),
+    "languages": ("raw", "raw_languages_data/*.csv", {"language_id": "VARCHAR", "language_name": "VARCHAR"}),
+    "day_dates": ("raw", "raw_day_dates_data/*.csv", {
+        "day_date_id": "VARCHAR", "the_date": "DATE", "date_MMDDYYYY": "VARCHAR", "day_of_week": "VARCHAR", "month": "VARCHAR",
+        "day": "VARCHAR", "year": "VARCHAR", "month_name": "VARCHAR", "month_abbrev": "VARCHAR", "year_YY": "VARCHAR"
+    }),
+    "time_of_day": ("raw", "raw_time_of_day_data/*.csv", {
+        "time_of_day_id": "VARCHAR", "time_24h": "TIME", "time_12h": "VARCHAR", "hour": "INTEGER",
+        "minute": "INTEGER", "AM_PM": "VARCHAR", "part_of_day": "VARCHAR"
+    })
+}
+
+# Dimensions curated as type 2 history rows, view name, file pattern under the curated layer, id column and column types
+history_views = {
+    "categories": ("curated_categories_data/*/*.csv", "category_id", {"category_id": "VARCHAR", "category_name": "VARCHAR", "igdb_id": "VARCHAR", "valid_from": "TIMESTAMP"}),
+    "users": ("curated_users_data/*/*.csv", "user_id", {"user_id": "VARCHAR", "user_name": "VARCHAR", "login_name": "VARCHAR", "broadcaster_type": "VARCHAR", "valid_from": "TIMESTAMP"})
+}
+
+
+# Lists files matching a glob pattern, works for both local paths and s3:// paths
+def list_files(con, pattern):
+    return [row[0] for row in con.execute("SELECT file FROM glob(?)", [pattern]).fetchall()]
+
+
+# Creates a view over a list of CSV files, or an empty view with the same columns if there are no files
+def create_csv_view(con, view_name, files, columns):
+    if files:
+        file_list = ", ".join(f"'{file}'" for file in files)
+        column_types = ", ".join(f"'{name}': '{data_type}'" for name, data_type in columns.items())
+        con.execute(f'''
+            CREATE OR REPLACE VIEW {view_name} AS
+            SELECT * FROM read_csv([{file_list}], header = true, columns = {{{column_types}}}, nullstr = '')
+        ''')
+    else:
+        empty_columns = ", ".join(f'NULL::{data_type} AS "{name}"' for name, data_type in columns.items())
+        con.execute(f"CREATE OR REPLACE VIEW {view_name} AS SELECT {empty_columns} WHERE false")
+
+
+# Creates a history view with valid_to filled in from the next version of each entity, and a view of the latest versions
+# Files curated before the history was kept have no valid_from column, so columns are matched by name instead of position
+def create_history_views(con, view_name, files, id_column, columns):
+    empty_columns = ", ".join(f'NULL::VARCHAR AS "{name}"' for name in columns)
+    source = f"SELECT {empty_columns} WHERE false"
+    if files:
+        file_list = ", ".join(f"'{file}'" for file in files)
+        source += f" UNION ALL BY NAME SELECT * FROM read_csv([{file_list}], header = true, union_by_name = true, all_varchar = true, nullstr = '')"
+    typed_columns = ", ".join(f'CAST("{name}" AS {data_type}) AS "{name}"' for name, data_type in columns.items())
+
+    con.execute(f'''
+        CREATE OR REPLACE VIEW {view_name}_history AS
+        SELECT *, LEAD(valid_from) OVER (PARTITION BY {id_column} ORDER BY valid_from NULLS FIRST) AS valid_to
+        FROM (SELECT {typed_columns} FROM ({source}))
+    ''')
+    con.execute(f"CREATE OR REPLACE VIEW {view_name} AS SELECT * EXCLUDE (valid_from, valid_to) FROM {view_name}_history WHERE valid_to IS NULL")
+
+
+# Gets the streams files to read, only listing the day_date_id folders within the date range
+def get_stream_files(con, curated_root, start_day_date_id, end_day_date_id):
+    if start_day_date_id is None and end_day_date_id is None:
+        return list_files(con, f"{curated_root}/curated_streams_data/*/*.csv")
+
+    start_day_date_id = start_day_date_id or "20250101"
+    end_day_date_id = end_day_date_id or datetime.today().strftime("%Y%m%d")
+    stream_files = []
+    for day_date_id in get_day_date_ids(start_day_date_id, end_day_date_id):
+        stream_files.extend(list_files(con, f"{curated_root}/curated_streams_data/{day_date_id}/*.csv"))
+
+    return stream_files
+
+
+# Opens a DuckDB connection with the streams fact and all dimensions registered as views
+# Roots can be local directories or S3 prefixes such as "s3://twitch-project-curated-layer"
+def connect_curated_lake(curated_root=default_curated_root, raw_root=default_raw_root, start_day_date_id=None, end_day_date_id=None, database=":memory:"):
+    con = duckdb.connect(database)
+    if curated_root.startswith("s3://") or raw_root.startswith("s3://"):
+        con.execute("INSTALL httpfs; LOAD httpfs;")
+        con.execute("CREATE OR REPLACE SECRET curated_lake (TYPE s3, PROVIDER credential_chain, REGION 'us-west-2');")
+
+    stream_files = get_stream_files(con, curated_root, start_day_date_id, end_day_date_id)
+    create_csv_view(con, "streams", stream_files, streams_columns)
+
+    for view_name, (layer, pattern, columns) in dimension_views.items():
+        root = curated_root if layer == "curated" else raw_root
+        create_csv_view(con, view_name, list_files(con, f"{root}/{pattern}"), columns)
+
+    for view_name, (pattern, id_column, columns) in history_views.items():
+        create_history_views(con, view_name, list_files(con, f"{curated_root}/{pattern}"), id_column, columns)
+
+    print(f"Registered streams view over {len(stream_files)} files.")
+
+    return con
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs a SQL query with DuckDB over the curated layer.")
+    parser.add_argument("--query", required=True, help="SQL query to run against the registered views")
+    parser.add_argument("--start", default=None, help="First day_date_id of stream data to read, e.g. 20260111")
+    parser.add_argument("--end", default=None, help="Last day_date_id of stream data to read, e.g. 20260117")
+    parser.add_argument("--curated-root", default=default_curated_root, help="Local curated layer directory or S3 prefix")
+    parser.add_argument("--raw-root", default=default_raw_root, help="Local raw layer directory or S3 prefix, used for the static dimensions")
+    args = parser.parse_args()
+
+    con = connect_curated_lake(args.curated_root, args.raw_root, args.start, args.end)
+    con.sql(args.query).show()
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
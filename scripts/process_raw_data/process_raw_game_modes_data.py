@@ -1,5 +1,5 @@
+import sys
 import pandas as pd
-from datetime import datetime
 from pathlib import Path
 import json
 import time
@@ -13,47 +13,25 @@ import time
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.schemas import get_read_csv_args
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
 
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})     
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
-
+storage = LocalStorage(repo_root + "/data")
 
 # Gets category id associated with IGDB ID
 def get_associated_category_id(category_df, igdb_id):
     category_row = category_df[category_df["igdb_id"] == str(igdb_id)]
-    category_id = str(category_row["category_id"].iloc[0].item())
+    category_id = category_row["category_id"].iloc[0]
 
     return category_id
 
 
 
 def main():
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
 
     day_date_id = "20260111" # test value
     time_of_day_id = "1645" # test value
@@ -62,7 +40,7 @@ def main():
 
     # Access category dimension data
     curated_categories_path = repo_root + f"/data/twitch_project_curated_layer/curated_categories_data/{day_date_id}/curated_categories_data_{day_date_id}_{time_of_day_id}.csv"
-    category_df = pd.read_csv(curated_categories_path, keep_default_na=False)
+    category_df = pd.read_csv(curated_categories_path, **get_read_csv_args("curated_categories_data", ["category_id", "igdb_id"]))
 
     # Access raw category data
     with open(raw_game_mode_bridge_data_path, 'r') as f:
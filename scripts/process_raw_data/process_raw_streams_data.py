@@ -1,5 +1,5 @@
+import sys
 import pandas as pd
-from datetime import datetime
 from pathlib import Path
 import json
 import time
@@ -9,40 +9,23 @@ import os
 '''
     This script processes the raw stream data by combining the JSON files
     into one big CSV file. Slight modifications will be made to columns
-    and some values.
+    and some values. Category ids and names and languages are interned
+    and kept as categoricals, and thumbnail URLs are rebuilt from the
+    user login when the CSV is written.
 '''
 ###########################################################################
 
 start = time.time()
 repo_root = str(Path(__file__).parents[2])
+sys.path.append(repo_root + "/src")
+from pipeline_core.storage import LocalStorage
+from pipeline_core.dates import get_day_date_id, get_time_of_day_id
 
-# Gets current date id based of date when script is executed
-def get_day_date_id():
-    # Gets date id
-    date_dim_path = repo_root + "/data/twitch_project_raw_layer/raw_day_dates_data/raw_day_dates_data.csv"
-    date_df = pd.read_csv(date_dim_path)
-    current_date = datetime.today()
-    day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id():
-    time_of_day_df = pd.read_csv(repo_root + "/data/twitch_project_raw_layer/raw_time_of_day_data/raw_time_of_day_data.csv", dtype={"time_of_day_id": str})
-    cur_date = datetime.today()
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(cur_date.year, cur_date.month, cur_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((cur_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
+storage = LocalStorage(repo_root + "/data")
 
+# Twitch gives the thumbnail URL of a live stream as https://static-cdn.jtvnw.net/previews-ttv/live_user_{user_login}-{width}x{height}.jpg
+thumbnail_url_prefix = "https://static-cdn.jtvnw.net/previews-ttv/live_user_"
+thumbnail_url_suffix = "-{width}x{height}.jpg"
 
 # Checks if string can be valid number or not
 def is_integer(s):
@@ -61,6 +44,10 @@ def process_language_id(language_id):
         return language_id
 
 
+# Gets the thumbnail URL of a live stream from the user's login
+def get_thumbnail_url(user_login):
+    return f"{thumbnail_url_prefix}{user_login}{thumbnail_url_suffix}"
+
 
 # Converts the raw stream data in JSON format to a dataframe
 # Removes some data since it wouldn't fit in tabular format
@@ -74,19 +61,21 @@ def process_raw_stream_data(raw_stream_data, processed_stream_data_dict):
             continue
         processed_stream_data_dict["user_login"].append(stream["user_login"])
         processed_stream_data_dict["user_name"].append(stream["user_name"])
-        processed_stream_data_dict["game_id"].append(stream["game_id"])
-        processed_stream_data_dict["game_name"].append(stream["game_name"])
+        processed_stream_data_dict["game_id"].append(sys.intern(stream["game_id"]))
+        processed_stream_data_dict["game_name"].append(sys.intern(stream["game_name"]))
         processed_stream_data_dict["title"].append(stream["title"])
         processed_stream_data_dict["viewer_count"].append(stream["viewer_count"])
         processed_stream_data_dict["started_at"].append(stream["started_at"])
-        processed_stream_data_dict["language"].append(process_language_id(stream["language"]))
-        processed_stream_data_dict["thumbnail_url"].append(stream["thumbnail_url"])
+        processed_stream_data_dict["language"].append(sys.intern(process_language_id(stream["language"])))
+        # Only thumbnail URLs that do not follow the template are kept
+        thumbnail_url = stream["thumbnail_url"]
+        processed_stream_data_dict["thumbnail_url"].append(None if thumbnail_url == get_thumbnail_url(stream["user_login"]) else thumbnail_url)
         processed_stream_data_dict["is_mature"].append(stream["is_mature"])
 
 
 def main():
-    day_date_id = get_day_date_id()
-    time_of_day_id = get_time_of_day_id()
+    day_date_id = get_day_date_id(storage)
+    time_of_day_id = get_time_of_day_id(storage)
 
     day_date_id = "20260117"
     time_of_day_id = "1200"
@@ -118,6 +107,10 @@ def main():
 
     # Drop duplicate streams
     processed_stream_df = pd.DataFrame(processed_stream_data_dict).drop_duplicates(subset=["id"], keep="first")
+    processed_stream_df = processed_stream_df.astype({"game_id": "category", "game_name": "category", "language": "category"})
+
+    # Rebuild the thumbnail URLs that follow the template
+    processed_stream_df["thumbnail_url"] = processed_stream_df["thumbnail_url"].fillna(processed_stream_df["user_login"].map(get_thumbnail_url))
 
     # Upload CSV to processed layer
     processed_category_file_path = Path(repo_root + f"/data/twitch_project_processed_layer/processed_streams_data/{day_date_id}/processed_streams_data_{day_date_id}_{time_of_day_id}.csv")
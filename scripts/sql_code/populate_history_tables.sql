@@ -0,0 +1,16 @@
+-- One time population of the history tables from the existing users and categories data
+-- The first seen version of every entity has no known start, so it is valid from -infinity
+-- After this runs, insert_data_to_db adds a new version every time an entity changes
+BEGIN;
+
+INSERT INTO users_history (user_id, user_name, login_name, broadcaster_type, valid_from)
+SELECT user_id, user_name, login_name, broadcaster_type, '-infinity'
+FROM users
+ON CONFLICT (user_id, valid_from) DO NOTHING;
+
+INSERT INTO categories_history (category_id, category_name, igdb_id, valid_from)
+SELECT category_id, category_name, igdb_id, '-infinity'
+FROM categories
+ON CONFLICT (category_id, valid_from) DO NOTHING;
+
+COMMIT;
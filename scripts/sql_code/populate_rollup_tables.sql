@@ -0,0 +1,33 @@
+-- One time population of the rollup tables from the existing streams data
+-- After this runs, insert_data_to_db keeps the rollups up to date one interval at a time
+BEGIN;
+
+TRUNCATE category_interval_rollup, category_daily_rollup, genre_daily_rollup, game_mode_daily_rollup;
+
+INSERT INTO category_interval_rollup (category_id, language_id, day_date_id, time_of_day_id, stream_count, viewer_count, peak_viewer_count, hours_watched)
+SELECT category_id, language_id, day_date_id, time_of_day_id, COUNT(*), SUM(viewer_count), MAX(viewer_count), SUM(hours_watched)
+FROM streams
+GROUP BY category_id, language_id, day_date_id, time_of_day_id;
+
+INSERT INTO category_daily_rollup (category_id, day_date_id, stream_intervals, peak_viewer_count, hours_watched)
+SELECT category_id, day_date_id, SUM(stream_count), MAX(viewer_count), SUM(hours_watched)
+FROM (
+  SELECT category_id, day_date_id, time_of_day_id, SUM(stream_count) AS stream_count, SUM(viewer_count) AS viewer_count, SUM(hours_watched) AS hours_watched
+  FROM category_interval_rollup
+  GROUP BY category_id, day_date_id, time_of_day_id
+) i
+GROUP BY category_id, day_date_id;
+
+INSERT INTO genre_daily_rollup (genre_id, day_date_id, stream_intervals, hours_watched)
+SELECT gb.genre_id, c.day_date_id, SUM(c.stream_intervals), SUM(c.hours_watched)
+FROM category_daily_rollup c
+JOIN (SELECT DISTINCT category_id, genre_id FROM genre_bridge) gb ON gb.category_id = c.category_id
+GROUP BY gb.genre_id, c.day_date_id;
+
+INSERT INTO game_mode_daily_rollup (game_mode_id, day_date_id, stream_intervals, hours_watched)
+SELECT gmb.game_mode_id, c.day_date_id, SUM(c.stream_intervals), SUM(c.hours_watched)
+FROM category_daily_rollup c
+JOIN (SELECT DISTINCT category_id, game_mode_id FROM game_mode_bridge) gmb ON gmb.category_id = c.category_id
+GROUP BY gmb.game_mode_id, c.day_date_id;
+
+COMMIT;
@@ -0,0 +1,13 @@
+-- Access path indexes for the dashboard queries on the streams table
+-- Built concurrently so they can be created on a live database, run outside of a transaction block
+-- src/other/manage_streams_indexes.py builds the same indexes after bulk loads
+
+-- Stream data is appended in day order, so a BRIN index covers date range filters at a fraction of the size of a b-tree
+CREATE INDEX CONCURRENTLY IF NOT EXISTS streams_day_date_id_brin ON streams USING brin (day_date_id);
+
+-- Category filters over a date range can be answered from the index alone
+CREATE INDEX CONCURRENTLY IF NOT EXISTS streams_category_id_day_date_id_idx ON streams (category_id, day_date_id) INCLUDE (viewer_count, hours_watched);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS streams_user_id_idx ON streams (user_id);
+
+ANALYZE streams;
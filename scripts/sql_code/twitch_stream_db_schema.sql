@@ -34,6 +34,27 @@ CREATE TABLE "categories" (
   "category_name" varchar
 );
 
+-- Type 2 history of the users and categories dimensions
+-- Every version of an entity is kept, the current version has a NULL valid_to
+CREATE TABLE "users_history" (
+  "user_id" varchar,
+  "user_name" varchar,
+  "login_name" varchar,
+  "broadcaster_type" varchar,
+  "valid_from" timestamp,
+  "valid_to" timestamp,
+  PRIMARY KEY (user_id, valid_from)
+);
+
+CREATE TABLE "categories_history" (
+  "category_id" varchar,
+  "category_name" varchar,
+  "igdb_id" varchar,
+  "valid_from" timestamp,
+  "valid_to" timestamp,
+  PRIMARY KEY (category_id, valid_from)
+);
+
 CREATE TABLE "genres" (
   "genre_id" varchar PRIMARY KEY,
   "genre_name" varchar
@@ -70,3 +91,43 @@ CREATE TABLE "streams" (
   "hours_watched" float,
   PRIMARY KEY (stream_id, day_date_id, time_of_day_id)
 );
+
+
+-- Pre-aggregated rollup tables used by the Quicksight dashboards
+-- Kept up to date by insert_data_to_db every time a curated streams file is loaded
+CREATE TABLE "category_interval_rollup" (
+  "category_id" varchar,
+  "language_id" varchar,
+  "day_date_id" varchar(8) REFERENCES day_dates(day_date_id),
+  "time_of_day_id" varchar(4) REFERENCES time_of_day(time_of_day_id),
+  "stream_count" int,
+  "viewer_count" bigint,
+  "peak_viewer_count" int,
+  "hours_watched" float,
+  PRIMARY KEY (category_id, language_id, day_date_id, time_of_day_id)
+);
+
+CREATE TABLE "category_daily_rollup" (
+  "category_id" varchar,
+  "day_date_id" varchar(8) REFERENCES day_dates(day_date_id),
+  "stream_intervals" int,
+  "peak_viewer_count" int,
+  "hours_watched" float,
+  PRIMARY KEY (category_id, day_date_id)
+);
+
+CREATE TABLE "genre_daily_rollup" (
+  "genre_id" varchar REFERENCES genres(genre_id),
+  "day_date_id" varchar(8) REFERENCES day_dates(day_date_id),
+  "stream_intervals" int,
+  "hours_watched" float,
+  PRIMARY KEY (genre_id, day_date_id)
+);
+
+CREATE TABLE "game_mode_daily_rollup" (
+  "game_mode_id" varchar REFERENCES game_modes(game_mode_id),
+  "day_date_id" varchar(8) REFERENCES day_dates(day_date_id),
+  "stream_intervals" int,
+  "hours_watched" float,
+  PRIMARY KEY (game_mode_id, day_date_id)
+);
@@ -1,104 +1,118 @@
 import pandas as pd
-import boto3
-import awswrangler as wr
-import json
-import ast
+from pipeline_core.partitions import DataPath, curated_bucket_name, misc_bucket_name
+from pipeline_core.storage import S3Storage, WriteConflictError, max_write_attempts
+from pipeline_core.scd2_dimension import apply_scd2_changes
+from pipeline_core.dates import get_valid_from
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
 
 ########################### SUMMARY ###########################
 '''
     Updates the current category dimension CSV file. Looks
     through most recently collected current category data
     and adds categories not already present in the data.
+    Categories whose name or IGDB id changed are updated as
+    well. New and changed categories are written to the
+    curated layer as type 2 history rows with the time they
+    became valid, using pipeline_core.scd2_dimension.
+
+    New categories are written to the regular curated file and
+    changed categories to a file with a "_changed" suffix, like
+    the "_refresh" rows of refresh_stale_dimension_data. Both
+    start the collection of IGDB bridge data, which replaces the
+    bridge rows of changed categories in case their IGDB id
+    changed.
+
+    refresh_stale_dimension_data also rewrites the current
+    categories, so they are written back only if they did not
+    change since they were read, otherwise the update is done
+    again.
 '''
 ###############################################################
 
 
+current_categories_path = DataPath(misc_bucket_name, "current_data/current_categories.csv")
+
+storage = S3Storage()
+
+
 # Gets recent processed category data
-def get_processed_category_data(s3_client, bucket_name, file_key):
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        print(f"Successful S3 get_object response for the processed category data. Status - {status}")
-        processed_category_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-        processed_category_df = processed_category_df[["category_id", "category_name", "igdb_id"]] 
-    else:
-        print(f"Unsuccessful S3 get_object response for the category dimension. Status - {status}")
-        print(response)
-        exit()
-
-    return processed_category_df
-
-
-# Gets categories we already have data for
-def get_current_categories(s3_client):
-    try:
-        response = s3_client.get_object(Bucket="twitch-project-miscellaneous", Key="current_data/current_categories.csv")
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the current category data. Status - {status}")
-            current_category_df = pd.read_csv(response.get("Body"), keep_default_na = False)           
-    except Exception as e: # if  category data does not exist yet, error will be returned which we will catch
-        if "NoSuchKey" in str(e): # if error is due to category data not existing, create new category data
-            current_category_df = pd.DataFrame(columns=["category_id", "category_name", "igdb_id"])
-        else:
-            print("Unsuccessful S3 get_object response for the category data.")
-            print(response)
-            exit()
-
-    return current_category_df
-
-
-# Adds new category data from processed category data to the current category data
-# Also returns dataframe filled with new categories not seen before to the curated layer to be uploaded to postgres
-def add_new_category_data(processed_category_df, current_category_df):
-    new_current_category_df = pd.concat([current_category_df, processed_category_df]).drop_duplicates(subset=["category_id"], keep="first").reset_index()
-    new_current_category_df = new_current_category_df[["category_id", "category_name", "igdb_id"]]
-
-    # New additional categories are curated categories
-    additional_categories_df = pd.concat([new_current_category_df.drop_duplicates(), current_category_df.drop_duplicates()]).drop_duplicates(keep=False).reset_index(drop=True)
-
-    return new_current_category_df, additional_categories_df
+def get_processed_category_data(storage, processed_categories_path):
+    return storage.read_csv(processed_categories_path, schema="processed_categories_data", columns=["category_id", "category_name", "igdb_id"])
+
+
+# Gets categories we already have data for and the version to write them back with
+def get_current_categories(storage):
+    current_category_df, version = storage.read_csv_with_version(current_categories_path, schema="current_categories")
+    if current_category_df is None: # if category data does not exist yet, create new category data
+        current_category_df = pd.DataFrame(columns=["category_id", "category_name", "igdb_id"])
+
+    return current_category_df, version
+
+
+# Writes curated category rows, unless the same rows were already written by an earlier attempt of this invocation
+# Rewriting a file would start the bridge stage for its categories again
+def write_curated_categories(storage, curated_df, curated_path, written_dfs):
+    curated_df = curated_df.reset_index(drop=True)
+    if curated_path in written_dfs and written_dfs[curated_path].equals(curated_df):
+        return
+    storage.write_csv(curated_df, curated_path, schema="curated_categories_data")
+    written_dfs[curated_path] = curated_df
+
+
+# Id and attribute columns compared to find new and changed categories
+category_id_column = "category_id"
+category_attribute_columns = ["category_name", "igdb_id"]
 
 
+@metrics.instrument
 def lambda_handler(event, context):
-    event_notification = ast.literal_eval(event["Records"][0]["Sns"]["Message"])
-    processed_categories_bucket_name = event_notification["Records"][0]["s3"]["bucket"]["name"]
-    processed_categories_key = event_notification["Records"][0]["s3"]["object"]["key"]
-    day_date_id = processed_categories_key.split("/")[1]
-    time_of_day_id = processed_categories_key.split("/")[2].split("_")[4][:4]
-    
-    s3_client = boto3.client("s3")
+    processed_categories_path = DataPath.from_sns_event(event)
+    partition = processed_categories_path.partition
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
 
     # Gets recent processed category data
-    processed_category_df = get_processed_category_data(s3_client, processed_categories_bucket_name, processed_categories_key)
-
-    # Gets categories we currently already have data for
-    current_category_df = get_current_categories(s3_client)
-
-    # Curated category data contains new category data to be uploaded to postgres
-    # Current categories is updated
-    current_categories_df, curated_category_dim_df = add_new_category_data(processed_category_df, current_category_df)
-
-    if curated_category_dim_df.empty:
-        print("No new categories added to category dimension data.")
-        return {
-            'statusCode': 200,
-            'body': "No new categories added to category dimension data."
-        }
-
-    # Upload new additional categories CSV to curated layer in S3
-    wr.s3.to_csv(
-        df=curated_category_dim_df,
-        path=f"s3://twitch-project-curated-layer/curated_categories_data/{day_date_id}/curated_categories_data_{day_date_id}_{time_of_day_id}.csv",
-        index=False
-    )
-
-    # Updates current categories we have data for
-    wr.s3.to_csv(
-        df=current_categories_df,
-        path=f"s3://twitch-project-miscellaneous/current_data/current_categories.csv",
-        index=False
-    )
+    processed_category_df = get_processed_category_data(storage, processed_categories_path)
+
+    metrics.count("rows_in", len(processed_category_df))
+    written_dfs = {}
+    for attempt in range(1, max_write_attempts + 1):
+        # Gets categories we currently already have data for
+        current_category_df, current_categories_version = get_current_categories(storage)
+
+        # Curated category data contains new and changed categories to be uploaded to postgres
+        # Current categories is updated
+        current_category_ids = current_category_df["category_id"].to_numpy()
+        with metrics.span("scd2"):
+            current_categories_df, curated_category_dim_df = apply_scd2_changes(current_category_df, processed_category_df, category_id_column, category_attribute_columns, get_valid_from(day_date_id, time_of_day_id))
+        record_dataframes("scd2", processed_categories=processed_category_df, current_categories=current_categories_df, curated_categories=curated_category_dim_df)
+
+        if curated_category_dim_df.empty:
+            metrics.count("rows_out", 0)
+            print("No new or changed categories for category dimension data.")
+            return {
+                'statusCode': 200,
+                'body': "No new or changed categories for category dimension data."
+            }
+
+        # Upload new and changed categories CSVs to curated layer in S3
+        # A retry only overwrites a file whose rows changed, loading the same history rows again does not change the database
+        is_new = ~curated_category_dim_df["category_id"].isin(current_category_ids)
+        if is_new.any():
+            write_curated_categories(storage, curated_category_dim_df[is_new], DataPath.for_partition(curated_bucket_name, "curated_categories_data", partition), written_dfs)
+        if not is_new.all():
+            write_curated_categories(storage, curated_category_dim_df[~is_new], DataPath.for_partition(curated_bucket_name, "curated_categories_data", partition, suffix="_changed"), written_dfs)
+
+        # Updates current categories we have data for, unless another function updated them since they were read
+        try:
+            storage.write_csv(current_categories_df, current_categories_path, schema="current_categories", expected_version=current_categories_version)
+            break
+        except WriteConflictError:
+            if attempt == max_write_attempts:
+                raise
+            print("Current categories were updated by another function, updating them again.")
+    metrics.count("rows_out", len(curated_category_dim_df))
    
     return {
         'statusCode': 200,
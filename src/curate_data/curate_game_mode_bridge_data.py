@@ -1,7 +1,8 @@
 import pandas as pd
-import boto3
-import awswrangler as wr
-import time
+from pipeline_core.partitions import DataPath, curated_bucket_name
+from pipeline_core.storage import S3Storage, ObjectNotFoundError
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
 
 ########################### SUMMARY ###########################
 '''
@@ -12,36 +13,21 @@ import time
 ###############################################################
 
 
-# Gets recent processed game_mode bridge dimension data and limits it to relevant columns
-def get_processed_game_mode_bridge_data(s3_client, bucket_name, file_key):
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        print(f"Successful S3 get_object response for the processed game_mode bridge data. Status - {status}")
-        processed_game_mode_bridge_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-    else:
-        print(f"Unsuccessful S3 get_object response for the game_mode bridge dimension. Status - {status}")
-        print(response)
-        exit()
+curated_game_mode_bridge_dim_path = DataPath(curated_bucket_name, "curated_game_mode_bridge_data/curated_game_mode_bridge_data.csv")
+
+storage = S3Storage()
 
-    return processed_game_mode_bridge_df
+
+# Gets recent processed game_mode bridge dimension data and limits it to relevant columns
+def get_processed_game_mode_bridge_data(storage, processed_game_mode_bridge_path):
+    return storage.read_csv(processed_game_mode_bridge_path, schema="processed_game_mode_bridge_data", columns=["category_id", "game_mode_id"])
 
 
 # Gets current game_mode bridge dim
-def get_game_mode_bridge_dim(s3_client):
-    bucket_name = "twitch-project-curated-layer"
-    file_key = "curated_game_mode_bridge_data/curated_game_mode_bridge_data.csv"
+def get_game_mode_bridge_dim(storage):
     try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the curated game_mode bridge data. Status - {status}")
-            game_mode_bridge_dim_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-        else:
-            print(f"Unsuccessful S3 get_object response for the game_mode bridge dimension. Status - {status}")
-            print(response)
-            exit()
-    except Exception as e:
+        game_mode_bridge_dim_df = storage.read_csv(curated_game_mode_bridge_dim_path, schema="curated_game_mode_bridge_data")
+    except ObjectNotFoundError as e:
         print(e)
         game_mode_bridge_dim_df = pd.DataFrame(columns=["category_id", "game_mode_id"])
 
@@ -61,31 +47,29 @@ def add_new_game_mode_data(processed_game_mode_bridge_df, curated_game_mode_brid
 
 
 
+@metrics.instrument
 def lambda_handler(event, context):
-    bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-    file_key = event["Records"][0]["s3"]["object"]["key"]
-    day_date_id = file_key.split("/")[1]
-    time_of_day_id = file_key.split("/")[2].split("_")[6][:4]
-
-    s3_client = boto3.client("s3")
+    processed_game_mode_bridge_path = DataPath.from_s3_event(event)
+    partition = processed_game_mode_bridge_path.partition
+    metrics.set_partition(partition)
 
     # Get processed and curated game_mode bridge data
-    processed_game_mode_bridge_df = get_processed_game_mode_bridge_data(s3_client, bucket_name, file_key)
+    processed_game_mode_bridge_df = get_processed_game_mode_bridge_data(storage, processed_game_mode_bridge_path)
 
     # Curate processed data to only include relevant data
+    metrics.count("rows_in", len(processed_game_mode_bridge_df))
     curated_game_mode_bridge_df = processed_game_mode_bridge_df[["category_id", "game_mode_id"]]
-    curated_game_mode_bridge_df = curated_game_mode_bridge_df.drop_duplicates(subset=["category_id", "game_mode_id"]).reset_index(drop=True)
+    with metrics.span("dedupe"):
+        curated_game_mode_bridge_df = curated_game_mode_bridge_df.drop_duplicates(subset=["category_id", "game_mode_id"]).reset_index(drop=True)
+    metrics.count("rows_out", len(curated_game_mode_bridge_df))
+    record_dataframes("dedupe", processed_game_mode_bridge=processed_game_mode_bridge_df, curated_game_mode_bridge=curated_game_mode_bridge_df)
 
 
     # Upload CSV to curated layer in S3
-    wr.s3.to_csv(
-        df=curated_game_mode_bridge_df,
-        path=f"s3://twitch-project-curated-layer/curated_game_mode_bridge_data/{day_date_id}/curated_game_mode_bridge_data_{day_date_id}_{time_of_day_id}.csv", 
-        index=False
-    )
+    storage.write_csv(curated_game_mode_bridge_df, DataPath.for_partition(curated_bucket_name, "curated_game_mode_bridge_data", partition, suffix=processed_game_mode_bridge_path.suffix), schema="curated_game_mode_bridge_data")
 
 
     return {
         'statusCode': 200,
         'body': "Success"
-    }
\ No newline at end of file
+    }
@@ -1,7 +1,8 @@
 import pandas as pd
-import boto3
-import awswrangler as wr
-import time
+from pipeline_core.partitions import DataPath, curated_bucket_name
+from pipeline_core.storage import S3Storage, ObjectNotFoundError
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
 
 ########################### SUMMARY ###########################
 '''
@@ -12,39 +13,24 @@ import time
 ###############################################################
 
 
-# Gets recent processed genre bridge dimension data and limits it to relevant columns
-def get_processed_genre_bridge_data(s3_client, bucket_name, file_key):
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        print(f"Successful S3 get_object response for the processed genre bridge data. Status - {status}")
-        processed_genre_bridge_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-    else:
-        print(f"Unsuccessful S3 get_object response for the genre bridge dimension. Status - {status}")
-        print(response)
-        exit()
+curated_genre_bridge_dim_path = DataPath(curated_bucket_name, "curated_genre_bridge_data/curated_genre_bridge_data.csv")
+
+storage = S3Storage()
 
-    return processed_genre_bridge_df
+
+# Gets recent processed genre bridge dimension data and limits it to relevant columns
+def get_processed_genre_bridge_data(storage, processed_genre_bridge_path):
+    return storage.read_csv(processed_genre_bridge_path, schema="processed_genre_bridge_data", columns=["category_id", "genre_id"])
 
 
 # Gets current genre bridge dim
-def get_genre_bridge_dim(s3_client):
-    bucket_name = "twitch-project-curated-layer"
-    file_key = "curated_genre_bridge_data/curated_genre_bridge_data.csv"
+def get_genre_bridge_dim(storage):
     try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the curated genre bridge data. Status - {status}")
-            genre_bridge_dim_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-        else:
-            print(f"Unsuccessful S3 get_object response for the genre bridge dimension. Status - {status}")
-            print(response)
-            exit()
-    except Exception as e:
+        genre_bridge_dim_df = storage.read_csv(curated_genre_bridge_dim_path, schema="curated_genre_bridge_data")
+    except ObjectNotFoundError as e:
         print(e)
         genre_bridge_dim_df = pd.DataFrame(columns=["category_id", "genre_id"])
-    
+
     return genre_bridge_dim_df
 
 
@@ -61,28 +47,26 @@ def add_new_genre_data(processed_genre_bridge_df, curated_genre_bridge_df):
 
 
 
+@metrics.instrument
 def lambda_handler(event, context):
-    bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-    file_key = event["Records"][0]["s3"]["object"]["key"]
-    day_date_id = file_key.split("/")[1]
-    time_of_day_id = file_key.split("/")[2].split("_")[5][:4]
-
-    s3_client = boto3.client("s3")
+    processed_genre_bridge_path = DataPath.from_s3_event(event)
+    partition = processed_genre_bridge_path.partition
+    metrics.set_partition(partition)
 
     # Get processed and curated genre bridge data
-    processed_genre_bridge_df = get_processed_genre_bridge_data(s3_client, bucket_name, file_key)
+    processed_genre_bridge_df = get_processed_genre_bridge_data(storage, processed_genre_bridge_path)
 
     # Curate processed data to only include relevant data
+    metrics.count("rows_in", len(processed_genre_bridge_df))
     curated_genre_bridge_df = processed_genre_bridge_df[["category_id", "genre_id"]]
-    curated_genre_bridge_df = curated_genre_bridge_df.drop_duplicates(subset=["category_id", "genre_id"]).reset_index(drop=True)
+    with metrics.span("dedupe"):
+        curated_genre_bridge_df = curated_genre_bridge_df.drop_duplicates(subset=["category_id", "genre_id"]).reset_index(drop=True)
+    metrics.count("rows_out", len(curated_genre_bridge_df))
+    record_dataframes("dedupe", processed_genre_bridge=processed_genre_bridge_df, curated_genre_bridge=curated_genre_bridge_df)
 
 
     # Upload CSV to curated layer in S3
-    wr.s3.to_csv(
-        df=curated_genre_bridge_df,
-        path=f"s3://twitch-project-curated-layer/curated_genre_bridge_data/{day_date_id}/curated_genre_bridge_data_{day_date_id}_{time_of_day_id}.csv",
-        index=False
-    )
+    storage.write_csv(curated_genre_bridge_df, DataPath.for_partition(curated_bucket_name, "curated_genre_bridge_data", partition, suffix=processed_genre_bridge_path.suffix), schema="curated_genre_bridge_data")
 
 
     return {
@@ -1,7 +1,8 @@
 import pandas as pd
-import boto3
-import awswrangler as wr
-import time
+from pipeline_core.partitions import DataPath, curated_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
 
 ####################### SUMMARY #######################
 '''
@@ -14,33 +15,19 @@ import time
 
 pd.options.mode.chained_assignment = None  # default='warn'
 
-# Get processed stream data from S3
-def get_processed_stream_data(bucket_name, file_key, s3_client):
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        print(f"Successful S3 get_object response for the processed stream data. Status - {status}")
-        processed_stream_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-    else:
-        print(f"Unsuccessful S3 get_object response for the stream data. Status - {status}")
-        print(response)
-        exit()
-
-    return processed_stream_df
-
+storage = S3Storage()
 
 
+@metrics.instrument
 def lambda_handler(event, context):
-    start = time.time()
-    bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-    file_key = event["Records"][0]["s3"]["object"]["key"]
-    day_date_id = str(file_key[-17:-9])
-    time_of_day_id = str(file_key[-8:-4])
-
-    s3_client = boto3.client("s3")
+    processed_streams_path = DataPath.from_s3_event(event)
+    partition = processed_streams_path.partition
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
 
     # Get processed stream data from S3
-    processed_stream_df = get_processed_stream_data(bucket_name, file_key, s3_client)
+    processed_stream_df = storage.read_csv(processed_streams_path, schema="processed_streams_data", columns=["id", "user_id", "game_id", "language", "viewer_count"])
+    metrics.count("rows_in", len(processed_stream_df))
 
     # Limit columns to only relevant ones
     curated_stream_df = processed_stream_df[["id", "user_id", "game_id", "language", "viewer_count"]]
@@ -62,18 +49,14 @@ def lambda_handler(event, context):
     curated_stream_df["hours_watched"] = curated_stream_df["viewer_count"] * 0.25
 
     # Drop duplicates if exist
-    curated_stream_df = curated_stream_df.drop_duplicates(subset=["stream_id", "time_of_day_id", "day_date_id"], keep="first")
+    with metrics.span("dedupe"):
+        curated_stream_df = curated_stream_df.drop_duplicates(subset=["stream_id", "time_of_day_id", "day_date_id"], keep="first")
+    metrics.count("rows_out", len(curated_stream_df))
+    record_dataframes("dedupe", processed_streams=processed_stream_df, curated_streams=curated_stream_df)
 
     # Upload file as CSV to curated layer in S3
-    wr.s3.to_csv(
-            df=curated_stream_df,
-            path=f"s3://twitch-project-curated-layer/curated_streams_data/{day_date_id}/curated_streams_data_{day_date_id}_{time_of_day_id}.csv",
-            index=False
-        )
-
+    storage.write_csv(curated_stream_df, DataPath.for_partition(curated_bucket_name, "curated_streams_data", partition), schema="curated_streams_data")
 
-    end = time.time()
-    print("Duration: " + str(end - start))
 
     return {
         'statusCode': 200,
@@ -1,77 +1,73 @@
+import io
+import numpy as np
 import pandas as pd
-import boto3
-import awswrangler as wr
+from pipeline_core.partitions import DataPath, curated_bucket_name, misc_bucket_name
+from pipeline_core.storage import S3Storage, WriteConflictError, max_write_attempts
+from pipeline_core.scd2_dimension import apply_scd2_changes
+from pipeline_core.dates import get_valid_from
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
 
 ########################### SUMMARY ###########################
 '''
     Updates the current user dimension CSV file. Looks
     through most recently collected current user data
-    and adds users not already present in the data.
+    and adds users not already present in the data. Users
+    whose name, login or broadcaster type changed are
+    updated as well. New and changed users are written to
+    the curated layer as type 2 history rows with the time
+    they became valid, using pipeline_core.scd2_dimension.
+
+    refresh_stale_dimension_data also rewrites the current users,
+    so they are written back only if they did not change since
+    they were read, otherwise the update is done again.
 '''
 ###############################################################
 
+current_users_path = DataPath(misc_bucket_name, "current_data/current_users.csv")
+known_user_ids_path = DataPath(misc_bucket_name, "current_data/current_user_ids.npy")
+
+storage = S3Storage()
+
+
 # Gets recent processed user data
-def get_processed_user_data(s3_client, bucket_name, file_key):
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        print(f"Successful S3 get_object response for the processed user data. Status - {status}")
-        processed_user_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-        processed_user_df = processed_user_df[["id", "display_name", "login", "broadcaster_type"]] 
-    else:
-        print(f"Unsuccessful S3 get_object response for the user dimension. Status - {status}")
-        print(response)
-        exit()
-
-    return processed_user_df
-
-
-# Gets current users we have info for already
-def get_current_users(s3_client):
-    try:
-        response = s3_client.get_object(Bucket="twitch-project-miscellaneous", Key="current_data/current_users.csv")
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the current users data. Status - {status}")
-            current_user_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-        else:
-            print(f"Unsuccessful S3 get_object response for the current users data. Status - {status}")
-            print(response)
-            exit()
-    except Exception as e: # if current user data does not exist yet, error will be thrown
-        if "NoSuchKey" in str(e):
-            current_user_df = pd.DataFrame(columns=["user_id", "user_name", "login_name", "broadcaster_type"])
-        else:
-            print("Unsuccessful S3 get_object response for the current user data.")
-            print(response)
-            exit()
-
-    return current_user_df
-
-
-# Adds new user data from processed user data to the current users data
-# Also returns dataframe filled with new users not seen before in to the curated layer to be uploaded to the postgres DB
-def add_new_user_data(processed_user_df, current_user_df):
-    new_current_user_df = pd.concat([current_user_df, processed_user_df]).drop_duplicates(subset=["user_id"], keep="first").reset_index()
-    new_current_user_df = new_current_user_df[["user_id", "user_name", "login_name", "broadcaster_type"]]
-
-    # New additional users not seen before will be uploaded as curated data to curated layer
-    additional_users_df = pd.concat([new_current_user_df.drop_duplicates(), current_user_df.drop_duplicates()]).drop_duplicates(keep=False).reset_index(drop=True)
-
-    return new_current_user_df, additional_users_df
+def get_processed_user_data(storage, processed_users_path):
+    return storage.read_csv(processed_users_path, schema="processed_users_data", columns=["id", "display_name", "login", "broadcaster_type"])
 
 
+# Gets current users we have info for already and the version to write them back with
+def get_current_users(storage):
+    current_user_df, version = storage.read_csv_with_version(current_users_path, schema="current_users")
+    if current_user_df is None: # current user data does not exist yet
+        current_user_df = pd.DataFrame(columns=["user_id", "user_name", "login_name", "broadcaster_type"])
 
-def lambda_handler(event, context):
-    bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-    file_key = event["Records"][0]["s3"]["object"]["key"]
-    day_date_id = file_key.split("/")[1]
-    time_of_day_id = file_key.split("/")[2].split("_")[4][:4]
+    return current_user_df, version
+
+
+# Id and attribute columns compared to find new and changed users
+user_id_column = "user_id"
+user_attribute_columns = ["user_name", "login_name", "broadcaster_type"]
+
+
+# Uploads the sorted array of all user ids we have data for
+# get_raw_users_data uses it to find new users without reading the current users CSV
+def upload_known_user_ids(storage, current_users_df):
+    known_user_ids = np.unique(pd.to_numeric(current_users_df["user_id"]).to_numpy(dtype=np.uint64))
+    buffer = io.BytesIO()
+    np.save(buffer, known_user_ids)
+    storage.put_bytes(buffer.getvalue(), known_user_ids_path)
 
-    s3_client = boto3.client("s3")
+
+
+@metrics.instrument
+def lambda_handler(event, context):
+    processed_users_path = DataPath.from_s3_event(event)
+    partition = processed_users_path.partition
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
 
     # Gets recent processed user data
-    processed_user_df = get_processed_user_data(s3_client, bucket_name, file_key)
+    processed_user_df = get_processed_user_data(storage, processed_users_path)
 
     # Change column names
     processed_user_df = processed_user_df.rename(columns={
@@ -80,32 +76,39 @@ def lambda_handler(event, context):
         "login": "login_name"
     })
 
-    current_users_df = get_current_users(s3_client)
-
-    # Curated user data contains new user data to be uploaded to postgres
-    # Current users is updated
-    current_users_df, curated_users_df = add_new_user_data(processed_user_df, current_users_df) 
-
-    if curated_users_df.empty:
-        return {
-            'statusCode': 200,
-            'body': "No new user data to be added"
-        }
-
-
-    # Converts new additional user data to CSV and uploads to curated layer which will be uploaded to postgres
-    wr.s3.to_csv(
-        df=curated_users_df,
-        path=f"s3://twitch-project-curated-layer/curated_users_data/{day_date_id}/curated_users_data_{day_date_id}_{time_of_day_id}.csv",
-        index=False
-    )
-
-    # Updates the current users we have data for already
-    wr.s3.to_csv(
-        df=current_users_df,
-        path=f"s3://twitch-project-miscellaneous/current_data/current_users.csv",
-        index=False
-    )
+    metrics.count("rows_in", len(processed_user_df))
+    for attempt in range(1, max_write_attempts + 1):
+        current_users_df, current_users_version = get_current_users(storage)
+
+        # Curated user data contains new and changed users to be uploaded to postgres
+        # Current users is updated
+        with metrics.span("scd2"):
+            current_users_df, curated_users_df = apply_scd2_changes(current_users_df, processed_user_df, user_id_column, user_attribute_columns, get_valid_from(day_date_id, time_of_day_id))
+        record_dataframes("scd2", processed_users=processed_user_df, current_users=current_users_df, curated_users=curated_users_df)
+
+        if curated_users_df.empty:
+            metrics.count("rows_out", 0)
+            return {
+                'statusCode': 200,
+                'body': "No new or changed user data to be added"
+            }
+
+        # Converts new and changed user data to CSV and uploads to curated layer which will be uploaded to postgres
+        # A retry overwrites it, loading the same history rows again does not change the database
+        storage.write_csv(curated_users_df, DataPath.for_partition(curated_bucket_name, "curated_users_data", partition), schema="curated_users_data")
+
+        # Updates the current users we have data for already, unless another function updated them since they were read
+        try:
+            storage.write_csv(current_users_df, current_users_path, schema="current_users", expected_version=current_users_version)
+            break
+        except WriteConflictError:
+            if attempt == max_write_attempts:
+                raise
+            print("Current users were updated by another function, updating them again.")
+    metrics.count("rows_out", len(curated_users_df))
+
+    # Updates the known user ids used to find new users
+    upload_known_user_ids(storage, current_users_df)
 
     return {
         'statusCode': 200,
@@ -1,125 +1,152 @@
-import os
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-import boto3
 import json
-import time
+import base64
+from pipeline_core.partitions import DataPath, raw_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.dates import get_current_partition
+from pipeline_core.twitch_api import PaginationCheckpoint, get_twitch_headers, get_helix_page, get_next_cursor
+from pipeline_core.metrics import metrics
+from pipeline_core.api_calls import api_calls
 
 ################################ SUMMARY ################################
 '''
     This script calls the "Get Top Games" Twitch endpoint to return
     currently streamed categories at the time of script execution. The
     output will be a JSON file containing category data. The goal is to get
-    information on all categories that Twitch has available.
+    information on all categories that Twitch has available. Pages are
+    checkpointed with pipeline_core.twitch_api, so a retried invocation
+    continues from the last saved page.
+
+    The categories are paginated once. The ranking can change while
+    paginating, which can make a category be skipped at a page boundary.
+    Every page is requested from the last category of the page before
+    it, so rank drift shows up as a page that does not start with that
+    category. Only the pages before a drifted boundary are requested
+    again.
+
+    Nothing heavier than boto3 and requests is imported, so cold starts
+    on the critical path of every cycle stay short. The storage client
+    is made once per container.
 '''
 #########################################################################
 
+top_games_url = "https://api.twitch.tv/helix/games/top"
 
-# Gets client id and credentials
-def get_credentials():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    s3_client = boto3.client('s3')
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Client-Id": f"{client_id}"
+storage = S3Storage()
+
+
+# Gets the cursor one category before a cursor, so the next page starts with the last category of the page before it
+# Cursors of this endpoint are base64 JSON with the offset of the next category in "s", None if a cursor is not
+def get_overlap_cursor(cursor):
+    try:
+        position = json.loads(base64.b64decode(cursor))
+        position["s"] -= 1
+    except (ValueError, TypeError, KeyError):
+        return None
+
+    return base64.b64encode(json.dumps(position, separators=(",", ":")).encode()).decode()
+
+
+# Checks the boundary between a page and the page requested before it, None if the ranking did not drift
+# "repeated" when the page starts with an earlier category of the page before it, since categories moved up past it
+# "missing" when it starts with a category the page before it did not have, since categories moved down past it,
+# or when it has a category seen on an earlier page, since that category moved down and the rest shifted up
+# Without an overlap the boundary cannot be checked, so it is handled like categories moved down past it
+def get_boundary_drift(previous_data, data, overlapped, seen_category_ids):
+    previous_ids = [category["id"] for category in previous_data]
+    if overlapped and data and data[0]["id"] in previous_ids[:-1]:
+        return "repeated"
+    if any(category["id"] in seen_category_ids for category in data[1:]):
+        return "missing"
+    if overlapped and data and previous_ids and data[0]["id"] == previous_ids[-1]:
+        return None
+
+    return "missing"
+
+
+# Calls the "Get Top Games" Twitch endpoint for one page of categories
+def get_top_games_page(headers, cursor):
+    params = {
+        "first": 100, # Can get max of 100 items in each API call
+        "after": cursor
     }
 
-    return headers, s3_client
-
-
-# Gets current date id based of date when script is executed
-def get_day_date_id(s3_client, current_date):
-    current_date = current_date.astimezone(ZoneInfo("US/Pacific")).replace(tzinfo=None)
-    response = s3_client.get_object(Bucket="twitch-project-raw-layer", Key="raw_day_dates_data/raw_day_dates_data.csv")
-    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
-    if status == 200:
-        print(f"Successful S3 get_object response for date dimension. Status - {status}")
-        date_df = pd.read_csv(response.get("Body"), keep_default_na=False)
-    else:
-        print(f"Unsuccessful S3 get_object response for date dimension. Status - {status}")
-        print(response)
-        exit()
-        
-    # If later than 23:52, the day will be considered the next day
-    if current_date.hour == 23 and current_date.minute > 52:
-        current_date += timedelta(days=1)
-        day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-    else:
-        day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id(s3_client, current_date):
-    current_date = current_date.astimezone(ZoneInfo("US/Pacific")).replace(tzinfo=None)
-    response = s3_client.get_object(Bucket="twitch-project-raw-layer", Key="raw_time_of_day_data/raw_time_of_day_data.csv")
-    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
-    if status == 200:
-        print(f"Successful S3 get_object response for time of day dimension. Status - {status}")
-        time_of_day_df = pd.read_csv(response.get("Body"), keep_default_na=False, dtype={"time_of_day_id": str})
-    else:
-        print(f"Unsuccessful S3 get_object response for time of day dimension. Status - {status}")
-        print(response)
-        exit()
-
-    # If later than 23:52, next nearest time will be 00:00
-    if current_date.hour == 23 and current_date.minute > 52:
-        return "0000"
-    
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(current_date.year, current_date.month, current_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((current_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
-
-
-# Calls the "Get Top Games" Twitch endpoint to get data on currently streamed categories
-# Returns raw API JSON output of categories 
-def call_get_top_games_endpoint(headers, raw_category_data):
-    # Twitch uses cursor-based pagination to show API results
-    # Will need cursor value in one API call to get next set of results in other API call
+    return get_helix_page(top_games_url, headers, params)
+
+
+# Adds the categories not seen yet to the raw data and returns how many were added
+def add_categories(raw_category_data, seen_category_ids, data):
+    added_count = 0
+    for category in data:
+        if category["id"] not in seen_category_ids:
+            seen_category_ids.add(category["id"])
+            raw_category_data["data"].append(category)
+            added_count += 1
+
+    return added_count
+
+
+# Requests the pages before a drifted boundary again, returns the number of pages requested and categories found
+# When categories moved down past the boundary, the ones after them shifted up and were skipped at the end of the page before it
+# A category that moved up past the boundary is on an earlier page, so pages are requested back until one
+# starts with the same category it started with the first time
+def refetch_drifted_pages(headers, pages, drift, raw_category_data, seen_category_ids):
+    refetched_count = 0
+    found_count = 0
+    for cursor, data in reversed(pages):
+        output = get_top_games_page(headers, cursor)
+        refetched_count += 1
+        found_count += add_categories(raw_category_data, seen_category_ids, output["data"])
+        if drift == "missing" or not data or (output["data"] and output["data"][0]["id"] == data[0]["id"]):
+            break
+
+    return refetched_count, found_count
+
+
+# Gets one consistent snapshot of the categories from a single sweep
+# Twitch uses cursor-based pagination, every page is requested from one category before the end of the page
+# before it, so the boundary between them is checked after each page and only drifted boundaries are requested again
+# Pages saved by an earlier attempt are not requested again, their boundaries are checked the same way
+def get_category_snapshot(headers, raw_category_data, checkpoint):
+    saved_pages = checkpoint.load_pages()
+    seen_category_ids = set()
+    pages = [] # every page with the cursor it was requested with
     cursor = ""
-    while cursor != "done":
-        params = {
-            "first": 100, # Can get max of 100 items in each API call
-            "after": cursor
-        }
-        response = requests.get("https://api.twitch.tv/helix/games/top", headers=headers, params=params)
-        output = response.json()
-        
-        if response.status_code == 200:
-            raw_category_data["data"].extend(output["data"])
-        elif response.status_code == 429:
-            print("Rate limit exceeded. Retrying in 20 seconds")
-            time.sleep(20)
-            continue
+    overlapped = False
+    drift_count = 0
+    refetched_count = 0
+    found_count = 0
+    while cursor is not None:
+        if len(pages) < len(saved_pages):
+            data, next_cursor = saved_pages[len(pages)]["data"], saved_pages[len(pages)]["next_cursor"]
         else:
-            print(f"Error: {response.status_code}")
-            print(output)
-            exit()
+            output = get_top_games_page(headers, cursor)
+            data, next_cursor = output["data"], get_next_cursor(output)
+            checkpoint.save_page(data, next_cursor)
+
+        drift = get_boundary_drift(pages[-1][1], data, overlapped, seen_category_ids) if pages else None
+        add_categories(raw_category_data, seen_category_ids, data)
+        if drift is not None:
+            drift_count += 1
+            page_refetched_count, page_found_count = refetch_drifted_pages(headers, pages, drift, raw_category_data, seen_category_ids)
+            refetched_count += page_refetched_count
+            found_count += page_found_count
+        pages.append((cursor, data))
 
         # Ends pagination of pages when done
-        if len(output["pagination"]) == 0: # if no cursor in pagination, no more pages
-            cursor = "done"
-        else:
-            cursor = output["pagination"]["cursor"]
+        overlap_cursor = None if next_cursor is None else get_overlap_cursor(next_cursor)
+        overlapped = overlap_cursor is not None
+        cursor = overlap_cursor or next_cursor
 
+    print(f"Requested {len(pages)} pages. Ranking drifted on {drift_count} page boundaries, re-requesting {refetched_count} pages found {found_count} skipped categories.")
 
+
+@metrics.instrument
+@api_calls.instrument(storage)
 def lambda_handler(event, context):
-    headers, s3_client = get_credentials() # gets access token and client id needed to call Twitch API and s3 client
-    todays_date = datetime.today()
-    day_date_id = get_day_date_id(s3_client, todays_date)
-    time_of_day_id = get_time_of_day_id(s3_client, todays_date)
+    headers = get_twitch_headers() # gets access token and client id needed to call Twitch API
+    partition = get_current_partition(storage)
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
 
     # Calls Twitch's "Get Top Games" endpoint to get currently streamed categories and category data we have not collected yet
     raw_category_data = {
@@ -128,18 +155,16 @@ def lambda_handler(event, context):
         "data": []
     }
 
-    # Do API calling twice to make sure no category is skipped over
-    for _ in range(2):
-        # Calls API to get category data
-        call_get_top_games_endpoint(headers, raw_category_data)
-       
+    # Calls API to get category data in one sweep, re-requesting only pages where the ranking drifted
+    checkpoint = PaginationCheckpoint(storage, f"pagination_checkpoints/categories/{day_date_id}/{time_of_day_id}/")
+    get_category_snapshot(headers, raw_category_data, checkpoint)
+    metrics.count("rows_out", len(raw_category_data["data"]))
+
     # Upload data as JSON to S3
-    s3_client.put_object(
-            Bucket="twitch-project-raw-layer",
-            Key=f"raw_categories_data/{day_date_id}/raw_categories_data_{day_date_id}_{time_of_day_id}.json",
-            Body=json.dumps(raw_category_data, indent=4),
-            ContentType='application/json'
-        )
+    storage.write_json(raw_category_data, DataPath.for_partition(raw_bucket_name, "raw_categories_data", partition, extension="json"), indent=4)
+
+    # Saved pages are no longer needed once the data is uploaded
+    checkpoint.delete()
 
     return {
         'statusCode': 200,
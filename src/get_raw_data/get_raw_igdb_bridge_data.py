@@ -0,0 +1,106 @@
+import json
+from pipeline_core.partitions import DataPath, raw_bucket_name, misc_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.igdb_api import make_wrapper, get_raw_igdb_game_data
+from pipeline_core.igdb_game_cache import IGDBGameCache
+from pipeline_core.metrics import metrics
+from pipeline_core.api_calls import api_calls
+
+############################## SUMMARY ##############################
+'''
+    This script calls the IGDB API to get raw genre and game mode
+    data for categories in the category dimension. It replaces the
+    separate genre bridge and game mode bridge functions, which
+    both read the same curated categories file and requested the
+    same games one 100 game chunk at a time.
+
+    Games are requested with pipeline_core.igdb_api, up to 1000
+    games per multiquery request with every field in the same pass.
+    A raw bridge file is written for every output in
+    igdb_bridge_outputs in the same format as before, so the
+    processing functions are unchanged. New bridge data only needs
+    a field and an output added below.
+
+    Games are read through the persistent IGDB game cache in
+    pipeline_core.igdb_game_cache, so only games that are not
+    cached yet are requested from IGDB.
+
+    Changed and refreshed categories are linked again, since their
+    IGDB id may have changed. Their raw bridge files keep the
+    suffix of the category file, such as "_changed", so they do
+    not replace the bridge data of the new categories of the same
+    interval, and the database replaces the bridge rows of every
+    category in them.
+'''
+#####################################################################
+
+
+# Game fields requested from IGDB
+igdb_game_fields = ["name", "genres", "game_modes"]
+
+# Where the IGDB game cache is kept
+igdb_game_cache_path = DataPath(misc_bucket_name, "igdb_data/igdb_game_cache.json")
+
+# Raw bridge data written to the raw layer and the IGDB field each one is made from
+igdb_bridge_outputs = {
+    "genre_bridge": "genres",
+    "game_mode_bridge": "game_modes"
+}
+
+storage = S3Storage()
+
+
+# Gets the unique IGDB ids of the categories, categories without an IGDB id are skipped
+def get_igdb_ids(curated_categories_df):
+    igdb_ids = curated_categories_df.loc[curated_categories_df["igdb_id"] != "NA", "igdb_id"]
+
+    return sorted(set(int(igdb_id) for igdb_id in igdb_ids))
+
+
+# Gets the raw bridge data of one output from the games, in the same format as the games endpoint returns for that field alone
+def get_raw_bridge_data(games, field, day_date_id, time_of_day_id):
+    raw_bridge_data_dict = {
+        "day_date_id": day_date_id,
+        "time_of_day_id": time_of_day_id,
+        "data": []
+    }
+    for game in games:
+        game_data = {"id": game["id"], "name": game.get("name")}
+        if field in game: # some games have no data for the field
+            game_data[field] = game[field]
+        raw_bridge_data_dict["data"].append(game_data)
+
+    return raw_bridge_data_dict
+
+
+
+@metrics.instrument
+@api_calls.instrument(storage)
+def lambda_handler(event, context):
+    curated_categories_path = DataPath.from_sns_event(event)
+    partition = curated_categories_path.partition
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
+
+    wrapper = make_wrapper()
+
+    # Get curated category data
+    curated_categories_df = storage.read_csv(curated_categories_path, schema="curated_categories_data", columns=["igdb_id"])
+
+    # Get IGDB data of every game in one pass, only requesting games that are not cached
+    igdb_ids = get_igdb_ids(curated_categories_df)
+    metrics.count("rows_in", len(igdb_ids))
+    igdb_game_cache = IGDBGameCache(storage, igdb_game_cache_path, igdb_game_fields)
+    games = igdb_game_cache.get_games(igdb_ids, lambda missing_ids: get_raw_igdb_game_data(wrapper, missing_ids, igdb_game_fields))
+    igdb_game_cache.save()
+
+    # Write the raw data of every bridge to its own JSON file
+    for bridge_name, field in igdb_bridge_outputs.items():
+        raw_bridge_data_dict = get_raw_bridge_data(games, field, day_date_id, time_of_day_id)
+        metrics.count("rows_out", len(raw_bridge_data_dict["data"]))
+        storage.write_json(raw_bridge_data_dict, DataPath.for_partition(raw_bucket_name, f"raw_{bridge_name}_data", partition, suffix=curated_categories_path.suffix, extension="json"), indent=4)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps('Successful program end!')
+    }
@@ -1,124 +1,192 @@
 import os
-import requests
 import ast
 import boto3
-import time
 import json
-from datetime import datetime
-from zoneinfo import ZoneInfo
-import pandas as pd
+from pipeline_core.partitions import DataPath, raw_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.twitch_api import PaginationCheckpoint, get_twitch_headers, get_checkpoint_id, get_helix_page, get_next_cursor
+from pipeline_core.metrics import metrics
+from pipeline_core.api_calls import api_calls
 
 
 ###################################### SUMMARY #####################################
 '''
     This script collects stream data for specified categories.
+    The function watches its remaining time. When it is close to
+    timing out, the pages collected so far are uploaded and the
+    category batches it did not finish are sent back to the queue
+    as continuation messages, one per batch. The message of the
+    interrupted batch has its pagination cursor, so the next
+    invocation continues from the page where this one stopped.
+
+    Pages are checkpointed with pipeline_core.twitch_api. The
+    SQS messages are only deleted once the data is uploaded, so
+    a failed invocation is retried and continues from the last
+    saved page of each batch. Each batch is uploaded to its own
+    file named after the batch's checkpoint instead of the
+    request ID, so a retry overwrites what an earlier attempt
+    uploaded. Where the interrupted batch was handed off is saved
+    in its checkpoint before the continuation messages are sent
+    and marked as sent after, so a retry stops at the same page
+    and does not send them again.
+
+    Up to 25 of these functions start every cycle, so nothing
+    heavier than boto3 and requests is imported and the storage
+    and SQS clients are made once per container.
 '''
 ####################################################################################
 
-# Gets client id and credentials
-def get_credentials():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Client-Id": f"{client_id}"
-    }
-    s3_client = boto3.client('s3')
+category_groups_queue_url = "https://sqs.us-west-2.amazonaws.com/484743883065/category_groups"
 
-    return headers, s3_client
+storage = S3Storage()
+sqs_client = boto3.client("sqs")
 
+# Time left for uploading the collected data and sending the continuation message when the function stops early
+deadline_buffer_ms = int(os.environ.get("deadline_buffer_ms", "30000"))
 
-# Gets all categories from messages and puts it in one list
-def get_categories(event):
+
+# Splits categories into batches of 100, each with the cursor to start from
+def get_batches(category_list, cursor=""):
+    batches = [(category_list[i:i + 100], "") for i in range(0, len(category_list), 100)]
+    if batches:
+        batches[0] = (batches[0][0], cursor)
+
+    return batches
+
+
+# Gets all categories from messages and splits them into batches of 100 since 100 is max for one API request
+# Continuation messages are kept as their own batches since their first batch continues from a cursor
+def get_category_batches(event):
+    batches = []
     categories_to_process = []
     for message in event["Records"]:
-                category_list = ast.literal_eval(message["body"])
-                categories_to_process.extend(category_list)
+        category_list = ast.literal_eval(message["body"])
+        if "cursor" in message.get("messageAttributes", {}):
+            batches.extend(get_batches(category_list, message["messageAttributes"]["cursor"]["stringValue"]))
+        else:
+            categories_to_process.extend(category_list)
+    batches.extend(get_batches(list(dict.fromkeys(categories_to_process)))) # removes duplicates while keeping the order
 
-    return set(categories_to_process)
+    return batches
 
 
-# Deletes messages in SQS queue so if lambda function fails, it will not be processed
+# Deletes messages in SQS queue once their data is uploaded, messages of a failed invocation are retried
 def delete_SQS_messages(event):
-    sqs_client = boto3.client("sqs")
     for message in event["Records"]:
-        sqs_client.delete_message(
-                QueueUrl="https://sqs.us-west-2.amazonaws.com/484743883065/category_groups",
-                ReceiptHandle=message["receiptHandle"]
+        with metrics.span("sqs_delete"):
+            sqs_client.delete_message(
+                    QueueUrl=category_groups_queue_url,
+                    ReceiptHandle=message["receiptHandle"]
+                )
+
+
+# Sends the batches that were not finished back to the queue, one continuation message per batch
+# A cursor only belongs to the exact categories of its batch, so only the interrupted batch's message has one
+def send_continuation_messages(remaining_batches, day_date_id, time_of_day_id):
+    for category_list, cursor in remaining_batches:
+        message_attributes = {
+            "day_date_id": {
+                "StringValue": day_date_id,
+                "DataType": "String"
+            },
+            "time_of_day_id": {
+                "StringValue": time_of_day_id,
+                "DataType": "String"
+            }
+        }
+        if cursor != "": # empty attribute values are not allowed
+            message_attributes["cursor"] = {
+                "StringValue": cursor,
+                "DataType": "String"
+            }
+
+        with metrics.span("sqs_send"):
+            sqs_client.send_message(
+                QueueUrl=category_groups_queue_url,
+                MessageBody=str(category_list),
+                MessageAttributes=message_attributes
             )
+    print(f"Sent {len(remaining_batches)} continuation messages with {sum(len(category_list) for category_list, _ in remaining_batches)} categories.")
 
 
 # Calls Get Stream Twitch API to get stream data for specified categories
-def get_data_from_API(raw_stream_data, category_set, headers):
-    cursor = ""
-    while cursor != "end":
+# Every page is saved to the batch's checkpoint, so a retried invocation continues from the last saved page
+# Returns the cursor of the next page if the function is about to time out, otherwise None once every page is collected
+# A batch already handed off by an earlier attempt stops where it was handed off, the pages after it belong to the continuation
+def get_data_from_API(raw_stream_data, category_list, headers, context, checkpoint, cursor=""):
+    data, cursor, done = checkpoint.load(cursor)
+    raw_stream_data["data"].extend(data)
+    handoff = checkpoint.load_handoff()
+    if handoff is not None:
+        return handoff["cursor"]
+
+    while not done:
+        if context.get_remaining_time_in_millis() < deadline_buffer_ms:
+            return cursor
+
         params = {
-            "game_id": list(category_set),
+            "game_id": category_list,
             "first": 100,
             "after": cursor
         }
         # Calls API to get data for 100 categories
-        try:
-            response = requests.get("https://api.twitch.tv/helix/streams", headers=headers, params=params)
-            output = response.json()
-            if response.status_code == 200:
-                raw_stream_data["data"].extend(output["data"])
-            elif response.status_code == 429:
-                print("Rate limit exceeded. Retrying in 20 seconds")
-                time.sleep(20)
-                continue
-            else:
-                print(f"Error: {response.status_code}")
-                print(output)
-                exit()
-        except Exception as e:
-            print("An exception has occurred in the get_streams function!: " + str(e))
-            exit()
-        
-        if len(output["pagination"]) == 0: # if no cursor in pagination, no more pages
-            cursor = "end"
-        else:    
-            cursor = output["pagination"]["cursor"]
+        output = get_helix_page("https://api.twitch.tv/helix/streams", headers, params)
+        raw_stream_data["data"].extend(output["data"])
+        cursor = get_next_cursor(output)
+        checkpoint.save_page(output["data"], cursor)
+        done = cursor is None
+
+    return None
 
 
+@metrics.instrument
+@api_calls.instrument(storage)
 def lambda_handler(event, context):
     if event:
-        start = time.time()
-        func_ID = context.aws_request_id
-        headers, s3_client = get_credentials()
-        categories_to_process = get_categories(event)
+        headers = get_twitch_headers()
+        category_batches = get_category_batches(event)
         day_date_id = event["Records"][0]["messageAttributes"]["day_date_id"]["stringValue"]
         time_of_day_id = event["Records"][0]["messageAttributes"]["time_of_day_id"]["stringValue"]
-        delete_SQS_messages(event) # deletes messages from SQS queue
-
-        raw_stream_data = {
-            "day_date_id": day_date_id,
-            "time_of_day_id": time_of_day_id,
-            "data": []
-        }
+        metrics.set_partition((day_date_id, time_of_day_id))
+        metrics.count("category_batches", len(category_batches))
 
         # Calls Twitch's Get Streams API for every 100 categories since 100 is max
-        # Counts as one API request, minimizing API request number to better adhere to rate limits    
-        category_set = set()   
-        for i, category_id in enumerate(categories_to_process):
-            ith_category = i + 1
-            category_set.add(category_id)
-            # Process categories in batches of 100 while including the last non-100 batch
-            if (ith_category % 100 == 0) or len(categories_to_process) == ith_category:
-                get_data_from_API(raw_stream_data, category_set, headers)
-                category_set = set()
-
-        # Upload data as JSON to S3
-        s3_client.put_object(
-                Bucket="twitch-project-raw-layer",
-                Key=f"raw_streams_data/{day_date_id}/{time_of_day_id}/raw_streams_data_{day_date_id}_{time_of_day_id}_{func_ID}.json",
-                Body=json.dumps(raw_stream_data, indent=4),
-                ContentType='application/json'
-            )
+        # Counts as one API request, minimizing API request number to better adhere to rate limits
+        remaining_batches = []
+        checkpoints = []
+        for i, (category_list, cursor) in enumerate(category_batches):
+            batch_id = get_checkpoint_id(category_list, cursor)
+            checkpoint = PaginationCheckpoint(storage, f"pagination_checkpoints/streams/{day_date_id}/{time_of_day_id}/{batch_id}/")
+            checkpoints.append(checkpoint)
+            raw_stream_data = {
+                "day_date_id": day_date_id,
+                "time_of_day_id": time_of_day_id,
+                "data": []
+            }
+            stopped_cursor = get_data_from_API(raw_stream_data, category_list, headers, context, checkpoint, cursor)
+
+            # Upload data as JSON to S3, including the pages collected before stopping early
+            # Named after the batch, so a retried invocation overwrites the file instead of uploading the pages again
+            metrics.count("rows_out", len(raw_stream_data["data"]))
+            storage.write_json(raw_stream_data, DataPath(raw_bucket_name, f"raw_streams_data/{day_date_id}/{time_of_day_id}/raw_streams_data_{day_date_id}_{time_of_day_id}_{batch_id}.json"), indent=4)
+
+            if stopped_cursor is not None: # about to time out, the rest is handed off to another invocation
+                remaining_batches = [(category_list, stopped_cursor)] + category_batches[i + 1:]
+                break
+
+        if remaining_batches:
+            metrics.count("continuations")
+            handoff = checkpoint.load_handoff()
+            if handoff is None or not handoff["sent"]:
+                checkpoint.save_handoff(stopped_cursor)
+                send_continuation_messages(remaining_batches, day_date_id, time_of_day_id)
+                checkpoint.save_handoff(stopped_cursor, sent=True)
+
+        # Saved pages are no longer needed once the messages are deleted, a retry before that still needs them
+        delete_SQS_messages(event)
+        for checkpoint in checkpoints:
+            checkpoint.delete()
 
-        end = time.time()
-        print("Duration: " + str(end - start))
-        
         return {
             'statusCode': 200,
             'body': json.dumps('Successful program end!')
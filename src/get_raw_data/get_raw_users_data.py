@@ -1,12 +1,13 @@
-import os
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-import boto3
+import io
+import numpy as np
 import json
-import time
-import ast
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pipeline_core.partitions import DataPath, raw_bucket_name, misc_bucket_name
+from pipeline_core.storage import S3Storage, ObjectNotFoundError
+from pipeline_core.twitch_api import HelixRateBudget, get_helix_batch, get_twitch_headers
+from pipeline_core.metrics import metrics
+from pipeline_core.api_calls import api_calls
 
 ################################ SUMMARY ################################
 '''
@@ -15,107 +16,144 @@ import ast
     data for is based on recently collected curated stream data. The 
     output will be a JSON file containing user data. The goal is to get 
     information on all users that Twitch has available. Data is not
-    returned for users that are banned.
+    returned for users that are banned. Users are requested in
+    concurrent batches of 100 and completed batches are saved as they
+    finish, so a retried invocation only requests the remaining users.
 '''
 #########################################################################
 
+users_url = "https://api.twitch.tv/helix/users"
 
+current_users_path = DataPath(misc_bucket_name, "current_data/current_users.csv")
+known_user_ids_path = DataPath(misc_bucket_name, "current_data/current_user_ids.npy")
+
+storage = S3Storage()
 
-# Gets client id and credentials
-def get_credentials():
-    client_id = os.environ["client_id"]
-    access_token = os.environ["access_token"]
-    s3_client = boto3.client('s3')
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Client-Id": f"{client_id}"
-    }
 
-    return headers, s3_client
+# Gets the unique user ids in the curated stream data
+def get_stream_user_list(stream_df):
+    user_list = list(set(stream_df["user_id"].tolist()))
+
+    return user_list
 
 
 # Gets user ids that we will potentially call the API to get data on
-def get_potential_new_users(s3_client, bucket_name, day_date_id, time_of_day_id):
-    try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=f"curated_streams_data/{day_date_id}/curated_streams_data_{day_date_id}_{time_of_day_id}.csv")
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the curated streams data. Status - {status}")
-            stream_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-            user_list = list(set(stream_df["user_id"].tolist()))
-        else:
-            print(f"Unsuccessful S3 get_object response for the curated streams data. Status - {status}")  
-            exit()  
-    except Exception as e: # if curated user data does not exist yet, error will be returned which we will catch
-        print(e)
-        exit()
+def get_potential_new_users(storage, curated_streams_path):
+    stream_df = storage.read_csv(curated_streams_path, schema="curated_streams_data", columns=["user_id"])
 
-    return user_list
+    return get_stream_user_list(stream_df)
 
 
 # Reads the CSV file containing current users we already have data for
 # This is located in the miscellaneous bucket
-def get_current_users(s3_client):
+def get_current_users(storage):
     try:
-        response = s3_client.get_object(Bucket="twitch-project-miscellaneous", Key="current_data/current_users.csv")
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the current users data. Status - {status}")
-            current_user_df = pd.read_csv(response.get("Body"), index_col=False, dtype={"user_id": "string"})
-            current_users = list(set(current_user_df["user_id"].tolist()))
-        else:
-            print(f"Unsuccessful S3 get_object response for the current users data. Status - {status}")  
-            exit()  
-    except Exception as e: # if current user data does not exist yet, error will be returned which we will catch
-        current_users = []
-    
-    return current_users
+        current_user_df = storage.read_csv(current_users_path, schema="current_users", columns=["user_id"])
+        return list(set(current_user_df["user_id"].tolist()))
+    except ObjectNotFoundError: # if current user data does not exist yet, there are no current users
+        return []
 
 
-# Calls Twitch's "Get Users" endpoint to get data on users
-def get_data_from_API(user_list, raw_user_data, headers):
-    # API endpoint for getting users accepts max 100 users at a time
-    for i in range(0, len(user_list), 100):
-        user_list_tmp = user_list[i:i + 100]
-        params = {
-            "id": user_list_tmp,
-            "first": 100
-        }
-        response = requests.get("https://api.twitch.tv/helix/users", params=params, headers=headers)
-        output = response.json()
-
-        if response.status_code == 200:
-            raw_user_data["data"].extend(output["data"])
-        elif response.status_code == 429:
-            print("Rate limit exceeded. Retrying in 20 seconds")
-            time.sleep(20)
-        else:
-            print(f"Error: {response.status_code}")
-            print(output)
-            exit()   
+# Gets the sorted array of user ids we already have data for, kept up to date by curate_users_data
+# Loading the array is a single read of 8 bytes per user instead of parsing the full current users CSV
+def get_known_user_ids(storage):
+    try:
+        known_user_ids = np.load(io.BytesIO(storage.get_bytes(known_user_ids_path)))
+    except ObjectNotFoundError as e: # if the array has not been made yet, fall back to the current users CSV
+        print(e)
+        known_user_ids = np.unique(np.array(get_current_users(storage), dtype=np.uint64))
 
+    return known_user_ids
 
 
-def lambda_handler(event, context):
-    start = time.time()
-    event_notification = ast.literal_eval(event["Records"][0]["Sns"]["Message"])
-    curated_streams_bucket_name = event_notification["Records"][0]["s3"]["bucket"]["name"]
-    curated_streams_key = event_notification["Records"][0]["s3"]["object"]["key"]
-    day_date_id = curated_streams_key.split("/")[1]
-    time_of_day_id = curated_streams_key.split("/")[2].split("_")[4][:4]
+# Gets the user ids from the stream data that are not in the sorted known user ids using binary search
+def get_new_user_ids(stream_user_list, known_user_ids):
+    stream_user_ids = np.unique(np.array(stream_user_list, dtype=np.uint64))
+    if len(known_user_ids) == 0:
+        return [str(user_id) for user_id in stream_user_ids]
 
-    headers, s3_client = get_credentials()
+    positions = np.searchsorted(known_user_ids, stream_user_ids)
+    positions[positions == len(known_user_ids)] = 0 # ids larger than every known id can not match
+    is_new = known_user_ids[positions] != stream_user_ids
 
-    # Gets user IDs from recently collected stream data
-    stream_user_list = get_potential_new_users(s3_client, curated_streams_bucket_name, day_date_id, time_of_day_id)
+    return [str(user_id) for user_id in stream_user_ids[is_new]]
+
+
+# Calls Twitch's "Get Users" endpoint for one batch of up to 100 users
+def get_user_batch(user_batch, headers, rate_budget):
+    return get_helix_batch(users_url, {"id": user_batch, "first": 100}, headers, rate_budget)
+
+
+# Gets the partial user data already flushed by earlier attempts of this interval
+def get_partial_user_data(storage, day_date_id, time_of_day_id):
+    partial_paths = storage.list_paths(raw_bucket_name, f"partial_raw_users_data/{day_date_id}/{time_of_day_id}/")
+
+    return [(part_path, storage.read_json(part_path)) for part_path in partial_paths]
 
+
+# Writes completed batches to the raw layer so they do not have to be requested again if the function fails
+# Partial data is kept under its own prefix so it does not trigger the processing of raw user data
+def flush_partial_user_data(storage, day_date_id, time_of_day_id, requested_ids, data):
+    part_path = DataPath(raw_bucket_name, f"partial_raw_users_data/{day_date_id}/{time_of_day_id}/raw_users_data_{day_date_id}_{time_of_day_id}_{uuid.uuid4().hex}.json")
+    storage.write_json({"requested_ids": requested_ids, "data": data}, part_path)
+
+    return part_path
+
+
+# Calls Twitch's "Get Users" endpoint to get data on users
+# Batches of 100 users are requested concurrently and completed batches are flushed to S3 as they finish
+def get_data_from_API(user_list, raw_user_data, headers, storage, day_date_id, time_of_day_id, max_workers=8, flush_every=10):
+    # Continue from batches completed by an earlier attempt
+    partial_paths = []
+    requested_ids = set()
+    for part_path, part in get_partial_user_data(storage, day_date_id, time_of_day_id):
+        partial_paths.append(part_path)
+        requested_ids.update(part["requested_ids"])
+        raw_user_data["data"].extend(part["data"])
+    if partial_paths:
+        print(f"Resuming from {len(partial_paths)} partial files with {len(requested_ids)} users already requested")
+    user_list = [user_id for user_id in user_list if user_id not in requested_ids]
+
+    # API endpoint for getting users accepts max 100 users at a time
+    user_batches = [user_list[i:i + 100] for i in range(0, len(user_list), 100)]
+    rate_budget = HelixRateBudget()
+    unflushed_ids = []
+    unflushed_data = []
+    failed_batches = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(get_user_batch, batch, headers, rate_budget): batch for batch in user_batches}
+        for i, future in enumerate(as_completed(futures)):
+            try:
+                batch_data = future.result()
+                unflushed_ids.extend(futures[future])
+                unflushed_data.extend(batch_data)
+                raw_user_data["data"].extend(batch_data)
+            except Exception as e:
+                failed_batches += 1
+                print(e)
+
+            if unflushed_ids and ((i + 1) % flush_every == 0 or i + 1 == len(user_batches)):
+                partial_paths.append(flush_partial_user_data(storage, day_date_id, time_of_day_id, unflushed_ids, unflushed_data))
+                unflushed_ids = []
+                unflushed_data = []
+
+    # Failed batches are left for the retry of this function, completed batches are kept in the partial files
+    if failed_batches > 0:
+        raise RuntimeError(f"{failed_batches} of {len(user_batches)} user batches failed. Completed batches were saved.")
+
+    return partial_paths
+
+
+
+# Calls the API for users in the stream data that we do not have data for yet and uploads the raw user data
+def get_new_users_data(headers, storage, stream_user_list, day_date_id, time_of_day_id):
     # Gets user IDs we have already collected data for
-    current_user_list = get_current_users(s3_client)   
-    
+    known_user_ids = get_known_user_ids(storage)
+
     # Gets only users that we have not collected data of yet
-    set1 = set(stream_user_list)
-    set2 = set(current_user_list)
-    need_data_users_list = list(set1.difference(set2))
+    need_data_users_list = get_new_user_ids(stream_user_list, known_user_ids)
+    metrics.count("rows_in", len(stream_user_list))
+    metrics.count("new_users", len(need_data_users_list))
 
     raw_user_data = {
         "day_date_id": day_date_id,
@@ -124,19 +162,34 @@ def lambda_handler(event, context):
     }
 
     # Calls Twitch's "Get Users" endpoint to get data on users
-    get_data_from_API(need_data_users_list, raw_user_data, headers)
-
-    # Upload data as JSON to S3
-    s3_client.put_object(
-            Bucket="twitch-project-raw-layer",
-            Key=f"raw_users_data/{day_date_id}/raw_users_data_{day_date_id}_{time_of_day_id}.json",
-            Body=json.dumps(raw_user_data, indent=4),
-            ContentType='application/json'
-        )
-
-    end = time.time()
-    duration = end - start
-    print("Duration: " + str(duration))
+    partial_paths = get_data_from_API(need_data_users_list, raw_user_data, headers, storage, day_date_id, time_of_day_id)
+
+    # Upload data as JSON to S3, a cycle without new users has nothing to process
+    metrics.count("rows_out", len(raw_user_data["data"]))
+    if raw_user_data["data"]:
+        storage.write_json(raw_user_data, DataPath(raw_bucket_name, f"raw_users_data/{day_date_id}/raw_users_data_{day_date_id}_{time_of_day_id}.json"), indent=4)
+    else:
+        print("No new user data to upload.")
+
+    # Partial data is no longer needed once the full raw user data is uploaded
+    for part_path in partial_paths:
+        storage.delete(part_path)
+
+
+@metrics.instrument
+@api_calls.instrument(storage)
+def lambda_handler(event, context):
+    curated_streams_path = DataPath.from_sns_event(event)
+    day_date_id, time_of_day_id = curated_streams_path.partition
+    metrics.set_partition(curated_streams_path.partition)
+
+    headers = get_twitch_headers()
+
+    # Gets user IDs from recently collected stream data
+    stream_user_list = get_potential_new_users(storage, curated_streams_path)
+
+    # Gets data for users we have not collected data of yet and uploads it to the raw layer
+    get_new_users_data(headers, storage, stream_user_list, day_date_id, time_of_day_id)
 
     return {
         'statusCode': 200,
@@ -0,0 +1,200 @@
+import os
+import time
+import pandas as pd
+from pipeline_core.partitions import DataPath, curated_bucket_name, misc_bucket_name
+from pipeline_core.storage import S3Storage, ObjectNotFoundError, WriteConflictError, max_write_attempts
+from pipeline_core.schemas import get_dtypes
+from pipeline_core.dates import get_current_partition, get_valid_from
+from pipeline_core.twitch_api import HelixRateBudget, get_helix_batch, get_twitch_headers
+from pipeline_core.scd2_dimension import apply_scd2_changes
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
+from pipeline_core.api_calls import api_calls
+
+############################### SUMMARY ###############################
+'''
+    Refreshes user and category attributes that may have changed
+    since they were first collected, such as broadcaster_type,
+    display names and IGDB links. A last fetched timestamp is kept
+    for every user and category. Each run re-fetches a bounded
+    number of the entities whose data is older than the TTL, the
+    most recently active ones first. Changes are found with the
+    type 2 dimension engine in pipeline_core.scd2_dimension. Only
+    rows whose attributes changed are written to the curated layer
+    as history rows, which insert_data_to_db loads like any other
+    curated users or categories file.
+
+    Runs on its own schedule. curate_users_data and
+    curate_category_data rewrite the same current users and
+    categories files every cycle, so the current data is only
+    written back if it did not change since it was read.
+    Otherwise it is read again and the fetched data is compared
+    against it again, without fetching it again.
+'''
+#######################################################################
+
+users_url = "https://api.twitch.tv/helix/users"
+games_url = "https://api.twitch.tv/helix/games"
+
+storage = S3Storage()
+
+# How long fetched data is considered fresh and how many entities are refreshed per run
+ttl_seconds = int(os.environ.get("refresh_ttl_days", "7")) * 24 * 60 * 60
+max_user_refreshes = int(os.environ.get("max_user_refreshes", "2000"))
+max_category_refreshes = int(os.environ.get("max_category_refreshes", "1000"))
+
+# Dimension name, id column, attribute columns and where its data is kept with the schemas it is read with
+dimension_info = {
+    "users": {
+        "id_column": "user_id",
+        "attribute_columns": ["user_name", "login_name", "broadcaster_type"],
+        "current_key": "current_data/current_users.csv",
+        "current_schema": "current_users",
+        "state_key": "current_data/users_refresh_state.csv",
+        "state_schema": "users_refresh_state"
+    },
+    "categories": {
+        "id_column": "category_id",
+        "attribute_columns": ["category_name", "igdb_id"],
+        "current_key": "current_data/current_categories.csv",
+        "current_schema": "current_categories",
+        "state_key": "current_data/categories_refresh_state.csv",
+        "state_schema": "categories_refresh_state"
+    }
+}
+
+
+# Reads a CSV from the miscellaneous bucket with its schema, or returns None if it does not exist
+def read_misc_csv(storage, key, schema):
+    try:
+        return storage.read_csv(DataPath(misc_bucket_name, key), schema=schema)
+    except ObjectNotFoundError:
+        return None
+
+
+# Gets the refresh state of every entity in the dimension, entities without state have never been refreshed
+def get_refresh_state(storage, current_df, info):
+    id_column = info["id_column"]
+    state_df = read_misc_csv(storage, info["state_key"], info["state_schema"])
+    if state_df is None:
+        state_df = pd.DataFrame({id_column: pd.Series(dtype=str), "last_fetched_at": pd.Series(dtype="int64"), "last_seen_at": pd.Series(dtype="int64")})
+
+    # Entities without state get 0, the merge leaves them empty
+    state_df = current_df[[id_column]].merge(state_df, on=id_column, how="left")
+    state_df["last_fetched_at"] = state_df["last_fetched_at"].fillna(0).astype("int64")
+    state_df["last_seen_at"] = state_df["last_seen_at"].fillna(0).astype("int64")
+
+    return state_df
+
+
+# Gets the user and category ids of the most recent curated streams interval to track recent activity
+def get_recently_active_ids(storage, day_date_id):
+    stream_paths = storage.list_paths(curated_bucket_name, f"curated_streams_data/{day_date_id}/")
+    if not stream_paths:
+        return set(), set()
+
+    stream_df = storage.read_csv(stream_paths[-1], schema="curated_streams_data", columns=["user_id", "category_id"])
+
+    return set(stream_df["user_id"]), set(stream_df["category_id"])
+
+
+# Gets the stalest entities to refresh, most recently active first
+def get_entities_to_refresh(state_df, id_column, now, max_refreshes):
+    stale_df = state_df[state_df["last_fetched_at"] < now - ttl_seconds]
+    stale_df = stale_df.sort_values(by=["last_seen_at", "last_fetched_at"], ascending=[False, True])
+
+    return stale_df[id_column].head(max_refreshes).tolist()
+
+
+# Gets fresh user data in the same format as the current users data
+def fetch_users(user_ids, headers, rate_budget):
+    fetched_data = []
+    for i in range(0, len(user_ids), 100):
+        fetched_data.extend(get_helix_batch(users_url, {"id": user_ids[i:i + 100], "first": 100}, headers, rate_budget))
+
+    fetched_df = pd.DataFrame(fetched_data, columns=["id", "display_name", "login", "broadcaster_type"])
+    fetched_df = fetched_df.rename(columns={"id": "user_id", "display_name": "user_name", "login": "login_name"})
+    fetched_df["broadcaster_type"] = fetched_df["broadcaster_type"].replace("", "normal")
+
+    return fetched_df.astype(get_dtypes("current_users", fetched_df.columns))
+
+
+# Gets fresh category data in the same format as the current categories data
+def fetch_categories(category_ids, headers, rate_budget):
+    fetched_data = []
+    for i in range(0, len(category_ids), 100):
+        fetched_data.extend(get_helix_batch(games_url, {"id": category_ids[i:i + 100]}, headers, rate_budget))
+
+    fetched_df = pd.DataFrame(fetched_data, columns=["id", "name", "igdb_id"])
+    fetched_df = fetched_df.rename(columns={"id": "category_id", "name": "category_name"})
+    fetched_df["igdb_id"] = fetched_df["igdb_id"].replace("", "NA")
+
+    return fetched_df.astype(get_dtypes("current_categories", fetched_df.columns))
+
+
+# Refreshes one dimension and returns the number of changed rows
+def refresh_dimension(storage, dimension_name, fetch_function, max_refreshes, active_ids, headers, rate_budget, partition):
+    info = dimension_info[dimension_name]
+    id_column = info["id_column"]
+    now = int(time.time())
+
+    current_path = DataPath(misc_bucket_name, info["current_key"])
+    current_df, current_version = storage.read_csv_with_version(current_path, schema=info["current_schema"])
+    if current_df is None:
+        print(f"No current {dimension_name} data to refresh.")
+        return 0
+    state_df = get_refresh_state(storage, current_df, info)
+    state_df.loc[state_df[id_column].isin(active_ids), "last_seen_at"] = now
+
+    # Re-fetch the stalest entities within this run's budget
+    refresh_ids = get_entities_to_refresh(state_df, id_column, now, max_refreshes)
+    fetched_df = fetch_function(refresh_ids, headers, rate_budget)
+    state_df.loc[state_df[id_column].isin(refresh_ids), "last_fetched_at"] = now
+
+    for attempt in range(1, max_write_attempts + 1):
+        current_df, changed_df = apply_scd2_changes(current_df, fetched_df, id_column, info["attribute_columns"], get_valid_from(*partition))
+        record_dataframes(f"scd2_{dimension_name}", current=current_df, state=state_df, fetched=fetched_df)
+        if changed_df.empty:
+            break
+
+        # Changed rows go to the curated layer to update the database
+        # The suffix keeps them apart from the file curated for the same interval from collected data
+        # A retry overwrites it, loading the same history rows again does not change the database
+        storage.write_csv(changed_df, DataPath.for_partition(curated_bucket_name, f"curated_{dimension_name}_data", partition, suffix="_refresh"), schema=f"curated_{dimension_name}_data")
+
+        # Current data is updated so later changes are compared against the latest values
+        # If the curate stage wrote it since it was read, its rows would be lost, so it is read again instead
+        try:
+            storage.write_csv(current_df, current_path, schema=info["current_schema"], expected_version=current_version)
+            break
+        except WriteConflictError:
+            if attempt == max_write_attempts:
+                raise
+            print(f"Current {dimension_name} were updated by another function, comparing the refreshed data again.")
+            current_df, current_version = storage.read_csv_with_version(current_path, schema=info["current_schema"])
+    print(f"Refreshed {len(refresh_ids)} {dimension_name}, {len(changed_df)} changed.")
+
+    storage.write_csv(state_df, DataPath(misc_bucket_name, info["state_key"]), schema=info["state_schema"])
+
+    return len(changed_df)
+
+
+@metrics.instrument
+@api_calls.instrument(storage)
+def lambda_handler(event, context):
+    headers = get_twitch_headers()
+    rate_budget = HelixRateBudget()
+    partition = get_current_partition(storage)
+    metrics.set_partition(partition)
+
+    active_user_ids, active_category_ids = get_recently_active_ids(storage, partition.day_date_id)
+
+    changed_users = refresh_dimension(storage, "users", fetch_users, max_user_refreshes, active_user_ids, headers, rate_budget, partition)
+    changed_categories = refresh_dimension(storage, "categories", fetch_categories, max_category_refreshes, active_category_ids, headers, rate_budget, partition)
+    metrics.count("users_changed", changed_users)
+    metrics.count("categories_changed", changed_categories)
+
+    return {
+        'statusCode': 200,
+        'body': f"Updated {changed_users} users and {changed_categories} categories."
+    }
@@ -0,0 +1,272 @@
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+sys.path.append(str(Path(__file__).parents[1])) # src, for pipeline_core
+from pipeline_core.partitions import DataPath, curated_bucket_name, misc_bucket_name
+from pipeline_core.storage import S3Storage, ObjectNotFoundError
+from pipeline_core.dates import get_day_date_ids
+from insert_data_to_db import get_db_connection, load_curated_file
+from manage_streams_indexes import build_index_concurrently, create_streams_indexes, to_concurrent_definition
+
+########################### SUMMARY ###########################
+'''
+    Rebuilds the PostgreSQL database from the curated layer for
+    a range of days. Dimension data is loaded first, then the
+    stream data is loaded with one day per connection in
+    parallel. Foreign keys and indexes on the loaded tables are
+    dropped during the load and recreated at the end, with the
+    indexes built concurrently. Every loaded file is recorded
+    in the backfill_loaded_files table in the same transaction
+    as its data, and the deferred definitions are checkpointed
+    to S3, so a failed or killed backfill can be resumed by
+    running the same command again without loading a file twice.
+    Definitions are removed from the checkpoint as they are
+    restored. If stream files of a day fail to load, everything
+    is restored before exiting and the rerun defers it again.
+
+    Example:
+        python backfill_curated_layer.py --start 20260111 --end 20260117 --connections 8
+'''
+###############################################################
+
+
+# Dimensions are loaded in this order before any stream data
+dimension_prefixes = [
+    "curated_categories_data",
+    "curated_users_data",
+    "curated_genre_bridge_data",
+    "curated_game_mode_bridge_data"
+]
+stream_prefix = "curated_streams_data"
+
+# Tables whose foreign keys and indexes are deferred until the load is done
+deferred_tables = ["streams", "genre_bridge", "game_mode_bridge"]
+
+
+# Lists all curated CSV file keys under a day partition, ordered by time of day
+def get_partition_keys(storage, prefix, day_date_id):
+    return [path.key for path in storage.list_paths(curated_bucket_name, f"{prefix}/{day_date_id}/") if path.key.endswith(".csv")]
+
+
+# Gets the saved checkpoint for this backfill range, or a new one if the backfill has not run before
+def get_checkpoint(storage, checkpoint_path):
+    try:
+        checkpoint = storage.read_json(checkpoint_path)
+        print("Resuming backfill.")
+    except ObjectNotFoundError:
+        checkpoint = {
+            "deferred": None
+        }
+
+    return checkpoint
+
+
+# Writes the checkpoint to S3
+def save_checkpoint(storage, checkpoint_path, checkpoint):
+    storage.write_json(checkpoint, checkpoint_path, indent=4)
+
+
+# Creates the table recording the files each backfill has loaded, if it does not exist yet
+def create_loaded_files_table(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS backfill_loaded_files (
+            backfill_id TEXT NOT NULL,
+            file_key TEXT NOT NULL,
+            loaded_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (backfill_id, file_key)
+        );
+    ''')
+    conn.commit()
+    cursor.close()
+
+
+# Gets the keys of the files this backfill has already loaded
+def get_loaded_keys(conn, backfill_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT file_key FROM backfill_loaded_files WHERE backfill_id = %s;", (backfill_id,))
+    loaded_keys = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+
+    return loaded_keys
+
+
+# Forgets the files of a finished backfill, so the same range can be backfilled again later
+def delete_loaded_keys(conn, backfill_id):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM backfill_loaded_files WHERE backfill_id = %s;", (backfill_id,))
+    conn.commit()
+    cursor.close()
+
+
+# Saves the definitions of the foreign keys and indexes on the deferred tables, then drops them
+# The streams primary key is dropped as well since it is the only index on the table
+def drop_constraints_and_indexes(conn):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid::regclass::text = ANY(%s)
+          AND (contype = 'f' OR (contype = 'p' AND conrelid = 'streams'::regclass))
+        ORDER BY contype DESC;
+    ''', (deferred_tables,))
+    constraints = [list(row) for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT indexname, indexdef
+        FROM pg_indexes
+        WHERE schemaname = 'public'
+          AND tablename = ANY(%s)
+          AND indexname NOT IN (SELECT conname FROM pg_constraint);
+    ''', (deferred_tables,))
+    indexes = [list(row) for row in cursor.fetchall()]
+
+    for index_name, _ in indexes:
+        cursor.execute(f'DROP INDEX IF EXISTS "{index_name}";')
+    for table_name, constraint_name, _ in constraints:
+        cursor.execute(f'ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS "{constraint_name}";')
+    conn.commit()
+    cursor.close()
+
+    print(f"Deferred {len(constraints)} constraints and {len(indexes)} indexes.")
+
+    return {
+        "constraints": constraints,
+        "indexes": indexes
+    }
+
+
+# Gets whether a constraint on a table is validated, None if it does not exist
+def get_constraint_state(cursor, table_name, constraint_name):
+    cursor.execute("SELECT convalidated FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s;", (table_name, constraint_name))
+    row = cursor.fetchone()
+
+    return None if row is None else row[0]
+
+
+# Recreates the constraints and indexes that were dropped before the load
+# Every definition is removed from the checkpoint once it is restored, so a restore that fails partway resumes where it stopped
+# Constraints already there are not added again in case the restore stopped before the checkpoint was saved
+# Indexes are built concurrently, then any managed streams index that did not exist before is added
+def restore_constraints_and_indexes(conn, storage, checkpoint_path, checkpoint):
+    deferred = checkpoint["deferred"]
+    cursor = conn.cursor()
+    while deferred["constraints"]:
+        table_name, constraint_name, definition = deferred["constraints"][0]
+        validated = get_constraint_state(cursor, table_name, constraint_name)
+        if definition.startswith("FOREIGN KEY"):
+            # Validating separately avoids holding a heavy lock while the whole table is checked
+            if validated is None:
+                cursor.execute(f'ALTER TABLE {table_name} ADD CONSTRAINT "{constraint_name}" {definition} NOT VALID;')
+            if not validated:
+                cursor.execute(f'ALTER TABLE {table_name} VALIDATE CONSTRAINT "{constraint_name}";')
+        elif validated is None:
+            cursor.execute(f'ALTER TABLE {table_name} ADD CONSTRAINT "{constraint_name}" {definition};')
+        conn.commit()
+        print(f"Restored constraint {constraint_name} on {table_name}.")
+        deferred["constraints"].pop(0)
+        save_checkpoint(storage, checkpoint_path, checkpoint)
+    cursor.close()
+
+    while deferred["indexes"]:
+        index_name, definition = deferred["indexes"][0]
+        build_index_concurrently(conn, index_name, to_concurrent_definition(definition))
+        deferred["indexes"].pop(0)
+        save_checkpoint(storage, checkpoint_path, checkpoint)
+    create_streams_indexes(conn)
+
+
+# Loads a list of curated files on one connection, committing each file as it finishes
+# A file is recorded as loaded in the same transaction as its data, so it is either loaded and recorded or neither
+def load_files(file_keys, backfill_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        for file_key in file_keys:
+            load_curated_file(cursor, curated_bucket_name, file_key)
+            cursor.execute("INSERT INTO backfill_loaded_files (backfill_id, file_key) VALUES (%s, %s);", (backfill_id, file_key))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    return len(file_keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfills the PostgreSQL database from the curated layer.")
+    parser.add_argument("--start", required=True, help="First day_date_id to load, e.g. 20260111")
+    parser.add_argument("--end", required=True, help="Last day_date_id to load, e.g. 20260117")
+    parser.add_argument("--connections", type=int, default=4, help="Number of connections used to load stream data in parallel")
+    args = parser.parse_args()
+
+    storage = S3Storage()
+    backfill_id = f"{args.start}_{args.end}"
+    checkpoint_path = DataPath(misc_bucket_name, f"backfill_data/backfill_checkpoint_{backfill_id}.json")
+    checkpoint = get_checkpoint(storage, checkpoint_path)
+    day_date_ids = get_day_date_ids(args.start, args.end)
+
+    conn = get_db_connection()
+    create_loaded_files_table(conn)
+    loaded_keys = get_loaded_keys(conn, backfill_id)
+    if loaded_keys:
+        print(f"{len(loaded_keys)} files were already loaded.")
+
+    # Drop foreign keys and indexes once, definitions are kept in the checkpoint in case the backfill fails
+    if checkpoint["deferred"] is None:
+        checkpoint["deferred"] = drop_constraints_and_indexes(conn)
+        save_checkpoint(storage, checkpoint_path, checkpoint)
+    conn.close()
+
+    # Dimensions first so stream data always has its categories and bridges loaded
+    for prefix in dimension_prefixes:
+        for day_date_id in day_date_ids:
+            file_keys = [key for key in get_partition_keys(storage, prefix, day_date_id) if key not in loaded_keys]
+            if file_keys:
+                load_files(file_keys, backfill_id)
+        print(f"Loaded {prefix}.")
+
+    # Stream data is loaded one day per connection, each day's rollup rows are independent of other days
+    with ThreadPoolExecutor(max_workers=args.connections) as executor:
+        futures = {}
+        for day_date_id in day_date_ids:
+            file_keys = [key for key in get_partition_keys(storage, stream_prefix, day_date_id) if key not in loaded_keys]
+            if file_keys:
+                futures[executor.submit(load_files, file_keys, backfill_id)] = day_date_id
+
+        # A failed day does not stop the other days, the files they load are recorded either way
+        failed_day_date_ids = []
+        for future in as_completed(futures):
+            day_date_id = futures[future]
+            try:
+                num_of_files = future.result()
+                print(f"Loaded {num_of_files} stream files for {day_date_id}.")
+            except Exception as e:
+                print(f"Failed to load stream files for {day_date_id}: {e}")
+                failed_day_date_ids.append(day_date_id)
+
+    # Recreate everything that was deferred, also when a day failed so the tables are not left without their keys
+    conn = get_db_connection()
+    restore_constraints_and_indexes(conn, storage, checkpoint_path, checkpoint)
+
+    # The loaded files are kept, so running the same command again defers the constraints again and loads only the rest
+    if failed_day_date_ids:
+        conn.close()
+        checkpoint["deferred"] = None
+        save_checkpoint(storage, checkpoint_path, checkpoint)
+        print(f"Backfill failed for {', '.join(sorted(failed_day_date_ids))}. Constraints and indexes were restored, run the same command again to load the rest.")
+        sys.exit(1)
+
+    delete_loaded_keys(conn, backfill_id)
+    conn.close()
+
+    storage.delete(checkpoint_path)
+    print("Backfill complete!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+########################### SUMMARY ###########################
+'''
+    Benchmarks the cold start of every Lambda function in src.
+    Each function's module is imported in a new Python process,
+    the same work a Lambda container does in its init phase
+    before the first invocation, and the time the import takes
+    is measured. Every function is measured several times and
+    the median and slowest import times are printed with the
+    heavy libraries the import loaded. Functions whose
+    dependencies are not installed are reported as skipped.
+
+    The AWS clients made at module scope need a region but do
+    not call AWS, so no credentials are needed.
+
+    Example:
+        python benchmark_cold_starts.py --runs 5 --output cold_starts.json
+'''
+###############################################################
+
+src_path = Path(__file__).parents[1]
+
+# Directories with Lambda functions, modules are found by their lambda_handler
+function_directories = ["get_raw_data", "process_raw_data", "curate_data", "other"]
+
+# Libraries that are slow to import and are reported when a function loads them
+heavy_libraries = ["pandas", "numpy", "awswrangler", "pyarrow", "requests", "sqlalchemy", "psycopg2", "igdb"]
+
+# Run in the new process, prints the import time and the heavy libraries loaded as JSON
+import_timer = '''
+import sys, time, json, importlib
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+import_seconds = time.perf_counter() - start
+loaded = [library for library in json.loads(sys.argv[2]) if library in sys.modules]
+print(json.dumps({"import_seconds": import_seconds, "heavy_libraries": loaded}))
+'''
+
+
+# Gets the module name and directory of every Lambda function
+def get_functions():
+    functions = []
+    for directory in function_directories:
+        for path in sorted((src_path / directory).glob("*.py")):
+            if re.search(r"^def lambda_handler\(", path.read_text(), re.MULTILINE):
+                functions.append((path.stem, directory))
+
+    return functions
+
+
+# Imports one function's module in a new process and returns its import time and heavy libraries
+def measure_cold_start(module_name, directory):
+    env = dict(os.environ)
+    env.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+    # Functions are packaged with their sibling modules and pipeline_core, the other directories hold shared ones
+    env["PYTHONPATH"] = os.pathsep.join([str(src_path / directory)] + [str(src_path / other) for other in function_directories if other != directory] + [str(src_path)])
+    result = subprocess.run(
+        [sys.executable, "-c", import_timer, module_name, json.dumps(heavy_libraries)],
+        capture_output=True, text=True, env=env, cwd=src_path / directory
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# Measures every function several times, skipping functions that cannot be imported here
+def benchmark_cold_starts(functions, runs):
+    results = {}
+    for module_name, directory in functions:
+        measurements = [measure_cold_start(module_name, directory) for _ in range(runs)]
+        if "error" in measurements[0]:
+            results[module_name] = {"skipped": measurements[0]["error"]}
+            continue
+        import_times = [measurement["import_seconds"] for measurement in measurements]
+        results[module_name] = {
+            "median_ms": round(statistics.median(import_times) * 1000, 1),
+            "max_ms": round(max(import_times) * 1000, 1),
+            "heavy_libraries": measurements[0]["heavy_libraries"]
+        }
+
+    return results
+
+
+def print_results(results):
+    print(f"{'function':<40} {'median ms':>10} {'max ms':>10}  heavy libraries")
+    for module_name, result in sorted(results.items(), key=lambda item: -item[1].get("median_ms", -1)):
+        if "skipped" in result:
+            print(f"{module_name:<40} {'skipped':>10} {'':>10}  {result['skipped']}")
+        else:
+            print(f"{module_name:<40} {result['median_ms']:>10} {result['max_ms']:>10}  {', '.join(result['heavy_libraries'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the cold start import time of every Lambda function.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts measured per function")
+    parser.add_argument("--function", action="append", default=None, help="Only measure this function, can be given more than once")
+    parser.add_argument("--output", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    functions = get_functions()
+    if args.function:
+        functions = [function for function in functions if function[0] in args.function]
+    results = benchmark_cold_starts(functions, args.runs)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parents[1])) # src, for pipeline_core
+from insert_data_to_db import get_db_connection
+from manage_streams_indexes import create_streams_indexes
+
+########################### SUMMARY ###########################
+'''
+    Benchmarks the dashboard queries on the streams table with
+    and without the managed access path indexes. The "before"
+    run disables index scans for the session, so the streams
+    table is read the same way it was with only its primary
+    key, and nothing has to be dropped. Each query is run with
+    EXPLAIN ANALYZE and the execution time, blocks read and
+    plan used are printed side by side.
+
+    Example:
+        python benchmark_streams_queries.py --start 20260111 --end 20260117 --build-indexes
+'''
+###############################################################
+
+
+# Dashboard queries, parameters are filled in from the command line arguments
+benchmark_queries = {
+    "hours_watched_by_category": '''
+        SELECT category_id, SUM(hours_watched)
+        FROM streams
+        WHERE day_date_id BETWEEN %(start)s AND %(end)s
+        GROUP BY category_id;
+    ''',
+    "category_daily_trend": '''
+        SELECT day_date_id, SUM(viewer_count), SUM(hours_watched)
+        FROM streams
+        WHERE category_id = %(category_id)s AND day_date_id BETWEEN %(start)s AND %(end)s
+        GROUP BY day_date_id;
+    ''',
+    "broadcaster_history": '''
+        SELECT day_date_id, time_of_day_id, category_id, viewer_count
+        FROM streams
+        WHERE user_id = %(user_id)s;
+    ''',
+    "single_day_totals": '''
+        SELECT COUNT(*), SUM(hours_watched)
+        FROM streams
+        WHERE day_date_id = %(end)s;
+    '''
+}
+
+disable_index_scans = '''
+    SET enable_indexscan = off;
+    SET enable_indexonlyscan = off;
+    SET enable_bitmapscan = off;
+'''
+
+enable_index_scans = '''
+    RESET enable_indexscan;
+    RESET enable_indexonlyscan;
+    RESET enable_bitmapscan;
+'''
+
+
+# Picks the most streamed category and broadcaster in the date range if none were given
+def get_default_parameters(cursor, params):
+    if params["category_id"] is None:
+        cursor.execute('''
+            SELECT category_id FROM streams WHERE day_date_id = %(end)s
+            GROUP BY category_id ORDER BY COUNT(*) DESC LIMIT 1;
+        ''', params)
+        params["category_id"] = cursor.fetchone()[0]
+    if params["user_id"] is None:
+        cursor.execute('''
+            SELECT user_id FROM streams WHERE day_date_id = %(end)s
+            GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1;
+        ''', params)
+        params["user_id"] = cursor.fetchone()[0]
+
+
+# Runs one query with EXPLAIN ANALYZE and returns its execution time, blocks read and top plan node
+def explain_query(cursor, query, params):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+    explain_output = cursor.fetchone()[0]
+    if isinstance(explain_output, str):
+        explain_output = json.loads(explain_output)
+    plan = explain_output[0]
+
+    # Scan node used on streams, found by walking down the plan tree
+    node = plan["Plan"]
+    while "Plans" in node and "Relation Name" not in node:
+        node = node["Plans"][0]
+    blocks = plan["Plan"].get("Shared Hit Blocks", 0) + plan["Plan"].get("Shared Read Blocks", 0)
+
+    return {
+        "execution_ms": plan["Execution Time"],
+        "blocks": blocks,
+        "scan": node["Node Type"]
+    }
+
+
+# Runs every benchmark query and returns the results by query name
+def run_benchmark(cursor, params):
+    results = {}
+    for query_name, query in benchmark_queries.items():
+        results[query_name] = explain_query(cursor, query, params)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks dashboard queries on the streams table before and after indexing.")
+    parser.add_argument("--start", required=True, help="First day_date_id of the date range, e.g. 20260111")
+    parser.add_argument("--end", required=True, help="Last day_date_id of the date range, e.g. 20260117")
+    parser.add_argument("--category-id", default=None, help="Category used by the category query, defaults to the most streamed one")
+    parser.add_argument("--user-id", default=None, help="Broadcaster used by the broadcaster query, defaults to the most active one")
+    parser.add_argument("--build-indexes", action="store_true", help="Build any missing managed indexes before the after run")
+    args = parser.parse_args()
+
+    params = {
+        "start": args.start,
+        "end": args.end,
+        "category_id": args.category_id,
+        "user_id": args.user_id
+    }
+
+    conn = get_db_connection()
+    if args.build_indexes:
+        create_streams_indexes(conn)
+
+    cursor = conn.cursor()
+    get_default_parameters(cursor, params)
+
+    cursor.execute(disable_index_scans)
+    before = run_benchmark(cursor, params)
+    cursor.execute(enable_index_scans)
+    after = run_benchmark(cursor, params)
+    cursor.close()
+    conn.close()
+
+    print(f"{'query':<28}{'before ms':>12}{'after ms':>12}{'speedup':>10}{'before blocks':>15}{'after blocks':>14}  scan before -> after")
+    for query_name in benchmark_queries:
+        b = before[query_name]
+        a = after[query_name]
+        speedup = b["execution_ms"] / a["execution_ms"] if a["execution_ms"] > 0 else float("inf")
+        print(f"{query_name:<28}{b['execution_ms']:>12.1f}{a['execution_ms']:>12.1f}{speedup:>9.1f}x{b['blocks']:>15}{a['blocks']:>14}  {b['scan']} -> {a['scan']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,9 @@
 import pandas as pd
-import time
 import numpy as np
 import boto3
-from datetime import datetime
-from zoneinfo import ZoneInfo
-import botocore
-import json
-import ast
+from pipeline_core.partitions import DataPath, misc_bucket_name
+from pipeline_core.storage import S3Storage, ObjectNotFoundError
+from pipeline_core.metrics import metrics
 
 
 ######################### SUMMARY #########################
@@ -18,42 +15,47 @@ import ast
     group and the associated categories is either based
     off of default weights or the most recently collected
     stream data.
+
+    When send_speculative_category_groups already sent groups
+    for this interval from the previous cycle's categories,
+    only the categories that are new this cycle are sent as a
+    follow-up group. The categories of every cycle are saved
+    for the speculative groups of the next cycle.
+
+    The AWS clients are made once per container.
 '''
 ###########################################################
 
+category_groups_queue_url = "https://sqs.us-west-2.amazonaws.com/484743883065/category_groups"
+category_popularity_path = DataPath(misc_bucket_name, "category_popularity_data/category_popularity_data.csv")
+default_category_weights_path = DataPath(misc_bucket_name, "category_popularity_data/default_category_weights.csv")
+previous_categories_path = DataPath(misc_bucket_name, "speculative_data/previous_categories.csv")
+
+storage = S3Storage()
+sqs_client = boto3.client("sqs")
+
 
 # Gets most recently made processed categories df to be used as current streamed categories
-def get_processed_categories(s3_client, bucket_name, file_key):
+def get_processed_categories(storage, processed_categories_path):
     try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the processed category data. Status - {status}")
-            processed_categories_df = pd.read_csv(response.get("Body"), keep_default_na = False)           
-    except Exception as e: # if processed category data does not exist, error will be returned which we will catch
+        processed_categories_df = storage.read_csv(processed_categories_path, schema="processed_categories_data", columns=["category_id", "category_name"])
+    except ObjectNotFoundError as e: # if processed category data does not exist, error will be returned which we will catch
         print(e)
         print("Unsuccessful S3 get_object response for the processed category data.")
-        print(response)
         exit()
-    
+
     return processed_categories_df
 
 
 # Gets the default category popularity data that contains default weights for each category
-def get_default_popularity_df(s3_client):
+def get_default_popularity_df(storage):
     try:
-        object_key = f"category_popularity_data/default_category_weights.csv"
-        response = s3_client.get_object(Bucket="twitch-project-miscellaneous", Key=object_key)
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if status == 200:
-            print(f"Successful S3 get_object response for the default popularity category data. Status - {status}")
-            default_pop_df = pd.read_csv(response.get("Body"), keep_default_na = False)           
-    except Exception as e: # if processed category data does not exist, error will be returned which we will catch
+        default_pop_df = storage.read_csv(default_category_weights_path, schema="default_category_weights")
+    except ObjectNotFoundError as e: # if default popularity data does not exist, error will be returned which we will catch
         print(e)
         print("Unsuccessful S3 get_object response for the default popularity category data.")
-        print(response)
         exit()
-    
+
     return default_pop_df
 
 
@@ -97,8 +99,6 @@ def send_SQS_messages(category_groups, day_date_id, time_of_day_id):
         }
     }
 
-    sqs_client = boto3.client("sqs")
-    queue_url = "https://sqs.us-west-2.amazonaws.com/484743883065/category_groups"
     batch_entries = []
     # Each category group will be in one message
     # Loop sends ten messages at a time in a batch
@@ -106,59 +106,85 @@ def send_SQS_messages(category_groups, day_date_id, time_of_day_id):
         message = {'Id': 'msg' + str(i+1), 'MessageBody': str(group), 'MessageAttributes': date_time_info}
         batch_entries.append(message)
         if (i+1) % 10 == 0 or len(category_groups) == i+1: # every 10th group, we send message batch
-            response = sqs_client.send_message_batch(
-                QueueUrl=queue_url,
-                Entries=batch_entries
-            )
+            with metrics.span("sqs_send"):
+                sqs_client.send_message_batch(
+                    QueueUrl=category_groups_queue_url,
+                    Entries=batch_entries
+                )
             batch_entries = []
 
 
-def lambda_handler(event, context):
-    event_notification = ast.literal_eval(event["Records"][0]["Sns"]["Message"])
-    processed_categories_bucket_name = event_notification["Records"][0]["s3"]["bucket"]["name"]
-    processed_categories_key = event_notification["Records"][0]["s3"]["object"]["key"]
-    day_date_id = processed_categories_key.split("/")[1]
-    time_of_day_id = processed_categories_key.split("/")[2].split("_")[4][:4]
+# Gets the path of the categories sent by send_speculative_category_groups for an interval
+def get_sent_categories_path(partition):
+    day_date_id, time_of_day_id = partition
+    return DataPath(misc_bucket_name, f"speculative_data/{day_date_id}/sent_categories_{day_date_id}_{time_of_day_id}.csv")
+
+
+# Gets the categories already sent for this interval by send_speculative_category_groups, None if none were sent
+def get_speculative_categories(storage, partition):
+    try:
+        speculative_categories_df = storage.read_csv(get_sent_categories_path(partition), schema="category_ids")
+        print("Speculative category groups were sent for this interval.")
+        return speculative_categories_df
+    except ObjectNotFoundError:
+        return None
 
-    s3_client = boto3.client("s3")
+
+# Saves the categories of this cycle so the next cycle's speculative groups can be sent before its categories are collected
+def upload_previous_categories(storage, curr_streamed_categories_df):
+    storage.write_csv(curr_streamed_categories_df, previous_categories_path, schema="category_ids")
+
+
+@metrics.instrument
+def lambda_handler(event, context):
+    processed_categories_path = DataPath.from_sns_event(event)
+    partition = processed_categories_path.partition
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
 
     # Get current streamed categories based off of processed_categories file
-    curr_streamed_categories_df = get_processed_categories(s3_client, processed_categories_bucket_name, processed_categories_key)
+    curr_streamed_categories_df = get_processed_categories(storage, processed_categories_path)
+    upload_previous_categories(storage, curr_streamed_categories_df)
+
+    # If speculative groups were already sent, only categories that are new this cycle are left to send
+    speculative_categories_df = get_speculative_categories(storage, partition)
+    if speculative_categories_df is not None:
+        new_category_ids = sorted(set(curr_streamed_categories_df["category_id"]) - set(speculative_categories_df["category_id"]))
+        metrics.count("categories_sent", len(new_category_ids))
+        if new_category_ids:
+            send_SQS_messages([new_category_ids], day_date_id, time_of_day_id)
+        print(f"Sent follow-up group with {len(new_category_ids)} new categories.")
+        return
     
     # Check if popularity data exists or not
     popularity_data_exists = False
     category_popularity_df = ""
-    key = "category_popularity_data/category_popularity_data.csv"
     try:
-        s3_client.head_object(Bucket="twitch-project-miscellaneous", Key=key)
-        response = s3_client.get_object(Bucket="twitch-project-miscellaneous", Key=key)
-        status = response["ResponseMetadata"]["HTTPStatusCode"]
-        if  status == 200:
-            print(f"Successful S3 get_object response for the category popularity data. Status - {status}")
-            category_popularity_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-            popularity_data_exists = True
-    except botocore.exceptions.ClientError as e:
-        if e.response["Error"]["Code"] == "404":
-            print(f"Key: '{key}' does not exist!")
-        else:
-            print("Something else went wrong")
-            exit()
+        category_popularity_df = storage.read_csv(category_popularity_path, schema="category_popularity_data")
+        popularity_data_exists = True
+    except ObjectNotFoundError:
+        print(f"Key: '{category_popularity_path.key}' does not exist!")
 
     # Produce category groups
     if popularity_data_exists: # use recent popularity data since it exists
         merged_df = pd.merge(curr_streamed_categories_df, category_popularity_df, on="category_id", how='left')
         merged_df['num_of_streamers'] = merged_df['num_of_streamers'].replace(np.nan, 1)
-        category_groups, wvg = split_categories_into_groups(merged_df)
-        s3_client.delete_object(Bucket="twitch-project-miscellaneous", Key=key) # delete popularity data
+        with metrics.span("grouping"):
+            category_groups, wvg = split_categories_into_groups(merged_df)
     else: # if no recent category popularity data found, use default popularity data
-        default_pop_df = get_default_popularity_df(s3_client)
+        default_pop_df = get_default_popularity_df(storage)
         category_pop_df = pd.concat([curr_streamed_categories_df, default_pop_df], axis=1)
         category_pop_df = category_pop_df[["category_id", "category_name", "num_of_streamers"]].fillna(1)
-        category_groups, wvg = split_categories_into_groups(category_pop_df)
+        with metrics.span("grouping"):
+            category_groups, wvg = split_categories_into_groups(category_pop_df)
 
     # Sends groups of categories as messages to categoryGroupWeights SQS queue
     final_category_groups = [group for group in category_groups if len(group) != 0]
+    metrics.count("categories_sent", len(curr_streamed_categories_df))
+    metrics.count("groups_sent", len(final_category_groups))
     send_SQS_messages(final_category_groups, day_date_id, time_of_day_id) 
+    if popularity_data_exists:
+        storage.delete(category_popularity_path) # popularity data is consumed once its groups are sent
 
 
     for group in category_groups:
@@ -1,10 +1,7 @@
-import pandas as pd
-from datetime import datetime
-import json
-import time
-import boto3
-import awswrangler as wr
-import ast
+from pipeline_core.partitions import DataPath, misc_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
 
 ################################# SUMMARY #################################
 '''
@@ -13,40 +10,42 @@ import ast
 '''
 ###########################################################################
 
-def get_curated_stream_data(s3_client, bucket_name, file_key):
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        print(f"Successful S3 get_object response for the curated stream data. Status - {status}")
-        curated_stream_df = pd.read_csv(response.get("Body"), keep_default_na = False)
-    else:
-        print(f"Unsuccessful S3 get_object response for the stream data. Status - {status}")
-        print(response)
-        exit()
-    
-    return curated_stream_df
+category_popularity_path = DataPath(misc_bucket_name, "category_popularity_data/category_popularity_data.csv")
 
+storage = S3Storage()
 
-def lambda_handler(event, context):
-    s3_client = boto3.client("s3")
 
-    event_notification = ast.literal_eval(event["Records"][0]["Sns"]["Message"])
-    curated_streams_bucket_name = event_notification["Records"][0]["s3"]["bucket"]["name"]
-    curated_streams_key = event_notification["Records"][0]["s3"]["object"]["key"]
-    day_date_id = curated_streams_key.split("/")[1]
-    time_of_day_id = curated_streams_key.split("/")[2].split("_")[4][:4]
+def get_curated_stream_data(storage, curated_streams_path):
+    return storage.read_csv(curated_streams_path, schema="curated_streams_data", columns=["stream_id", "category_id"])
 
-    curated_stream_df = get_curated_stream_data(s3_client, curated_streams_bucket_name, curated_streams_key)
 
-    # Transforms it to get number of streamers per category
+# Gets the number of streamers per category, most popular categories first
+def get_category_popularity(curated_stream_df):
     category_popularity_df = curated_stream_df.groupby(["category_id"], as_index=False).agg(
                                         category_id=('category_id', 'first'),
                                         num_of_streamers=('stream_id', 'count')
                                    ).sort_values(by="num_of_streamers", ascending=False).reset_index(drop=True)
+
+    return category_popularity_df
+
+
+# Upload file as CSV to miscellaneous bucket for next create_category_groups function invocation to use
+def upload_category_popularity(storage, category_popularity_df):
+    storage.write_csv(category_popularity_df, category_popularity_path, schema="category_popularity_data")
+
+
+@metrics.instrument
+def lambda_handler(event, context):
+    curated_streams_path = DataPath.from_sns_event(event)
+    metrics.set_partition(curated_streams_path.partition)
+
+    curated_stream_df = get_curated_stream_data(storage, curated_streams_path)
+    metrics.count("rows_in", len(curated_stream_df))
+
+    # Transforms it to get number of streamers per category
+    with metrics.span("transform"):
+        category_popularity_df = get_category_popularity(curated_stream_df)
+    metrics.count("rows_out", len(category_popularity_df))
+    record_dataframes("transform", curated_streams=curated_stream_df, category_popularity=category_popularity_df)
     
-    # Upload file as CSV to miscellaneous bucket for next create_category_groups function invocation to use
-    wr.s3.to_csv(
-                df=category_popularity_df,
-                path=f"s3://twitch-project-miscellaneous/category_popularity_data/category_popularity_data.csv",
-                index=False
-            )
+    upload_category_popularity(storage, category_popularity_df)
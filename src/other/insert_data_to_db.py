@@ -1,21 +1,281 @@
 import json
 import os
-import pandas as pd
-import awswrangler as wr
-from sqlalchemy import create_engine
+import io
 import psycopg2
-import boto3
-import ast
+from pipeline_core.partitions import DataPath
+from pipeline_core.storage import S3Storage
+from pipeline_core.dates import get_valid_from
+from pipeline_core.metrics import metrics
 
 ########################### SUMMARY ###########################
 '''
     Inserts data into the Postgresql database. Executes when
-    any object that is a CSV is uploaded to the curated layer
+    any object that is a CSV is uploaded to the curated layer.
+    When stream data is inserted, the dashboard rollup tables
+    are also updated with the new interval in the same
+    transaction. User and category data updates the current
+    dimension rows and their type 2 history tables.
+
+    Genre and game mode bridge rows can arrive a cycle after the
+    first streams of their category. When they are loaded, the
+    days of the category already in category_daily_rollup are
+    added to the genre and game mode rollups, so the rollups
+    match what populate_rollup_tables.sql would compute. A bridge
+    file has every bridge row of its categories, so rows of those
+    categories it does not have, such as the genres of a previous
+    IGDB game, are removed and their days taken out of the
+    rollups.
 '''
 ###############################################################
 
+storage = S3Storage()
+
+
+# Stream data is first imported into a temporary staging table so the new interval
+# can be aggregated without scanning the whole streams table
+CREATE_STREAMS_STAGING_TABLE = '''
+    CREATE TEMP TABLE streams_staging (LIKE streams) ON COMMIT DROP;
+'''
+
+INSERT_STAGED_STREAMS = '''
+    INSERT INTO streams SELECT * FROM streams_staging;
+'''
+
+# Interval rollup rows are replaced since each interval is only loaded once
+UPSERT_CATEGORY_INTERVAL_ROLLUP = '''
+    INSERT INTO category_interval_rollup (category_id, language_id, day_date_id, time_of_day_id, stream_count, viewer_count, peak_viewer_count, hours_watched)
+    SELECT category_id, language_id, day_date_id, time_of_day_id, COUNT(*), SUM(viewer_count), MAX(viewer_count), SUM(hours_watched)
+    FROM streams_staging
+    GROUP BY category_id, language_id, day_date_id, time_of_day_id
+    ON CONFLICT (category_id, language_id, day_date_id, time_of_day_id) DO UPDATE SET
+        stream_count = EXCLUDED.stream_count,
+        viewer_count = EXCLUDED.viewer_count,
+        peak_viewer_count = EXCLUDED.peak_viewer_count,
+        hours_watched = EXCLUDED.hours_watched;
+'''
+
+# Daily rollups are merged by adding the new interval on top of the existing totals
+UPSERT_CATEGORY_DAILY_ROLLUP = '''
+    INSERT INTO category_daily_rollup (category_id, day_date_id, stream_intervals, peak_viewer_count, hours_watched)
+    SELECT category_id, day_date_id, COUNT(*), SUM(viewer_count), SUM(hours_watched)
+    FROM streams_staging
+    GROUP BY category_id, day_date_id
+    ON CONFLICT (category_id, day_date_id) DO UPDATE SET
+        stream_intervals = category_daily_rollup.stream_intervals + EXCLUDED.stream_intervals,
+        peak_viewer_count = GREATEST(category_daily_rollup.peak_viewer_count, EXCLUDED.peak_viewer_count),
+        hours_watched = category_daily_rollup.hours_watched + EXCLUDED.hours_watched;
+'''
+
+UPSERT_GENRE_DAILY_ROLLUP = '''
+    INSERT INTO genre_daily_rollup (genre_id, day_date_id, stream_intervals, hours_watched)
+    SELECT gb.genre_id, s.day_date_id, SUM(s.stream_intervals), SUM(s.hours_watched)
+    FROM (
+        SELECT category_id, day_date_id, COUNT(*) AS stream_intervals, SUM(hours_watched) AS hours_watched
+        FROM streams_staging
+        GROUP BY category_id, day_date_id
+    ) s
+    JOIN (SELECT DISTINCT category_id, genre_id FROM genre_bridge) gb ON gb.category_id = s.category_id
+    GROUP BY gb.genre_id, s.day_date_id
+    ON CONFLICT (genre_id, day_date_id) DO UPDATE SET
+        stream_intervals = genre_daily_rollup.stream_intervals + EXCLUDED.stream_intervals,
+        hours_watched = genre_daily_rollup.hours_watched + EXCLUDED.hours_watched;
+'''
+
+UPSERT_GAME_MODE_DAILY_ROLLUP = '''
+    INSERT INTO game_mode_daily_rollup (game_mode_id, day_date_id, stream_intervals, hours_watched)
+    SELECT gmb.game_mode_id, s.day_date_id, SUM(s.stream_intervals), SUM(s.hours_watched)
+    FROM (
+        SELECT category_id, day_date_id, COUNT(*) AS stream_intervals, SUM(hours_watched) AS hours_watched
+        FROM streams_staging
+        GROUP BY category_id, day_date_id
+    ) s
+    JOIN (SELECT DISTINCT category_id, game_mode_id FROM game_mode_bridge) gmb ON gmb.category_id = s.category_id
+    GROUP BY gmb.game_mode_id, s.day_date_id
+    ON CONFLICT (game_mode_id, day_date_id) DO UPDATE SET
+        stream_intervals = game_mode_daily_rollup.stream_intervals + EXCLUDED.stream_intervals,
+        hours_watched = game_mode_daily_rollup.hours_watched + EXCLUDED.hours_watched;
+'''
+
+
+# Id column and daily rollup table of each bridge table
+bridge_rollup_tables = {
+    "genre_bridge": ("genre_id", "genre_daily_rollup"),
+    "game_mode_bridge": ("game_mode_id", "game_mode_daily_rollup")
+}
+
+
+# Builds the query that imports a curated CSV file from S3 into a table
+def get_import_query(table_name, bucket_name, file_key, region, column_list=""):
+    query = f'''
+                SELECT aws_s3.table_import_from_s3(
+                    '{table_name}',
+                    '{column_list}',
+                    '(format csv, header true)',
+                    aws_commons.create_s3_uri('{bucket_name}', '{file_key}', '{region}')
+                );
+            '''
+
+    return query
+
+
+# Moves the staged stream data into the streams table and merges the new interval into the rollup tables
+def merge_staged_streams(cursor):
+    cursor.execute(INSERT_STAGED_STREAMS)
+    cursor.execute(UPSERT_CATEGORY_INTERVAL_ROLLUP)
+    cursor.execute(UPSERT_CATEGORY_DAILY_ROLLUP)
+    cursor.execute(UPSERT_GENRE_DAILY_ROLLUP)
+    cursor.execute(UPSERT_GAME_MODE_DAILY_ROLLUP)
+
+
+# Loads a curated streams file through the staging table and merges the new interval into the rollup tables
+# Everything runs in the caller's transaction so the streams and rollup tables never disagree
+def insert_streams_and_update_rollups(cursor, bucket_name, file_key, region):
+    cursor.execute(CREATE_STREAMS_STAGING_TABLE)
+    cursor.execute(get_import_query("streams_staging", bucket_name, file_key, region))
+    merge_staged_streams(cursor)
+
 
+# Same as insert_streams_and_update_rollups, but for curated stream CSV data that has already been read into memory
+def insert_streams_from_csv(cursor, curated_stream_csv):
+    cursor.execute(CREATE_STREAMS_STAGING_TABLE)
+    cursor.copy_expert("COPY streams_staging FROM STDIN WITH (FORMAT csv, HEADER true)", io.BytesIO(curated_stream_csv))
+    merge_staged_streams(cursor)
 
+
+# Loads curated bridge rows, replacing the bridge rows of their categories, and moves the streams already loaded
+# for those categories in the daily rollup from the pairs removed to the pairs added
+# Pairs the bridge already had are left as they are, their streams are in the rollup already
+# Locking the category rollup waits for stream loads in progress and holds new ones until this commits,
+# so every interval is counted either by its stream load or here, never both or neither
+def insert_bridge_and_update_rollups(cursor, table_name, bucket_name, file_key, region):
+    id_column, rollup_table = bridge_rollup_tables[table_name]
+    removed_pairs = f'''
+        DELETE FROM {table_name} b
+        WHERE b.category_id IN (SELECT category_id FROM {table_name}_staging)
+            AND NOT EXISTS (SELECT 1 FROM {table_name}_staging s WHERE s.category_id = b.category_id AND s.{id_column} = b.{id_column})
+        RETURNING b.category_id, b.{id_column}
+    '''
+    new_pairs = f'''
+        SELECT DISTINCT s.category_id, s.{id_column}
+        FROM {table_name}_staging s
+        WHERE NOT EXISTS (SELECT 1 FROM {table_name} b WHERE b.category_id = s.category_id AND b.{id_column} = s.{id_column})
+    '''
+
+    cursor.execute(f"CREATE TEMP TABLE {table_name}_staging (LIKE {table_name}) ON COMMIT DROP;")
+    cursor.execute(get_import_query(f"{table_name}_staging", bucket_name, file_key, region))
+    cursor.execute("LOCK TABLE category_daily_rollup IN SHARE MODE;")
+    cursor.execute(f'''
+        WITH removed_pairs AS ({removed_pairs})
+        UPDATE {rollup_table} r SET
+            stream_intervals = r.stream_intervals - d.stream_intervals,
+            hours_watched = r.hours_watched - d.hours_watched
+        FROM (
+            SELECT p.{id_column}, c.day_date_id, SUM(c.stream_intervals) AS stream_intervals, SUM(c.hours_watched) AS hours_watched
+            FROM category_daily_rollup c
+            JOIN (SELECT DISTINCT category_id, {id_column} FROM removed_pairs) p ON p.category_id = c.category_id
+            GROUP BY p.{id_column}, c.day_date_id
+        ) d
+        WHERE r.{id_column} = d.{id_column} AND r.day_date_id = d.day_date_id;
+    ''')
+    cursor.execute(f"DELETE FROM {rollup_table} WHERE stream_intervals <= 0;")
+    cursor.execute(f'''
+        INSERT INTO {rollup_table} ({id_column}, day_date_id, stream_intervals, hours_watched)
+        SELECT n.{id_column}, c.day_date_id, SUM(c.stream_intervals), SUM(c.hours_watched)
+        FROM category_daily_rollup c
+        JOIN ({new_pairs}) n ON n.category_id = c.category_id
+        GROUP BY n.{id_column}, c.day_date_id
+        ON CONFLICT ({id_column}, day_date_id) DO UPDATE SET
+            stream_intervals = {rollup_table}.stream_intervals + EXCLUDED.stream_intervals,
+            hours_watched = {rollup_table}.hours_watched + EXCLUDED.hours_watched;
+    ''')
+    cursor.execute(f"INSERT INTO {table_name} (category_id, {id_column}) {new_pairs};")
+
+
+# Id column and attribute columns of the dimensions that keep a type 2 history
+dimension_history_columns = {
+    "users": ("user_id", ["user_name", "login_name", "broadcaster_type"]),
+    "categories": ("category_id", ["category_name", "igdb_id"])
+}
+
+
+# Gets the column names in the header row of a curated CSV file
+def get_csv_columns(bucket_name, file_key):
+    header = storage.get_bytes(DataPath(bucket_name, file_key)).split(b"\n", 1)[0]
+
+    return header.decode("utf-8").strip().split(",")
+
+
+# Loads curated history rows of new and changed entities into a dimension
+# The dimension table keeps the latest version of every entity, the history table closes the
+# previous version of a changed entity and adds the new one
+# Files curated before the history existed have no valid_from column, their rows are valid from the file's partition
+def insert_dimension_history(cursor, table_name, bucket_name, file_key, region):
+    id_column, attribute_columns = dimension_history_columns[table_name]
+    columns = [id_column] + attribute_columns
+    column_names = ", ".join(columns)
+    set_columns = ", ".join(f"{column} = EXCLUDED.{column}" for column in attribute_columns)
+    has_valid_from = "valid_from" in get_csv_columns(bucket_name, file_key)
+
+    cursor.execute(f"CREATE TEMP TABLE {table_name}_staging (LIKE {table_name}_history) ON COMMIT DROP;")
+    if not has_valid_from: # the imported rows get the default, valid_from is part of the primary key so it can not be left null
+        cursor.execute(f"ALTER TABLE {table_name}_staging ALTER COLUMN valid_from SET DEFAULT %s;", (get_valid_from(*DataPath(bucket_name, file_key).partition),))
+    cursor.execute(get_import_query(f"{table_name}_staging", bucket_name, file_key, region, ",".join(columns + ["valid_from"] if has_valid_from else columns)))
+    cursor.execute(f'''
+        INSERT INTO {table_name} ({column_names})
+        SELECT {column_names} FROM {table_name}_staging
+        ON CONFLICT ({id_column}) DO UPDATE SET {set_columns};
+    ''')
+    cursor.execute(f'''
+        UPDATE {table_name}_history h SET valid_to = s.valid_from
+        FROM {table_name}_staging s
+        WHERE h.{id_column} = s.{id_column} AND h.valid_to IS NULL AND h.valid_from < s.valid_from;
+    ''')
+    cursor.execute(f'''
+        INSERT INTO {table_name}_history ({column_names}, valid_from)
+        SELECT {column_names}, valid_from FROM {table_name}_staging
+        ON CONFLICT ({id_column}, valid_from) DO NOTHING;
+    ''')
+
+
+# Gets table name from the curated file key
+def get_table_name(file_key):
+    start = "curated_"
+    end = "_data"
+    table_name = file_key.split(start)[1].split(end)[0]
+
+    return table_name
+
+
+# Connects to the Postgres database
+def get_db_connection():
+    conn = psycopg2.connect(
+        host=os.environ["DB_HOST"],
+        database=os.environ["DB_NAME"],
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASS"],
+        port=os.environ["DB_PORT"]
+    )
+
+    return conn
+
+
+# Loads one curated CSV file into its table, caller is responsible for committing
+def load_curated_file(cursor, bucket_name, file_key, region="us-west-2"):
+    table_name = get_table_name(file_key)
+    if table_name == "streams":
+        insert_streams_and_update_rollups(cursor, bucket_name, file_key, region)
+    elif table_name in dimension_history_columns:
+        insert_dimension_history(cursor, table_name, bucket_name, file_key, region)
+    elif table_name in bridge_rollup_tables:
+        insert_bridge_and_update_rollups(cursor, table_name, bucket_name, file_key, region)
+    else:
+        cursor.execute(get_import_query(table_name, bucket_name, file_key, region))
+
+    return table_name
+
+
+
+@metrics.instrument
 def lambda_handler(event, context):
     if event:
         # Event input is slightly different for S3 trigger and SNS trigger
@@ -26,12 +286,9 @@ def lambda_handler(event, context):
 
         # Get curated data info
         if event_source == "aws:s3": # users, genre_bridge, and game_mode_bridge data
-            bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-            file_key = event["Records"][0]["s3"]["object"]["key"]
+            bucket_name, file_key = DataPath.from_s3_event(event)
         elif event_source == "aws:sns": # categories and streams data
-            event_notification = ast.literal_eval(event["Records"][0]["Sns"]["Message"])
-            bucket_name = event_notification["Records"][0]["s3"]["bucket"]["name"]
-            file_key = event_notification["Records"][0]["s3"]["object"]["key"]
+            bucket_name, file_key = DataPath.from_sns_event(event)
         else:
             print("Invalid event source.")
             return {
@@ -39,38 +296,16 @@ def lambda_handler(event, context):
                 "body": json.dumps("Invalid event source.")
             }
 
-        # Time info
-        day_date_id = file_key.split("/")[1]
-        time_of_day_id = file_key.split("/")[2][-8:-4] 
-
-        # Table info
-        start = "curated_"
-        end = "_data"
-        table_name = file_key.split(start)[1].split(end)[0]
-        region = "us-west-2"
-        column_list = ""
-
+        conn = None
+        cursor = None
         try:
-            conn = psycopg2.connect(
-                host=os.environ["DB_HOST"],
-                database=os.environ["DB_NAME"],
-                user=os.environ["DB_USER"],
-                password=os.environ["DB_PASS"],
-                port=os.environ["DB_PORT"]
-            )
+            conn = get_db_connection()
             cursor = conn.cursor()
 
-            query = f'''
-                        SELECT aws_s3.table_import_from_s3(
-                            '{table_name}',
-                            '{column_list}',
-                            '(format csv, header true)',
-                            aws_commons.create_s3_uri('{bucket_name}', '{file_key}', '{region}')
-                        );
-                    '''
-
-            cursor.execute(query)
-            conn.commit()
+            with metrics.span("db_load"):
+                table_name = load_curated_file(cursor, bucket_name, file_key)
+                conn.commit()
+            metrics.set_property("table_name", table_name)
 
             print(f"Inserted data for table {table_name}!")
 
@@ -0,0 +1,93 @@
+import re
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parents[1])) # src, for pipeline_core
+from insert_data_to_db import get_db_connection
+
+########################### SUMMARY ###########################
+'''
+    Manages the access path indexes on the streams table that
+    the dashboard queries rely on. Indexes are built with
+    CREATE INDEX CONCURRENTLY so loads and dashboards are not
+    blocked while they build. Invalid indexes left behind by
+    a failed concurrent build are dropped and rebuilt.
+
+    Running this script directly builds any missing indexes.
+'''
+###############################################################
+
+
+# Index name and definition of every index managed on the streams table
+# Stream data is appended in day order, so a BRIN index on day_date_id stays small and selective
+streams_indexes = [
+    (
+        "streams_day_date_id_brin",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS streams_day_date_id_brin ON streams USING brin (day_date_id);"
+    ),
+    (
+        "streams_category_id_day_date_id_idx",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS streams_category_id_day_date_id_idx ON streams (category_id, day_date_id) INCLUDE (viewer_count, hours_watched);"
+    ),
+    (
+        "streams_user_id_idx",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS streams_user_id_idx ON streams (user_id);"
+    )
+]
+
+
+# Gets whether an index exists and whether it is valid
+def get_index_state(cursor, index_name):
+    cursor.execute('''
+        SELECT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s;
+    ''', (index_name,))
+    row = cursor.fetchone()
+    if row is None:
+        return "missing"
+
+    return "valid" if row[0] else "invalid"
+
+
+# Converts an index definition from pg_indexes into one that builds concurrently
+def to_concurrent_definition(definition):
+    return re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX CONCURRENTLY IF NOT EXISTS ", definition)
+
+
+# Builds one index concurrently, dropping it first if an earlier concurrent build left it invalid
+def build_index_concurrently(conn, index_name, definition):
+    # CREATE INDEX CONCURRENTLY can not run inside a transaction block
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        state = get_index_state(cursor, index_name)
+        if state == "invalid":
+            print(f"Index {index_name} is invalid. Rebuilding.")
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}";')
+        if state != "valid":
+            cursor.execute(definition)
+            print(f"Built index {index_name}.")
+    finally:
+        cursor.close()
+        conn.autocommit = previous_autocommit
+
+
+# Builds every managed streams index that does not exist yet and refreshes planner statistics
+def create_streams_indexes(conn):
+    for index_name, definition in streams_indexes:
+        build_index_concurrently(conn, index_name, definition)
+
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("ANALYZE streams;")
+    cursor.close()
+    conn.autocommit = previous_autocommit
+
+
+if __name__ == "__main__":
+    conn = get_db_connection()
+    create_streams_indexes(conn)
+    conn.close()
@@ -0,0 +1,102 @@
+import json
+import psycopg2
+from pipeline_core.partitions import DataPath
+from pipeline_core.twitch_api import get_twitch_headers
+from pipeline_core.metrics import metrics
+from pipeline_core.memory_profile import record_dataframes
+from pipeline_core.api_calls import api_calls
+from get_category_popularity import storage, get_category_popularity, upload_category_popularity
+from get_raw_users_data import get_stream_user_list, get_new_users_data
+from insert_data_to_db import get_db_connection, insert_streams_from_csv
+
+############################# SUMMARY #############################
+'''
+    Single post-curation stage for a curated streams interval.
+    The curated streams CSV is downloaded and parsed once, then
+    used in the same invocation to produce everything the
+    separate consumers used to produce on their own:
+        1. the category popularity data for the next cycle's
+           category groups (get_category_popularity)
+        2. the raw data of users not seen before
+           (get_raw_users_data)
+        3. the stream rows and rollups in PostgreSQL
+           (insert_data_to_db)
+    Outputs are the same as the separate functions. This function
+    is packaged with get_category_popularity.py,
+    get_raw_users_data.py and insert_data_to_db.py and replaces
+    their subscriptions to the curated streams SNS topic.
+
+    Every output can be made again, so a failed database load
+    fails the invocation and SNS retries the whole stage. A retry
+    finding the interval already loaded skips the load.
+'''
+###################################################################
+
+
+# Gets the curated stream CSV once, returning both the raw bytes and the parsed dataframe
+def get_curated_stream_data(storage, curated_streams_path):
+    curated_stream_csv = storage.get_bytes(curated_streams_path)
+    curated_stream_df = storage.parse_csv(curated_stream_csv, schema="curated_streams_data", columns=["stream_id", "user_id", "category_id"])
+
+    return curated_stream_csv, curated_stream_df
+
+
+# Loads the interval into PostgreSQL from the bytes already in memory instead of having the database read S3 again
+# A duplicate key means a retried invocation already loaded the interval and its rollups, so it is skipped
+# Any other error is raised after the rollback so the invocation fails and is retried
+def insert_stream_data(curated_stream_csv):
+    conn = None
+    cursor = None
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        insert_streams_from_csv(cursor, curated_stream_csv)
+        conn.commit()
+        print("Inserted data for table streams!")
+    except psycopg2.errors.UniqueViolation as e:
+        print(f"Interval was already loaded: {e}.")
+        conn.rollback()
+    except Exception as e:
+        print(f"An error occurred: {e}.")
+        if conn:
+            print("Rolling back transaction.")
+            conn.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+
+@metrics.instrument
+@api_calls.instrument(storage)
+def lambda_handler(event, context):
+    curated_streams_path = DataPath.from_sns_event(event)
+    day_date_id, time_of_day_id = curated_streams_path.partition
+    metrics.set_partition(curated_streams_path.partition)
+
+    headers = get_twitch_headers()
+
+    # Only S3 read of the interval
+    curated_stream_csv, curated_stream_df = get_curated_stream_data(storage, curated_streams_path)
+    metrics.count("rows_in", len(curated_stream_df))
+
+    # Category popularity is needed first since the next cycle's category groups depend on it
+    with metrics.span("category_popularity"):
+        category_popularity_df = get_category_popularity(curated_stream_df)
+    record_dataframes("category_popularity", curated_streams=curated_stream_df, category_popularity=category_popularity_df)
+    upload_category_popularity(storage, category_popularity_df)
+
+    # Stream rows and rollups in the database
+    with metrics.span("db_insert"):
+        insert_stream_data(curated_stream_csv)
+
+    # Users we have not collected data of yet
+    stream_user_list = get_stream_user_list(curated_stream_df)
+    get_new_users_data(headers, storage, stream_user_list, day_date_id, time_of_day_id)
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps('Successful program end!')
+    }
@@ -0,0 +1,95 @@
+import pandas as pd
+import json
+from pipeline_core.storage import ObjectNotFoundError
+from pipeline_core.dates import get_current_partition
+from pipeline_core.metrics import metrics
+from create_category_group_messages import storage, category_popularity_path, previous_categories_path, get_sent_categories_path, split_categories_into_groups, send_SQS_messages
+
+
+######################### SUMMARY #########################
+'''
+    Sends the category group messages of a cycle at the
+    15-minute tick, before the cycle's categories have been
+    collected. The groups are made from the previous cycle's
+    categories and the most recent popularity data, so the
+    stream collectors start right away instead of waiting for
+    category discovery and processing to finish.
+
+    The categories sent are saved for the interval. Once the
+    cycle's categories are processed, create_category_group_messages
+    only sends a follow-up group with the categories that are
+    new this cycle. If no previous categories exist, nothing is
+    sent and create_category_group_messages sends every group
+    as before.
+
+    Runs on the same schedule as get_raw_category_data and is
+    packaged with create_category_group_messages.py, whose storage
+    client and paths it shares.
+'''
+###########################################################
+
+
+# Gets the categories of the previous cycle, None if no cycle has saved them yet
+def get_previous_categories(storage):
+    try:
+        previous_categories_df = storage.read_csv(previous_categories_path, schema="category_ids")
+        print("Successful S3 get_object response for the previous categories.")
+        return previous_categories_df
+    except ObjectNotFoundError:
+        return None
+
+
+# Adds the most recent popularity data to the previous categories
+# The popularity data is only deleted once the groups made from it are sent, so a failed run can use it again
+def get_weighted_categories(storage, previous_categories_df):
+    try:
+        category_popularity_df = storage.read_csv(category_popularity_path, schema="category_popularity_data")
+        print("Successful S3 get_object response for the category popularity data.")
+    except ObjectNotFoundError:
+        print(f"Key: '{category_popularity_path.key}' does not exist! Every category gets the same weight.")
+        category_popularity_df = pd.DataFrame({"category_id": pd.Series(dtype=str), "num_of_streamers": pd.Series(dtype=float)})
+
+    weighted_category_df = pd.merge(previous_categories_df, category_popularity_df[["category_id", "num_of_streamers"]], on="category_id", how="left")
+    weighted_category_df["num_of_streamers"] = weighted_category_df["num_of_streamers"].fillna(1)
+
+    return weighted_category_df
+
+
+# Saves the categories sent for the interval so only new categories are sent once discovery finishes
+def upload_sent_categories(storage, weighted_category_df, partition):
+    storage.write_csv(weighted_category_df, get_sent_categories_path(partition), schema="category_ids")
+
+
+
+@metrics.instrument
+def lambda_handler(event, context):
+    partition = get_current_partition(storage)
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
+
+    previous_categories_df = get_previous_categories(storage)
+    if previous_categories_df is None:
+        print("No previous categories. Category groups will be sent once discovery finishes.")
+        return {
+            'statusCode': 200,
+            'body': json.dumps('No previous categories.')
+        }
+
+    weighted_category_df = get_weighted_categories(storage, previous_categories_df)
+    with metrics.span("grouping"):
+        category_groups, wvg = split_categories_into_groups(weighted_category_df)
+
+    # Saved before sending so a follow-up never sends these categories again
+    upload_sent_categories(storage, weighted_category_df, partition)
+    final_category_groups = [group for group in category_groups if len(group) != 0]
+    metrics.count("categories_sent", len(weighted_category_df))
+    metrics.count("groups_sent", len(final_category_groups))
+    send_SQS_messages(final_category_groups, day_date_id, time_of_day_id)
+    storage.delete(category_popularity_path) # popularity data is consumed once its groups are sent
+    print(f"Sent {len(final_category_groups)} speculative category groups for {day_date_id} {time_of_day_id}.")
+    print("WVG: " + str(wvg))
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps('Successful program end!')
+    }
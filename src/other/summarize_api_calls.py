@@ -0,0 +1,126 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).parents[1])) # src, for pipeline_core
+from pipeline_core.partitions import Partition, misc_bucket_name
+from pipeline_core.storage import S3Storage, LocalStorage
+from pipeline_core.api_calls import api_call_dataset
+from pipeline_core.dates import get_day_date_ids
+
+########################### SUMMARY ###########################
+'''
+    Summarizes the API call accounting the ingestion functions
+    save for every invocation. For every collection cycle in a
+    range of days, prints the calls made to Helix and IGDB, the
+    p50 and p99 latency, the 429 responses and failed calls,
+    the retries, the time spent waiting on the rate limit and
+    the fewest rate limit points Twitch reported as left, which
+    is how close the cycle came to its budget. The same is
+    summarized per endpoint over the whole range.
+
+    Reads the miscellaneous bucket, or a local data directory
+    with --data-root.
+
+    Example:
+        python summarize_api_calls.py --start 20260111 --end 20260117 --output api_calls.json
+'''
+###############################################################
+
+
+# Gets every recorded call of the days with the partition it belongs to, and the invocations per partition
+def get_api_calls(storage, day_date_ids):
+    api_calls = []
+    invocations = {}
+    for day_date_id in day_date_ids:
+        for path in storage.list_paths(misc_bucket_name, f"{api_call_dataset}/{day_date_id}/"):
+            partition = Partition.from_key(path.key)
+            invocations[partition] = invocations.get(partition, 0) + 1
+            for row in storage.read_csv_rows(path):
+                row["partition"] = partition
+                api_calls.append(row)
+
+    return api_calls, invocations
+
+
+# Gets the value at a percentile of sorted values, by nearest rank
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    rank = max(int(-(-percentile * len(sorted_values) // 100)), 1)
+
+    return sorted_values[rank - 1]
+
+
+# Summarizes a group of calls
+def summarize(api_calls):
+    latencies = sorted(float(call["latency_ms"]) for call in api_calls)
+    remaining = [int(call["remaining"]) for call in api_calls if call["remaining"] != ""]
+    statuses = [int(call["status"]) for call in api_calls]
+
+    return {
+        "calls": len(api_calls),
+        "twitch_calls": sum(1 for call in api_calls if call["api"] == "twitch"),
+        "igdb_calls": sum(1 for call in api_calls if call["api"] == "igdb"),
+        "throttled": sum(1 for status in statuses if status == 429),
+        "failed": sum(1 for status in statuses if status not in (200, 429)),
+        "retries": sum(1 for call in api_calls if int(call["retry"]) > 0),
+        "p50_ms": get_percentile(latencies, 50),
+        "p99_ms": get_percentile(latencies, 99),
+        "throttle_wait_s": round(sum(float(call["wait_ms"]) for call in api_calls) / 1000, 1),
+        "min_remaining": min(remaining) if remaining else None
+    }
+
+
+# Summarizes the calls of every cycle and of every endpoint
+def summarize_api_calls(api_calls, invocations):
+    calls_by_partition = {}
+    calls_by_endpoint = {}
+    for call in api_calls:
+        calls_by_partition.setdefault(call["partition"], []).append(call)
+        calls_by_endpoint.setdefault(f"{call['api']} {call['endpoint']}", []).append(call)
+
+    cycles = {}
+    for partition in sorted(calls_by_partition):
+        cycles[f"{partition.day_date_id}_{partition.time_of_day_id}"] = {"invocations": invocations[partition], **summarize(calls_by_partition[partition])}
+    endpoints = {endpoint: summarize(calls) for endpoint, calls in sorted(calls_by_endpoint.items())}
+
+    return {"cycles": cycles, "endpoints": endpoints}
+
+
+def print_summaries(summaries, name_header):
+    print(f"{name_header:<28} {'calls':>7} {'twitch':>7} {'igdb':>6} {'429s':>6} {'failed':>7} {'retries':>8} {'p50 ms':>8} {'p99 ms':>8} {'wait s':>8} {'min left':>9}")
+    for name, summary in summaries.items():
+        min_remaining = "" if summary["min_remaining"] is None else summary["min_remaining"]
+        print(
+            f"{name:<28} {summary['calls']:>7} {summary['twitch_calls']:>7} {summary['igdb_calls']:>6} {summary['throttled']:>6} {summary['failed']:>7} "
+            f"{summary['retries']:>8} {summary['p50_ms']:>8} {summary['p99_ms']:>8} {summary['throttle_wait_s']:>8} {min_remaining:>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarizes the Helix and IGDB calls of every collection cycle.")
+    parser.add_argument("--start", required=True, help="First day_date_id to summarize, e.g. 20260111")
+    parser.add_argument("--end", required=True, help="Last day_date_id to summarize, e.g. 20260117")
+    parser.add_argument("--data-root", default=None, help="Read from this local data directory instead of S3")
+    parser.add_argument("--output", default=None, help="Also write the summary to this JSON file")
+    args = parser.parse_args()
+
+    storage = LocalStorage(args.data_root) if args.data_root else S3Storage()
+    api_calls, invocations = get_api_calls(storage, get_day_date_ids(args.start, args.end))
+    if not api_calls:
+        print(f"No API calls recorded between {args.start} and {args.end}")
+        return
+
+    summary = summarize_api_calls(api_calls, invocations)
+    print_summaries(summary["cycles"], "cycle")
+    print()
+    print_summaries(summary["endpoints"], "endpoint")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(summary, output_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+############################## SUMMARY ##############################
+'''
+    Shared core of the pipeline's Lambda functions and local scripts.
+    Key parsing, storage access, the date and time of day lookups
+    and the API helpers are kept here once instead of being copied
+    into every function.
+
+        partitions           bucket names, DataPath and Partition
+        storage              S3 and local storage clients with shared readers and writers
+        schemas              column types of every CSV dataset
+        dates                current day_date_id and time_of_day_id, day_date_id ranges, valid_from times
+        twitch_api           Helix headers, requests and resumable pagination
+        igdb_api             IGDB wrapper, rate limiting and multiquery requests
+        igdb_game_cache      persistent cache of IGDB games
+        igdb_category_index  links IGDB games to Twitch categories
+        scd2_dimension       type 2 history of dimension data
+        metrics              per-invocation timing spans and counters as EMF JSON lines
+        api_calls            per-call accounting of Helix and IGDB requests
+        memory_profile       opt-in peak memory and allocation profiling of handlers
+
+    Every Lambda function is packaged with this directory. Local
+    scripts add the src directory to sys.path. Only the light
+    modules are imported here, the ones needing pandas, numpy or
+    the IGDB wrapper are imported from their own module.
+'''
+#####################################################################
+
+from pipeline_core.partitions import Partition, DataPath, raw_bucket_name, processed_bucket_name, curated_bucket_name, misc_bucket_name
+from pipeline_core.storage import StorageClient, S3Storage, LocalStorage, ObjectNotFoundError, WriteConflictError
+from pipeline_core.dates import get_current_partition
+from pipeline_core.metrics import Metrics, metrics
+from pipeline_core.api_calls import APICallLog, api_calls
@@ -0,0 +1,92 @@
+import uuid
+import functools
+import threading
+from pipeline_core.partitions import DataPath, misc_bucket_name
+from pipeline_core.metrics import metrics
+
+############################## SUMMARY ##############################
+'''
+    Accounting of every Helix and IGDB call of an invocation. The
+    API helpers record one row per HTTP request, retries included,
+    with the endpoint, its latency, the status code, the rate limit
+    points Twitch reported as left and the time spent waiting on
+    the rate limit before it:
+
+        started_at      unix time the request was sent
+        api             "twitch" or "igdb"
+        endpoint        such as "helix/streams" or "multiquery.pb"
+        status          HTTP status, 0 if no response was received
+        latency_ms      time the request took
+        remaining       Ratelimit-Remaining header, empty for IGDB
+        retry           0 for the first try, 1 for the first retry...
+        wait_ms         time waited on the rate limit before sending
+
+    Handlers calling the APIs are decorated with
+    api_calls.instrument, which saves the rows as one small CSV per
+    invocation, also when the handler raises, under the partition
+    of the cycle in the miscellaneous bucket:
+
+        api_call_metrics/{day_date_id}/api_call_metrics_{day_date_id}_{time_of_day_id}_{function}_{invocation}.csv
+
+    so the calls of one cycle are every file of its partition.
+    summarize_api_calls.py aggregates them into calls per cycle,
+    latency percentiles and throttle time.
+'''
+#####################################################################
+
+
+api_call_columns = ["started_at", "api", "endpoint", "status", "latency_ms", "remaining", "retry", "wait_ms"]
+api_call_dataset = "api_call_metrics"
+
+
+class APICallLog:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.rows = []
+
+    # Records one request, started_at is the time.time() it was sent
+    def record(self, api, endpoint, started_at, status, latency_ms, remaining=None, retry=0, wait_ms=0):
+        row = [round(started_at, 3), api, endpoint, status, round(latency_ms, 1), "" if remaining is None else remaining, retry, round(wait_ms, 1)]
+        with self.lock:
+            self.rows.append(row)
+
+    # Saves the recorded rows under the partition the handler set in the metrics
+    def save(self, storage, function_name, invocation_id):
+        with self.lock:
+            rows = list(self.rows)
+        day_date_id = metrics.properties.get("day_date_id")
+        time_of_day_id = metrics.properties.get("time_of_day_id")
+        if not rows or day_date_id is None or time_of_day_id is None:
+            return
+
+        path = DataPath.for_partition(misc_bucket_name, api_call_dataset, (day_date_id, time_of_day_id), suffix=f"_{function_name}_{invocation_id}")
+        try:
+            storage.write_csv_rows(api_call_columns, rows, path)
+        except Exception as e: # losing the accounting must not fail the invocation
+            print(f"Could not save API call metrics to {path.uri}: {e}")
+
+    # Decorates a lambda_handler so the calls of every invocation are saved to storage when it returns or raises
+    # Goes below metrics.instrument, so the partition set by the handler is still in the metrics when saving
+    def instrument(self, storage):
+        def decorator(handler):
+            @functools.wraps(handler)
+            def instrumented_handler(event, context):
+                self.reset()
+                try:
+                    return handler(event, context)
+                finally:
+                    invocation_id = getattr(context, "aws_request_id", None) or uuid.uuid4().hex
+                    self.save(storage, handler.__module__, invocation_id)
+
+            return instrumented_handler
+
+        return decorator
+
+
+# Shared by the API helpers and the handler of the function
+api_calls = APICallLog()
+
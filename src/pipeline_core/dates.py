@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from pipeline_core.partitions import Partition, DataPath, raw_bucket_name
+
+############################## SUMMARY ##############################
+'''
+    Gets the day_date_id and time_of_day_id of the current
+    collection cycle from the date and time of day tables in the
+    raw layer. Times are in US/Pacific and rounded to the nearest
+    15-minute time of day. After 23:52 the cycle belongs to 00:00
+    of the next day. Date ranges of scripts are expanded into
+    their day_date_ids here as well, and the valid_from time of
+    dimension rows is made from an interval's ids.
+
+    The tables are read with the standard library through any
+    storage client, so the Lambda functions and the local scripts
+    get the same ids.
+'''
+#####################################################################
+
+
+day_dates_path = DataPath(raw_bucket_name, "raw_day_dates_data/raw_day_dates_data.csv")
+time_of_day_path = DataPath(raw_bucket_name, "raw_time_of_day_data/raw_time_of_day_data.csv")
+
+
+# Gets the current date in US/Pacific without its time zone
+def get_pacific_date(current_date=None):
+    current_date = current_date or datetime.now(ZoneInfo("US/Pacific"))
+    return current_date.astimezone(ZoneInfo("US/Pacific")).replace(tzinfo=None)
+
+
+# Gets day date id based off of the current date
+def get_day_date_id(storage, current_date=None):
+    current_date = get_pacific_date(current_date)
+    date_rows = storage.read_csv_rows(day_dates_path)
+
+    # If later than 23:52, the day will be considered the next day
+    if current_date.hour == 23 and current_date.minute > 52:
+        current_date += timedelta(days=1)
+
+    return next(row["day_date_id"] for row in date_rows if row["the_date"] == str(current_date.date()))
+
+
+# Gets time of day id based off of the current time
+def get_time_of_day_id(storage, current_date=None):
+    current_date = get_pacific_date(current_date)
+    time_of_day_rows = storage.read_csv_rows(time_of_day_path)
+
+    # If later than 23:52, next nearest time will be 00:00
+    if current_date.hour == 23 and current_date.minute > 52:
+        return "0000"
+
+    minimum_diff = 1000
+    time_of_day_id = ""
+    for row in time_of_day_rows:
+        time = row["time_24h"]
+        date_time_compare = datetime(current_date.year, current_date.month, current_date.day, int(time[0:2]), int(time[3:5]))
+        diff = abs((current_date - date_time_compare).total_seconds())
+        if diff < minimum_diff:
+            minimum_diff = diff
+            time_of_day_id = row["time_of_day_id"]
+
+    return time_of_day_id
+
+
+# Gets every day_date_id between the start and end day, inclusive
+def get_day_date_ids(start_day_date_id, end_day_date_id):
+    current_date = datetime.strptime(start_day_date_id, "%Y%m%d")
+    end_date = datetime.strptime(end_day_date_id, "%Y%m%d")
+    day_date_ids = []
+    while current_date <= end_date:
+        day_date_ids.append(current_date.strftime("%Y%m%d"))
+        current_date += timedelta(days=1)
+
+    return day_date_ids
+
+
+# Gets the valid_from time of an interval from its day_date_id and time_of_day_id
+def get_valid_from(day_date_id, time_of_day_id):
+    return f"{day_date_id[:4]}-{day_date_id[4:6]}-{day_date_id[6:8]} {time_of_day_id[:2]}:{time_of_day_id[2:4]}:00"
+
+
+# Gets the partition of the current collection cycle
+def get_current_partition(storage, current_date=None):
+    current_date = current_date or datetime.now(ZoneInfo("US/Pacific"))
+    return Partition(get_day_date_id(storage, current_date), get_time_of_day_id(storage, current_date))
@@ -0,0 +1,123 @@
+import os
+import time
+import requests
+from igdb.wrapper import IGDBWrapper
+from igdb.igdbapi_pb2 import MultiQueryResultArray, Game
+from pipeline_core.metrics import metrics
+from pipeline_core.api_calls import api_calls
+
+############################## SUMMARY ##############################
+'''
+    IGDB API helpers. Games are requested through IGDB's multiquery
+    endpoint, which runs up to 10 queries of 100 games each in one
+    request, and all fields are requested in the same pass.
+    Responses are requested as protobuf and decoded with the
+    wrapper's generated messages, which is a smaller payload than
+    JSON and needs no text parsing. Requests are spaced out to stay
+    within IGDB's rate limit. Requests, waits and decoding are
+    recorded in the invocation's metrics, and every request in its
+    API call accounting.
+'''
+#####################################################################
+
+
+# IGDB allows 4 requests per second, each multiquery request can hold 10 queries of 100 games
+igdb_requests_per_second = 4
+queries_per_request = 10
+games_per_query = 100
+
+
+# Makes IGDB wrapper to interact with IGDB API
+def make_wrapper():
+    client_id = os.environ["client_id"]
+    access_token = os.environ["access_token"]
+    wrapper = IGDBWrapper(client_id, access_token)
+
+    return wrapper
+
+
+# Spaces out requests to stay within IGDB's rate limit
+class IGDBRateLimiter:
+    def __init__(self, requests_per_second=igdb_requests_per_second):
+        self.interval = 1 / requests_per_second
+        self.last_request_time = 0
+
+    # Waits until the next request is allowed, returns the seconds waited
+    def wait(self):
+        sleep_time = max(self.last_request_time + self.interval - time.time(), 0)
+        if sleep_time > 0:
+            with metrics.span("igdb_rate_limit_wait"):
+                time.sleep(sleep_time)
+        self.last_request_time = time.time()
+
+        return sleep_time
+
+
+# Builds a multiquery body with one named games query per chunk of up to 100 IGDB ids
+def get_multiquery_body(igdb_id_chunks, fields):
+    fields_arg = ", ".join(fields)
+    queries = []
+    for i, igdb_id_chunk in enumerate(igdb_id_chunks):
+        igdb_ids_arg = ",".join(str(igdb_id) for igdb_id in igdb_id_chunk)
+        queries.append(f'query games "games_{i}" {{ fields {fields_arg}; where id = ({igdb_ids_arg}); limit {games_per_query}; }};')
+
+    return "\n".join(queries)
+
+
+# Gets a game record with the requested fields from a decoded protobuf game
+# Fields referencing other endpoints, such as genres, only have their ids requested
+def get_game_record(game, fields):
+    game_record = {"id": game.id}
+    for field in fields:
+        value = getattr(game, field)
+        if isinstance(value, str):
+            game_record[field] = value
+        elif len(value) > 0: # games without data for a field leave it out, like the JSON responses
+            game_record[field] = [reference.id for reference in value]
+
+    return game_record
+
+
+# Calls IGDB's multiquery endpoint for up to 10 chunks of 100 games and returns every game found
+# Throttled and failed calls are retried with backoff a few times before giving up
+def get_igdb_games(wrapper, rate_limiter, igdb_id_chunks, fields, max_attempts=5):
+    body = get_multiquery_body(igdb_id_chunks, fields)
+    attempt = 0
+    while True:
+        wait_ms = rate_limiter.wait() * 1000
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            with metrics.span("igdb_request"):
+                byte_array = wrapper.api_request("multiquery.pb", body)
+            api_calls.record("igdb", "multiquery.pb", started_at, 200, (time.perf_counter() - start) * 1000, retry=attempt, wait_ms=wait_ms)
+            break
+        except requests.exceptions.RequestException as e:
+            status = e.response.status_code if e.response is not None else 0
+            api_calls.record("igdb", "multiquery.pb", started_at, status, (time.perf_counter() - start) * 1000, retry=attempt, wait_ms=wait_ms)
+            metrics.count("igdb_errors")
+            attempt += 1
+            if attempt == max_attempts:
+                raise RuntimeError(f"An exception has occurred calling the IGDB multiquery endpoint: {e}")
+            print(f"An exception has occurred calling the IGDB multiquery endpoint: {e}. Retrying in {2 ** attempt} seconds")
+            time.sleep(2 ** attempt)
+
+    games = []
+    with metrics.span("parse"):
+        for query_result in MultiQueryResultArray.FromString(byte_array).result:
+            games.extend(get_game_record(Game.FromString(result), fields) for result in query_result.results)
+    metrics.count("igdb_games_fetched", len(games))
+
+    return games
+
+
+# Gets the games of all IGDB ids with the requested fields, 1000 games per request
+def get_raw_igdb_game_data(wrapper, igdb_ids, fields):
+    rate_limiter = IGDBRateLimiter()
+    igdb_id_chunks = [igdb_ids[i:i + games_per_query] for i in range(0, len(igdb_ids), games_per_query)]
+    games = []
+    for i in range(0, len(igdb_id_chunks), queries_per_request):
+        games.extend(get_igdb_games(wrapper, rate_limiter, igdb_id_chunks[i:i + queries_per_request], fields))
+    print(f"Got {len(games)} IGDB games in {-(-len(igdb_id_chunks) // queries_per_request)} requests.")
+
+    return games
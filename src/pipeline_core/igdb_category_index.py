@@ -0,0 +1,40 @@
+import pandas as pd
+
+############################ SUMMARY ############################
+'''
+    Links raw IGDB bridge data to Twitch categories. A dict index of
+    igdb_id to the list of category ids with that IGDB id is built
+    once from the category data, then the games are matched to it
+    and expanded into one row per category and bridge id with
+    vectorized map and explode operations. One IGDB game can be
+    linked to several Twitch categories, and every one of them
+    gets the game's bridge rows.
+
+    Used by the genre bridge and game mode bridge processing
+    functions and their local scripts.
+'''
+#################################################################
+
+
+# Builds the igdb_id -> [category_id] index, categories without an IGDB id are left out
+def get_igdb_category_index(category_df):
+    linked_category_df = category_df[category_df["igdb_id"] != "NA"].drop_duplicates(subset=["igdb_id", "category_id"])
+    igdb_category_index = {}
+    for igdb_id, category_id in zip(linked_category_df["igdb_id"], linked_category_df["category_id"]):
+        igdb_category_index.setdefault(igdb_id, []).append(category_id)
+
+    return igdb_category_index
+
+
+# Converts raw IGDB bridge data into one row per category and bridge id
+# field is the IGDB field of the raw data, such as "genres", and id_column the name of its ids in the output
+def get_processed_bridge_df(raw_bridge_data, igdb_category_index, field, id_column):
+    games_df = pd.DataFrame(raw_bridge_data["data"], columns=["id", "name", field])
+    games_df = games_df.dropna(subset=[field]) # some games have no data for the field
+    games_df = games_df.rename(columns={"id": "igdb_id", "name": "game_name", field: id_column})
+
+    games_df["category_id"] = games_df["igdb_id"].astype(str).map(igdb_category_index)
+    games_df = games_df.dropna(subset=["category_id"])
+    games_df = games_df.explode("category_id").explode(id_column)
+
+    return games_df[["igdb_id", "category_id", "game_name", id_column]].reset_index(drop=True)
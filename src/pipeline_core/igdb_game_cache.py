@@ -0,0 +1,87 @@
+import os
+import time
+from pipeline_core.storage import ObjectNotFoundError
+
+############################## SUMMARY ##############################
+'''
+    Persistent cache of IGDB game records keyed by igdb_id. IGDB
+    game data hardly ever changes, so games are only requested from
+    the API when they are not in the cache or their record is older
+    than the TTL. The cache is one JSON file, kept in S3 or in the
+    local data directory through a storage client, and is read once
+    and written back once per run. When it grows past its maximum
+    size, the games that were least recently used are evicted.
+
+    IGDB ids that IGDB has no game for are cached too, so they are
+    not requested again every time they show up. Records are only
+    reused while the requested fields are the same as when they were
+    cached.
+
+    Two runs saving at the same time can drop each other's new
+    records, which only means those games are requested again.
+'''
+#####################################################################
+
+
+# How long cached games are considered fresh and how many games are kept
+igdb_cache_ttl_seconds = int(os.environ.get("igdb_cache_ttl_days", "30")) * 24 * 60 * 60
+igdb_cache_max_entries = int(os.environ.get("igdb_cache_max_entries", "200000"))
+
+
+class IGDBGameCache:
+    # path is the DataPath of the cache file in the storage client's buckets
+    def __init__(self, storage, path, fields, ttl_seconds=igdb_cache_ttl_seconds, max_entries=igdb_cache_max_entries):
+        self.storage = storage
+        self.path = path
+        self.fields = sorted(fields)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = self.load()
+
+    # Reads the cached games, the cache starts empty if it does not exist or was made with different fields
+    def load(self):
+        try:
+            cache = self.storage.read_json(self.path)
+        except ObjectNotFoundError as e: # if the cache does not exist yet, start with an empty cache
+            print(f"Starting with an empty IGDB game cache: {e}")
+            return {}
+
+        if cache["fields"] != self.fields:
+            print("IGDB game cache was made with different fields. Starting with an empty cache.")
+            return {}
+        print(f"Loaded {len(cache['games'])} cached IGDB games.")
+
+        return cache["games"]
+
+    # Gets the games of the IGDB ids, only requesting ids that are not cached or are stale
+    # fetch_games takes a list of IGDB ids and returns the list of game records IGDB has for them
+    def get_games(self, igdb_ids, fetch_games):
+        now = int(time.time())
+        missing_ids = [igdb_id for igdb_id in igdb_ids if str(igdb_id) not in self.entries or self.entries[str(igdb_id)]["fetched_at"] < now - self.ttl_seconds]
+        print(f"IGDB game cache hits: {len(igdb_ids) - len(missing_ids)}, misses: {len(missing_ids)}")
+
+        if missing_ids:
+            fetched_games = {game["id"]: game for game in fetch_games(missing_ids)}
+            for igdb_id in missing_ids:
+                self.entries[str(igdb_id)] = {"fetched_at": now, "game": fetched_games.get(igdb_id)}
+
+        games = []
+        for igdb_id in igdb_ids:
+            entry = self.entries[str(igdb_id)]
+            entry["last_used_at"] = now
+            if entry["game"] is not None:
+                games.append(entry["game"])
+
+        return games
+
+    # Removes the least recently used games once the cache is larger than its maximum size
+    def evict(self):
+        if len(self.entries) > self.max_entries:
+            keep_ids = sorted(self.entries, key=lambda igdb_id: self.entries[igdb_id].get("last_used_at", 0), reverse=True)[:self.max_entries]
+            print(f"Evicting {len(self.entries) - self.max_entries} least recently used IGDB games.")
+            self.entries = {igdb_id: self.entries[igdb_id] for igdb_id in keep_ids}
+
+    # Writes the cache back to where it was read from
+    def save(self):
+        self.evict()
+        self.storage.write_json({"fields": self.fields, "games": self.entries}, self.path)
@@ -0,0 +1,78 @@
+import os
+import functools
+import tracemalloc
+from pipeline_core.metrics import metrics, memory_profiling, get_peak_rss_bytes
+
+############################## SUMMARY ##############################
+'''
+    Opt-in memory profiling of an invocation, turned on by setting
+    the memory_profiling environment variable to "true". It costs
+    time and memory, so it is meant for runs that size a function's
+    memory setting and is left off otherwise. When it is off
+    nothing in this module does any work.
+
+    When it is on, metrics.instrument wraps the handler with
+    profile_memory, which traces allocations with tracemalloc for
+    the invocation and adds to its metrics record:
+
+        peak_rss_bytes      highest resident set size of the process
+        traced_peak_bytes   highest memory allocated by Python code
+        top_allocations     the lines that allocated the most memory
+                            still held at the end, as a property
+
+    Every span also records the peak RSS when it ends, as
+    "{span}_peak_rss_bytes", so the stage where memory grows shows
+    in the record. Handlers record the deep memory usage of their
+    DataFrames at stage boundaries with record_dataframes, such as
+    "scd2_current_users_bytes".
+
+    The peak RSS is the high water mark of the process, and Lambda
+    reuses the process for warm invocations, so it is the peak of
+    every invocation of the container so far. The traced peak is of
+    this invocation only.
+'''
+#####################################################################
+
+
+top_allocation_count = int(os.environ.get("memory_profiling_top_allocations", "10"))
+
+
+# Records the deep memory usage of DataFrames at the end of a stage, named by keyword
+def record_dataframes(stage, **dataframes):
+    if not memory_profiling:
+        return
+    for name, df in dataframes.items():
+        metrics.set_max(f"{stage}_{name}_bytes", int(df.memory_usage(deep=True).sum()))
+
+
+# Gets the lines holding the most memory in a tracemalloc snapshot, leaving out tracemalloc's own
+def get_top_allocations(snapshot):
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    top_allocations = []
+    for statistic in snapshot.statistics("lineno")[:top_allocation_count]:
+        frame = statistic.traceback[0]
+        top_allocations.append({
+            "location": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+            "size_bytes": statistic.size,
+            "count": statistic.count
+        })
+
+    return top_allocations
+
+
+# Decorates a lambda_handler so its memory is traced and recorded in the invocation's metrics
+def profile_memory(handler):
+    @functools.wraps(handler)
+    def profiled_handler(event, context):
+        tracemalloc.start()
+        try:
+            return handler(event, context)
+        finally:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            metrics.set_max("peak_rss_bytes", get_peak_rss_bytes())
+            metrics.set_max("traced_peak_bytes", traced_peak)
+            metrics.set_property("top_allocations", get_top_allocations(snapshot))
+
+    return profiled_handler
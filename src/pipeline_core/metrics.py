@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import resource
+import functools
+import threading
+from contextlib import contextmanager
+
+############################## SUMMARY ##############################
+'''
+    Timing and metrics of one invocation of a pipeline function.
+    Spans time a stage, such as an S3 GET, an API page, parsing or
+    dedupe, and counters count things such as rows in and out,
+    pages fetched and 429 responses. Spans and counters with the
+    same name are added up over the invocation and written as one
+    JSON line when the handler returns:
+
+        {"_aws": {...}, "function": "process_raw_streams_data",
+         "day_date_id": "20260111", "time_of_day_id": "1645",
+         "handler_ms": 812.4, "handler_calls": 1,
+         "s3_get_ms": 301.2, "s3_get_calls": 14, "rows_in": 5120, ...}
+
+    The line is in CloudWatch Embedded Metric Format, so CloudWatch
+    turns it into metrics of the function without any API calls,
+    and it is plain JSON to read from the logs offline. Setting the
+    metrics_log_path environment variable also appends every line
+    to that file, which is how local runs keep them.
+
+    The storage clients and the API helpers record their own spans,
+    handlers are decorated with metrics.instrument and only add
+    their own stages and row counts. Recording is thread safe since
+    some functions call the API from threads.
+
+    Setting the memory_profiling environment variable to "true"
+    also records the memory used by the invocation and its stages,
+    see memory_profile.py.
+'''
+#####################################################################
+
+
+metrics_namespace = os.environ.get("metrics_namespace", "TwitchPipeline")
+memory_profiling = os.environ.get("memory_profiling", "false").lower() == "true"
+
+
+# Gets the highest resident set size of the process so far, ru_maxrss is in kilobytes on Linux
+def get_peak_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Metrics:
+    def __init__(self, namespace=metrics_namespace):
+        self.namespace = namespace
+        self.lock = threading.Lock()
+        self.reset()
+
+    # Starts the record of a new invocation
+    def reset(self, function_name=""):
+        with self.lock:
+            self.function_name = function_name
+            self.span_ms = {}
+            self.span_calls = {}
+            self.counters = {}
+            self.properties = {}
+
+    # Adds a value that is written with the record but is not a metric, such as the day_date_id
+    def set_property(self, name, value):
+        with self.lock:
+            self.properties[name] = value
+
+    def set_partition(self, partition):
+        self.set_property("day_date_id", partition[0])
+        self.set_property("time_of_day_id", partition[1])
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # Keeps the highest value recorded under a name, such as a peak memory usage
+    def set_max(self, name, value):
+        with self.lock:
+            self.counters[name] = max(self.counters.get(name, value), value)
+
+    def add_span(self, name, duration_ms):
+        with self.lock:
+            self.span_ms[name] = self.span_ms.get(name, 0) + duration_ms
+            self.span_calls[name] = self.span_calls.get(name, 0) + 1
+
+    # Times the code in the with block, also when it raises
+    # With memory profiling on, the peak RSS at the end of the span is recorded too
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, (time.perf_counter() - start) * 1000)
+            if memory_profiling:
+                self.set_max(f"{name}_peak_rss_bytes", get_peak_rss_bytes())
+
+    # Gets the record of the invocation in Embedded Metric Format
+    def get_record(self):
+        with self.lock:
+            metric_values = {}
+            metric_units = {}
+            for name, duration_ms in self.span_ms.items():
+                metric_values[f"{name}_ms"] = round(duration_ms, 3)
+                metric_units[f"{name}_ms"] = "Milliseconds"
+                metric_values[f"{name}_calls"] = self.span_calls[name]
+                metric_units[f"{name}_calls"] = "Count"
+            for name, value in self.counters.items():
+                metric_values[name] = value
+                metric_units[name] = "Bytes" if name.endswith("_bytes") else "Count"
+            properties = dict(self.properties)
+
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [["function"]],
+                    "Metrics": [{"Name": name, "Unit": unit} for name, unit in metric_units.items()]
+                }]
+            },
+            "function": self.function_name,
+            **properties,
+            **metric_values
+        }
+
+    # Writes the record as one JSON line to the logs, and to metrics_log_path if it is set
+    def flush(self):
+        line = json.dumps(self.get_record())
+        print(line)
+        metrics_log_path = os.environ.get("metrics_log_path")
+        if metrics_log_path:
+            with open(metrics_log_path, "a") as f:
+                f.write(line + "\n")
+
+    # Decorates a lambda_handler so every invocation gets its own record, named after the handler's module
+    # The whole invocation is the "handler" span and the record is written even if the handler raises
+    def instrument(self, handler):
+        if memory_profiling:
+            from pipeline_core.memory_profile import profile_memory # only imported when profiling
+            handler = profile_memory(handler)
+
+        @functools.wraps(handler)
+        def instrumented_handler(event, context):
+            self.reset(handler.__module__)
+            try:
+                with self.span("handler"):
+                    return handler(event, context)
+            except Exception:
+                self.count("errors")
+                raise
+            finally:
+                self.flush()
+
+        return instrumented_handler
+
+
+# Shared by the storage clients, the API helpers and the handler of the function
+metrics = Metrics()
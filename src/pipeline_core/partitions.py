@@ -0,0 +1,88 @@
+import re
+import ast
+from collections import namedtuple
+
+############################## SUMMARY ##############################
+'''
+    Bucket names, data paths and partitions of the data lake. Every
+    data file is partitioned by the day_date_id and time_of_day_id
+    of the cycle it was collected in, which is part of its key:
+
+        {dataset}/{day_date_id}/{dataset}_{day_date_id}_{time_of_day_id}.csv
+
+    Some files have more after the time of day id, such as the
+    batch id of raw stream files or the "_refresh" suffix of
+    refreshed dimension data. Partition.from_key reads the
+    partition of any of these keys and DataPath.suffix what comes
+    after it, so handlers do not split keys by position themselves.
+'''
+#####################################################################
+
+
+raw_bucket_name = "twitch-project-raw-layer"
+processed_bucket_name = "twitch-project-processed-layer"
+curated_bucket_name = "twitch-project-curated-layer"
+misc_bucket_name = "twitch-project-miscellaneous"
+
+# The day date id and time of day id at the end of a data file name, and anything after them up to the extension
+partition_pattern = re.compile(r"_(\d{8})_(\d{4})(_[^/]*)?\.\w+$")
+
+
+# The collection cycle a data file belongs to, unpacks as (day_date_id, time_of_day_id)
+class Partition(namedtuple("Partition", ["day_date_id", "time_of_day_id"])):
+    __slots__ = ()
+
+    # Gets the partition of a data file from its key
+    @classmethod
+    def from_key(cls, key):
+        match = partition_pattern.search(key)
+        if match is None:
+            raise ValueError(f"No day_date_id and time_of_day_id found in key: {key}")
+
+        return cls(match.group(1), match.group(2))
+
+
+# Where an object is kept, a bucket and a key in it
+class DataPath(namedtuple("DataPath", ["bucket_name", "key"])):
+    __slots__ = ()
+
+    # Gets the path of a dataset's file for a partition
+    # suffix is added after the time of day id, such as "_refresh"
+    @classmethod
+    def for_partition(cls, bucket_name, dataset, partition, suffix="", extension="csv"):
+        day_date_id, time_of_day_id = partition
+        return cls(bucket_name, f"{dataset}/{day_date_id}/{dataset}_{day_date_id}_{time_of_day_id}{suffix}.{extension}")
+
+    # Gets the path of an S3 URI such as "s3://bucket/key.csv"
+    @classmethod
+    def from_uri(cls, uri):
+        bucket_name, key = uri.removeprefix("s3://").split("/", 1)
+        return cls(bucket_name, key)
+
+    # Gets the path of the object that triggered an S3 event notification
+    @classmethod
+    def from_s3_event(cls, event):
+        s3_record = event["Records"][0]["s3"]
+        return cls(s3_record["bucket"]["name"], s3_record["object"]["key"])
+
+    # Gets the path of the object of an S3 event notification delivered through an SNS topic
+    @classmethod
+    def from_sns_event(cls, event):
+        return cls.from_s3_event(ast.literal_eval(event["Records"][0]["Sns"]["Message"]))
+
+    @property
+    def uri(self):
+        return f"s3://{self.bucket_name}/{self.key}"
+
+    @property
+    def partition(self):
+        return Partition.from_key(self.key)
+
+    # What comes after the time of day id, such as "_refresh", empty if nothing does
+    @property
+    def suffix(self):
+        match = partition_pattern.search(self.key)
+        if match is None:
+            raise ValueError(f"No day_date_id and time_of_day_id found in key: {self.key}")
+
+        return match.group(3) or ""
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+########################### SUMMARY ###########################
+'''
+    Type 2 slowly changing dimension engine used when curating
+    user and category data. A hash of the attribute columns is
+    stored for every entity in the current dimension data. New
+    data is hashed the same way and compared against the stored
+    hashes, so changes are found without comparing every column
+    of every row. New entities and entities whose hash changed
+    are returned as history rows with a valid_from time. The
+    previous version of a changed entity is closed when the
+    history rows are loaded into the database.
+
+    Entity ids are numeric Twitch ids, which lets the lookup of
+    stored hashes be a binary search over sorted uint64 arrays.
+'''
+###############################################################
+
+
+# Computes a 64-bit hash of the attribute columns of every row
+# Values are compared as strings so "115" and 115 hash the same no matter how the CSV was read
+def compute_row_hash(df, attribute_columns):
+    return pd.util.hash_pandas_object(df[attribute_columns].astype(str), index=False).to_numpy()
+
+
+# Makes sure the current dimension data has a row hash and valid_from for every entity
+# Current data written before the hashes existed gets them computed once here
+def prepare_current_data(current_df, attribute_columns):
+    if "valid_from" not in current_df.columns:
+        current_df["valid_from"] = ""
+    if "row_hash" not in current_df.columns:
+        current_df["row_hash"] = compute_row_hash(current_df, attribute_columns)
+    elif current_df["row_hash"].dtype != np.uint64:
+        row_hash = current_df["row_hash"].astype(str)
+        missing_hash = row_hash == ""
+        row_hash[missing_hash] = compute_row_hash(current_df[missing_hash], attribute_columns).astype(str)
+        current_df["row_hash"] = row_hash.to_numpy(dtype=np.uint64)
+
+    return current_df
+
+
+# Compares new data against the current dimension data
+# Returns the updated current dimension data and the history rows for new and changed entities
+# The current dimension dataframe is updated in place to avoid copying it
+def apply_scd2_changes(current_df, incoming_df, id_column, attribute_columns, valid_from):
+    columns = [id_column] + attribute_columns
+    current_df = prepare_current_data(current_df, attribute_columns)
+
+    incoming_df = incoming_df[columns].drop_duplicates(subset=[id_column], keep="last").reset_index(drop=True)
+    incoming_ids = pd.to_numeric(incoming_df[id_column]).to_numpy(dtype=np.uint64)
+    incoming_hashes = compute_row_hash(incoming_df, attribute_columns)
+
+    # Find where each incoming entity is in the current data with a binary search over the sorted ids
+    current_ids = pd.to_numeric(current_df[id_column]).to_numpy(dtype=np.uint64)
+    order = np.argsort(current_ids)
+    sorted_ids = current_ids[order]
+    positions = np.searchsorted(sorted_ids, incoming_ids)
+    positions[positions == len(sorted_ids)] = 0 # ids larger than every current id can not match
+    is_known = sorted_ids[positions] == incoming_ids if len(sorted_ids) > 0 else np.zeros(len(incoming_ids), dtype=bool)
+    current_positions = order[positions[is_known]]
+
+    # Compare hashes of known entities in one vectorized pass
+    is_changed = np.zeros(len(incoming_df), dtype=bool)
+    is_changed[is_known] = current_df["row_hash"].to_numpy()[current_positions] != incoming_hashes[is_known]
+
+    history_df = incoming_df.copy()
+    history_df["row_hash"] = incoming_hashes
+    history_df["valid_from"] = valid_from
+    is_history = ~is_known | is_changed
+
+    # Overwrite changed entities in the current data and add the new ones
+    changed_positions = current_positions[is_changed[is_known]]
+    if len(changed_positions) > 0:
+        for column in attribute_columns + ["row_hash", "valid_from"]: # one column at a time so each keeps its dtype
+            current_df.iloc[changed_positions, current_df.columns.get_loc(column)] = history_df.loc[is_changed, column].to_numpy()
+    if (~is_known).any():
+        current_df = pd.concat([current_df, history_df[~is_known]], ignore_index=True)
+
+    history_df = history_df[is_history].reset_index(drop=True)
+
+    return current_df[columns + ["row_hash", "valid_from"]], history_df[columns + ["valid_from"]]
@@ -0,0 +1,108 @@
+############################## SUMMARY ##############################
+'''
+    Column types of every CSV dataset of the data lake, so every
+    function reads and writes a dataset with the same types instead
+    of pandas inferring them from each file. Without it an id is
+    int64 in one function and a string in the next, and ids such as
+    "NA" igdb_ids or ids with leading zeros do not survive the trip.
+
+        ids          Twitch and IGDB ids and the day and time of day
+                     ids are strings, like in the PostgreSQL schema
+        categories   low-cardinality text, such as languages and
+                     broadcaster types, is read as pandas categoricals,
+                     as are the category ids and names of streams
+        counts       viewer counts and other numbers get fixed widths
+
+    Columns of current dimension data updated in place, such as the
+    broadcaster_type of current users, are kept as strings since a
+    categorical can not take a value it does not have a category for.
+
+    storage.read_csv(path, schema=...) reads only the columns of the
+    schema, or the columns asked for, with their types and with
+    empty values kept as empty strings, and storage.write_csv(df,
+    path, schema=...) writes the schema's columns in order.
+'''
+#####################################################################
+
+
+id_type = "str"
+text_type = "str"
+category_type = "category"
+
+schemas = {
+    # Raw layer
+    "raw_day_dates_data": {
+        "day_date_id": id_type, "the_date": text_type, "date_MMDDYYYY": text_type, "day_of_week": category_type, "month": text_type,
+        "day": text_type, "year": text_type, "month_name": category_type, "month_abbrev": category_type, "year_YY": text_type
+    },
+    "raw_time_of_day_data": {
+        "time_of_day_id": id_type, "time_24h": text_type, "time_12h": text_type, "hour": "int8", "minute": "int8", "AM_PM": category_type, "part_of_day": category_type
+    },
+    "raw_languages_data": {"language_id": id_type, "language": text_type},
+
+    # Processed layer
+    "processed_streams_data": {
+        "id": id_type, "user_id": id_type, "user_login": text_type, "user_name": text_type, "game_id": category_type, "game_name": category_type,
+        "title": text_type, "viewer_count": "int32", "started_at": text_type, "language": category_type, "thumbnail_url": text_type, "is_mature": "bool"
+    },
+    "processed_users_data": {
+        "id": id_type, "login": text_type, "display_name": text_type, "type": category_type, "broadcaster_type": category_type,
+        "description": text_type, "profile_image_url": text_type, "offline_image_url": text_type, "created_at": text_type
+    },
+    "processed_categories_data": {"category_id": id_type, "category_name": text_type, "box_art_url": text_type, "igdb_id": id_type},
+    "processed_genre_bridge_data": {"igdb_id": id_type, "category_id": id_type, "game_name": text_type, "genre_id": id_type},
+    "processed_game_mode_bridge_data": {"igdb_id": id_type, "category_id": id_type, "game_name": text_type, "game_mode_id": id_type},
+    "processed_genres_data": {
+        "genre_id": id_type, "created_at": text_type, "genre_name": text_type, "slug": text_type, "updated_at": text_type, "url": text_type, "checksum": text_type
+    },
+    "processed_game_modes_data": {
+        "game_mode_id": id_type, "created_at": text_type, "game_mode_name": text_type, "slug": text_type, "updated_at": text_type, "url": text_type, "checksum": text_type
+    },
+
+    # Curated layer
+    "curated_streams_data": {
+        "stream_id": id_type, "day_date_id": id_type, "time_of_day_id": id_type, "user_id": id_type, "category_id": id_type,
+        "language_id": category_type, "viewer_count": "int32", "hours_watched": "float64"
+    },
+    "curated_users_data": {"user_id": id_type, "user_name": text_type, "login_name": text_type, "broadcaster_type": category_type, "valid_from": text_type},
+    "curated_categories_data": {"category_id": id_type, "category_name": text_type, "igdb_id": id_type, "valid_from": text_type},
+    "curated_genre_bridge_data": {"category_id": id_type, "genre_id": id_type},
+    "curated_game_mode_bridge_data": {"category_id": id_type, "game_mode_id": id_type},
+    "curated_genres_data": {"genre_id": id_type, "genre_name": text_type},
+    "curated_game_modes_data": {"game_mode_id": id_type, "game_mode_name": text_type},
+
+    # Miscellaneous bucket, current dimension data written before the row hashes existed does not have the last two columns
+    "current_users": {"user_id": id_type, "user_name": text_type, "login_name": text_type, "broadcaster_type": text_type, "row_hash": text_type, "valid_from": text_type},
+    "current_categories": {"category_id": id_type, "category_name": text_type, "igdb_id": id_type, "row_hash": text_type, "valid_from": text_type},
+    "users_refresh_state": {"user_id": id_type, "last_fetched_at": "int64", "last_seen_at": "int64"},
+    "categories_refresh_state": {"category_id": id_type, "last_fetched_at": "int64", "last_seen_at": "int64"},
+    "category_popularity_data": {"category_id": id_type, "num_of_streamers": "int32"},
+    "default_category_weights": {"num_of_streamers": "float64"},
+    "category_ids": {"category_id": id_type} # previous and sent categories of the speculative category groups
+}
+
+
+# Gets the dtypes of a dataset's columns, only the columns given if any
+def get_dtypes(schema_name, columns=None):
+    schema = schemas[schema_name]
+    columns = set(schema if columns is None else columns)
+
+    return {column: dtype for column, dtype in schema.items() if column in columns}
+
+
+# Gets the pandas.read_csv arguments that read a dataset with its schema, only the columns given if any
+# Columns of the schema missing from a file are left out instead of failing the read
+def get_read_csv_args(schema_name, columns=None):
+    schema = schemas[schema_name]
+    columns = set(columns or schema)
+
+    return {
+        "usecols": lambda column: column in columns,
+        "dtype": get_dtypes(schema_name, columns),
+        "keep_default_na": False
+    }
+
+
+# Gets the columns of a dataset in the order they are written
+def get_columns(schema_name):
+    return list(schemas[schema_name])
@@ -0,0 +1,262 @@
+import io
+import csv
+import json
+import hashlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+import boto3
+from pipeline_core.partitions import DataPath
+from pipeline_core.metrics import metrics
+from pipeline_core.schemas import get_read_csv_args, get_columns
+
+############################## SUMMARY ##############################
+'''
+    Storage clients shared by the pipeline functions and the local
+    scripts. S3Storage reads and writes the S3 buckets, LocalStorage
+    reads and writes the same keys under the local data directory,
+    where every bucket is a directory named after it with
+    underscores, such as data/twitch_project_raw_layer.
+
+    Both implement the few object operations in StorageClient, which
+    the shared readers and writers are built on, so a handler or
+    script works the same against either. Objects that do not exist
+    raise ObjectNotFoundError from either client.
+
+    Objects that more than one function rewrites, such as the
+    current users and categories, are read with their version and
+    written back with expected_version. The write only happens if
+    nobody else wrote the object in between, otherwise it raises
+    WriteConflictError and the caller reads the object again. S3
+    versions are ETags checked with conditional writes.
+
+    pandas is only imported by the DataFrame readers and writers, so
+    functions that only move JSON and CSV text do not pay for
+    importing it. The DataFrame readers and writers take the name of
+    a dataset's schema from schemas.py, so every function reads a
+    dataset with the same column types.
+
+    Every object operation is recorded as a span, such as "s3_get"
+    or "local_put", with the bytes moved, and decoding and encoding
+    in the shared readers and writers as "parse" and "serialize"
+    spans, in the invocation's metrics.
+'''
+#####################################################################
+
+
+class ObjectNotFoundError(Exception):
+    pass
+
+
+# Raised by a write with an expected version when the object was written by someone else since it was read
+class WriteConflictError(Exception):
+    pass
+
+
+# Version of an object that does not exist, a write expecting it only succeeds if the object is still missing
+missing_version = ""
+
+# Times a function reads, updates and writes an object before giving up when the writes keep conflicting
+max_write_attempts = 5
+
+
+class StorageClient(ABC):
+    # Gets the contents of an object, raises ObjectNotFoundError if it does not exist
+    @abstractmethod
+    def get_bytes(self, path):
+        pass
+
+    # Gets the contents of an object and its version, or missing_version if it does not exist
+    @abstractmethod
+    def get_bytes_and_version(self, path):
+        pass
+
+    # With an expected version the object is only written if it still has that version, otherwise WriteConflictError is raised
+    @abstractmethod
+    def put_bytes(self, body, path, content_type=None, expected_version=None):
+        pass
+
+    @abstractmethod
+    def delete(self, path):
+        pass
+
+    # Gets the paths of every object under a prefix, sorted by key
+    @abstractmethod
+    def list_paths(self, bucket_name, prefix):
+        pass
+
+    def exists(self, path):
+        try:
+            self.get_bytes(path)
+            return True
+        except ObjectNotFoundError:
+            return False
+
+    def read_json(self, path):
+        body = self.get_bytes(path)
+        with metrics.span("parse"):
+            return json.loads(body.decode("utf-8"))
+
+    def write_json(self, data, path, indent=None):
+        with metrics.span("serialize"):
+            body = json.dumps(data, indent=indent).encode("utf-8")
+        self.put_bytes(body, path, "application/json")
+
+    # Reads a CSV into a list of row dicts with string values, without pandas
+    def read_csv_rows(self, path):
+        body = self.get_bytes(path)
+        with metrics.span("parse"):
+            return list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+
+    # Writes a header and rows as CSV, without pandas
+    def write_csv_rows(self, columns, rows, path):
+        with metrics.span("serialize"):
+            csv_buffer = io.StringIO()
+            writer = csv.writer(csv_buffer, lineterminator="\n")
+            writer.writerow(columns)
+            writer.writerows(rows)
+            body = csv_buffer.getvalue().encode("utf-8")
+        self.put_bytes(body, path, "text/csv")
+
+    # Reads a CSV into a DataFrame, keyword arguments are passed to pandas.read_csv
+    # With a schema from schemas.py, only its columns, or the columns given, are read with the schema's types
+    def read_csv(self, path, schema=None, columns=None, **read_csv_args):
+        return self.parse_csv(self.get_bytes(path), schema, columns, **read_csv_args)
+
+    # Same as read_csv, but also returns the version of the object to write it back with
+    # Returns None and missing_version if the object does not exist
+    def read_csv_with_version(self, path, schema=None, columns=None, **read_csv_args):
+        body, version = self.get_bytes_and_version(path)
+        if version == missing_version:
+            return None, version
+
+        return self.parse_csv(body, schema, columns, **read_csv_args), version
+
+    def parse_csv(self, body, schema=None, columns=None, **read_csv_args):
+        import pandas as pd
+        if schema is not None:
+            read_csv_args = {**get_read_csv_args(schema, columns), **read_csv_args}
+        with metrics.span("parse"):
+            return pd.read_csv(io.BytesIO(body), **read_csv_args)
+
+    # Writes a DataFrame as CSV, with a schema its columns are written in the schema's order
+    def write_csv(self, df, path, schema=None, expected_version=None):
+        if schema is not None:
+            df = df[get_columns(schema)]
+        with metrics.span("serialize"):
+            body = df.to_csv(index=False).encode("utf-8")
+        self.put_bytes(body, path, "text/csv", expected_version)
+
+
+class S3Storage(StorageClient):
+    def __init__(self, s3_client=None):
+        self.s3_client = s3_client or boto3.client("s3")
+
+    def get_bytes(self, path):
+        with metrics.span("s3_get"):
+            try:
+                response = self.s3_client.get_object(Bucket=path.bucket_name, Key=path.key)
+            except self.s3_client.exceptions.NoSuchKey:
+                raise ObjectNotFoundError(path.uri)
+            body = response["Body"].read()
+        metrics.count("s3_get_bytes", len(body))
+
+        return body
+
+    def get_bytes_and_version(self, path):
+        with metrics.span("s3_get"):
+            try:
+                response = self.s3_client.get_object(Bucket=path.bucket_name, Key=path.key)
+            except self.s3_client.exceptions.NoSuchKey:
+                return b"", missing_version
+            body = response["Body"].read()
+        metrics.count("s3_get_bytes", len(body))
+
+        return body, response["ETag"]
+
+    def put_bytes(self, body, path, content_type=None, expected_version=None):
+        put_args = {"ContentType": content_type} if content_type else {}
+        if expected_version == missing_version:
+            put_args["IfNoneMatch"] = "*"
+        elif expected_version is not None:
+            put_args["IfMatch"] = expected_version
+        with metrics.span("s3_put"):
+            try:
+                self.s3_client.put_object(Bucket=path.bucket_name, Key=path.key, Body=body, **put_args)
+            except self.s3_client.exceptions.ClientError as e:
+                # Another writer won, or a conditional write of the same object is still in progress
+                if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                    raise WriteConflictError(path.uri)
+                raise
+        metrics.count("s3_put_bytes", len(body))
+
+    def delete(self, path):
+        with metrics.span("s3_delete"):
+            self.s3_client.delete_object(Bucket=path.bucket_name, Key=path.key)
+
+    def list_paths(self, bucket_name, prefix):
+        paths = []
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        with metrics.span("s3_list"):
+            for response in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+                paths.extend(DataPath(bucket_name, obj["Key"]) for obj in response.get("Contents", []))
+
+        return sorted(paths)
+
+    def exists(self, path):
+        try:
+            with metrics.span("s3_head"):
+                self.s3_client.head_object(Bucket=path.bucket_name, Key=path.key)
+            return True
+        except self.s3_client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "404":
+                return False
+            raise
+
+
+class LocalStorage(StorageClient):
+    # data_root is the directory holding a directory per bucket, usually the repo's data directory
+    def __init__(self, data_root):
+        self.data_root = Path(data_root)
+
+    def get_file_path(self, path):
+        return self.data_root / path.bucket_name.replace("-", "_") / path.key
+
+    def get_bytes(self, path):
+        with metrics.span("local_get"):
+            try:
+                body = self.get_file_path(path).read_bytes()
+            except FileNotFoundError:
+                raise ObjectNotFoundError(str(self.get_file_path(path)))
+        metrics.count("local_get_bytes", len(body))
+
+        return body
+
+    # Versions are hashes of the contents, local scripts do not run concurrently so the check is not atomic
+    def get_bytes_and_version(self, path):
+        try:
+            body = self.get_bytes(path)
+        except ObjectNotFoundError:
+            return b"", missing_version
+
+        return body, hashlib.md5(body).hexdigest()
+
+    def put_bytes(self, body, path, content_type=None, expected_version=None):
+        file_path = self.get_file_path(path)
+        if expected_version is not None and self.get_bytes_and_version(path)[1] != expected_version:
+            raise WriteConflictError(str(file_path))
+        with metrics.span("local_put"):
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_bytes(body)
+        metrics.count("local_put_bytes", len(body))
+
+    def delete(self, path):
+        self.get_file_path(path).unlink(missing_ok=True)
+
+    def list_paths(self, bucket_name, prefix):
+        bucket_path = self.data_root / bucket_name.replace("-", "_")
+        keys = [file_path.relative_to(bucket_path).as_posix() for file_path in bucket_path.rglob("*") if file_path.is_file()]
+
+        return sorted(DataPath(bucket_name, key) for key in keys if key.startswith(prefix))
+
+    def exists(self, path):
+        return self.get_file_path(path).is_file()
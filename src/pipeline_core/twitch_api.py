@@ -0,0 +1,270 @@
+import os
+import time
+import hashlib
+import itertools
+import threading
+import requests
+from pipeline_core.partitions import DataPath, misc_bucket_name
+from pipeline_core.storage import ObjectNotFoundError
+from pipeline_core.metrics import metrics
+from pipeline_core.api_calls import api_calls
+
+############################## SUMMARY ##############################
+'''
+    Twitch Helix API helpers: the request headers made from the
+    function's credentials and resumable pagination. Every page
+    collected is saved to the miscellaneous bucket together with
+    the cursor of the next page, so a retried invocation continues
+    from the last saved page instead of requesting every page
+    again. Pages are saved as their own small objects under the
+    checkpoint's prefix, so saving a page does not rewrite the
+    pages before it. The checkpoint is deleted by the caller once
+    the collected data has been uploaded.
+
+    Pages that fail are retried a few times with backoff before an
+    error is raised, so a transient API error costs one page
+    instead of the whole collection. A page throttled too many
+    times raises as well, and the retried invocation continues
+    from the checkpoint.
+
+    Batches of ids requested from threads share a HelixRateBudget,
+    which keeps track of the rate limit points Twitch reports. A
+    throttled batch uses up the budget until the rate limit resets,
+    at least as long as a throttled page waits when Twitch reports
+    no reset time, and a batch throttled too many times fails.
+
+    Requests are recorded in the invocation's metrics as
+    "api_page" and "api_batch" spans, with the pages and batches
+    fetched, the 429 responses hit and the time spent waiting on
+    the rate limit. Every request, retries included, is also
+    recorded in the invocation's API call accounting with its
+    status and the rate limit points left.
+'''
+#####################################################################
+
+
+# Seconds a throttled request waits when Twitch reports no reset time
+throttled_wait_seconds = 20
+
+# Times a page or batch is throttled before giving up
+max_throttled_attempts = 10
+
+
+# Gets the headers of Helix requests from the client id and access token in the environment
+def get_twitch_headers():
+    client_id = os.environ["client_id"]
+    access_token = os.environ["access_token"]
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Client-Id": f"{client_id}"
+    }
+
+    return headers
+
+
+# Gets a short id that is the same every time the same categories are paginated from the same cursor
+def get_checkpoint_id(category_list, cursor=""):
+    return hashlib.sha1((",".join(sorted(str(category_id) for category_id in category_list)) + "|" + cursor).encode()).hexdigest()[:16]
+
+
+class PaginationCheckpoint:
+    def __init__(self, storage, prefix):
+        self.storage = storage
+        self.prefix = prefix if prefix.endswith("/") else prefix + "/"
+        self.page_count = 0
+
+    # Gets the paths of the saved pages in page order
+    def get_page_paths(self):
+        return [path for path in self.storage.list_paths(misc_bucket_name, self.prefix) if path.key.removeprefix(self.prefix).startswith("page_")]
+
+    # Gets every saved page in order, each with its data and the cursor of the page after it
+    def load_pages(self):
+        pages = []
+        for page_path in self.get_page_paths():
+            pages.append(self.storage.read_json(page_path))
+        self.page_count = len(pages)
+        if pages:
+            print(f"Resuming from {len(pages)} saved pages at {self.prefix}")
+
+        return pages
+
+    # Gets the data of every saved page, the cursor to continue from and whether the last page was reached
+    def load(self, cursor=""):
+        data = []
+        for page in self.load_pages():
+            data.extend(page["data"])
+            cursor = page["next_cursor"]
+
+        return data, cursor, cursor is None
+
+    # Saves one page and the cursor of the page after it, None if it was the last page
+    def save_page(self, data, next_cursor):
+        self.storage.write_json({"next_cursor": next_cursor, "data": data}, DataPath(misc_bucket_name, f"{self.prefix}page_{self.page_count:05d}.json"))
+        self.page_count += 1
+
+    # Saves the cursor the rest of the pages were handed off to another invocation from, and whether that message was sent
+    # Saved before the message is sent, so a retried invocation stops at the same page and only sends it if it was not sent
+    def save_handoff(self, cursor, sent=False):
+        self.storage.write_json({"cursor": cursor, "sent": sent}, DataPath(misc_bucket_name, f"{self.prefix}handoff.json"))
+
+    # Gets the saved hand-off, None if the pages were not handed off
+    def load_handoff(self):
+        try:
+            return self.storage.read_json(DataPath(misc_bucket_name, f"{self.prefix}handoff.json"))
+        except ObjectNotFoundError:
+            return None
+
+    # Deletes every saved page and the hand-off once the collected data is uploaded
+    def delete(self):
+        for path in self.storage.list_paths(misc_bucket_name, self.prefix):
+            self.storage.delete(path)
+
+
+# Gets the endpoint of a Helix URL, such as "helix/streams"
+def get_endpoint(url):
+    return url.split("api.twitch.tv/", 1)[-1]
+
+
+# Sends one Helix request and records it in the API call accounting, status 0 if no response was received
+def send_helix_request(url, headers, params, retry, wait_ms):
+    started_at = time.time()
+    start = time.perf_counter()
+    response = None
+    try:
+        response = requests.get(url, headers=headers, params=params, timeout=10)
+        return response
+    finally:
+        api_calls.record(
+            "twitch",
+            get_endpoint(url),
+            started_at,
+            0 if response is None else response.status_code,
+            (time.perf_counter() - start) * 1000,
+            None if response is None else response.headers.get("Ratelimit-Remaining"),
+            retry,
+            wait_ms
+        )
+
+
+# Requests one Helix page, retrying after the rate limit resets when throttled and with backoff on other errors
+def get_helix_page(url, headers, params, max_attempts=5, max_throttled_attempts=max_throttled_attempts):
+    attempt = 0
+    throttled_attempts = 0
+    wait_ms = 0
+    for retry in itertools.count():
+        try:
+            with metrics.span("api_page"):
+                response = send_helix_request(url, headers, params, retry, wait_ms)
+            if response.status_code == 200:
+                metrics.count("pages_fetched")
+                return response.json()
+            elif response.status_code == 429:
+                metrics.count("api_throttled")
+                throttled_attempts += 1
+                if throttled_attempts == max_throttled_attempts:
+                    raise RuntimeError(f"Rate limit exceeded {throttled_attempts} times calling {url}")
+                print("Rate limit exceeded. Retrying in 20 seconds")
+                with metrics.span("api_rate_limit_wait"):
+                    time.sleep(throttled_wait_seconds)
+                wait_ms = throttled_wait_seconds * 1000
+                continue
+            error = f"Error: {response.status_code} {response.text}"
+        except requests.exceptions.RequestException as e:
+            error = f"An exception has occurred calling {url}: {e}"
+
+        metrics.count("api_errors")
+        attempt += 1
+        if attempt == max_attempts:
+            raise RuntimeError(error)
+        wait_ms = 0 # backoff after an error is not rate limit time
+        print(f"{error}. Retrying page in {2 ** attempt} seconds")
+        time.sleep(2 ** attempt)
+
+
+# Gets the cursor of the next page from a Helix response, None if it was the last page
+def get_next_cursor(output):
+    if len(output["pagination"]) == 0: # if no cursor in pagination, no more pages
+        return None
+
+    return output["pagination"]["cursor"]
+
+
+# Keeps track of the Twitch rate limit points left, shared by all threads calling the API
+# Twitch returns the points left and when they refill in the Ratelimit-Remaining and Ratelimit-Reset headers
+class HelixRateBudget:
+    def __init__(self, reserve_points=10):
+        self.reserve_points = reserve_points # points left for other functions calling the API at the same time
+        self.remaining = None
+        self.reset_time = 0
+        self.lock = threading.Lock()
+
+    # Waits until the bucket refills if there are not enough points left for another call, returns the seconds waited
+    def wait(self):
+        with self.lock:
+            if self.remaining is not None and self.remaining <= self.reserve_points:
+                sleep_time = max(self.reset_time - time.time(), 0) + 1
+            else:
+                sleep_time = 0
+                if self.remaining is not None:
+                    self.remaining -= 1 # reserve a point for this call
+        if sleep_time > 0:
+            print(f"Rate limit budget used up. Waiting {sleep_time:.1f} seconds")
+            with metrics.span("api_rate_limit_wait"):
+                time.sleep(sleep_time)
+            # The bucket has refilled, the next response reports the points left
+            with self.lock:
+                if self.reset_time <= time.time():
+                    self.remaining = None
+
+        return sleep_time
+
+    # Updates the budget from the rate limit headers of a response
+    def update(self, response):
+        remaining = response.headers.get("Ratelimit-Remaining")
+        reset_time = response.headers.get("Ratelimit-Reset")
+        with self.lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset_time is not None:
+                self.reset_time = int(reset_time)
+
+    # Uses up the budget after a 429 so every thread waits for the rate limit to reset
+    def throttle(self):
+        with self.lock:
+            self.remaining = 0
+            if self.reset_time <= time.time():
+                self.reset_time = time.time() + throttled_wait_seconds
+
+
+# Calls a Helix endpoint for one batch of up to 100 ids, such as "Get Users" or "Get Games", and returns its data
+# Throttled calls are retried after the rate limit resets, other errors are retried a few times before giving up
+def get_helix_batch(url, params, headers, rate_budget, max_attempts=5, max_throttled_attempts=max_throttled_attempts):
+    attempt = 0
+    throttled_attempts = 0
+    for retry in itertools.count():
+        wait_ms = rate_budget.wait() * 1000
+        try:
+            with metrics.span("api_batch"):
+                response = send_helix_request(url, headers, params, retry, wait_ms)
+            rate_budget.update(response)
+            if response.status_code == 200:
+                metrics.count("batches_fetched")
+                return response.json()["data"]
+            elif response.status_code == 429:
+                metrics.count("api_throttled")
+                throttled_attempts += 1
+                if throttled_attempts == max_throttled_attempts:
+                    raise RuntimeError(f"Rate limit exceeded {throttled_attempts} times calling {url}")
+                rate_budget.throttle()
+                print("Rate limit exceeded. Retrying batch after the rate limit resets")
+                continue
+            error = f"Error: {response.status_code} {response.text}"
+        except requests.exceptions.RequestException as e:
+            error = f"An exception has occurred calling {url}: {e}"
+
+        metrics.count("api_errors")
+        attempt += 1
+        if attempt == max_attempts:
+            raise RuntimeError(error)
+        print(f"{error}. Retrying batch in {2 ** attempt} seconds")
+        time.sleep(2 ** attempt)
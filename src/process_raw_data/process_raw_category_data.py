@@ -1,60 +1,69 @@
-import pandas as pd
 import json
-import boto3
-import awswrangler as wr
+from pipeline_core.partitions import Partition, DataPath, processed_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.metrics import metrics
 
 ################################# SUMMARY #################################
 '''
     This script processes the raw category data by converting it into a 
     CSV file. Slight modifications will also be made such as converting 
     empty IGDB values to "NA".
+
+    The conversion is a plain JSON to CSV reshape done with the standard
+    library, so cold starts do not pay for importing pandas or
+    awswrangler. The storage client is made once per container.
 '''
 ###########################################################################
 
+storage = S3Storage()
 
-def lambda_handler(event, context):
-    # Get file location details
-    bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-    file_key = event["Records"][0]["s3"]["object"]["key"]
+# Raw category fields and the processed column names they are written as
+category_columns = {
+    "id": "category_id",
+    "name": "category_name",
+    "box_art_url": "box_art_url",
+    "igdb_id": "igdb_id"
+}
+
+
+# Converts raw categories to CSV rows, dropping duplicate categories and replacing empty values with "NA"
+def get_processed_category_rows(raw_category_data):
+    processed_rows = []
+    seen_rows = set()
+    for category in raw_category_data["data"]:
+        row = tuple(category[field] for field in category_columns)
+        if row in seen_rows:
+            continue
+        seen_rows.add(row)
+        category_id, category_name, box_art_url, igdb_id = row
+        processed_rows.append([category_id, category_name, box_art_url or "NA", igdb_id or "NA"])
 
-    s3_client = boto3.client("s3")
+    return processed_rows
 
+
+@metrics.instrument
+def lambda_handler(event, context):
     # Load in JSON data
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        raw_category_data = json.loads(response["Body"].read().decode("utf-8"))
-    else:
-        print(f"Error: {status}")
-        exit()
-
-    # Convert to dataframe and rename columns
-    category_df = pd.DataFrame(raw_category_data["data"]).drop_duplicates()
-    category_df = category_df.rename(columns = {"id": "category_id", "name": "category_name"})
+    raw_category_data = storage.read_json(DataPath.from_s3_event(event))
 
     # Get day_date_id and time_of_day_id
-    day_date_id = raw_category_data["day_date_id"]
-    time_of_day_id = raw_category_data["time_of_day_id"]
-
-    # Replace empty strings with "NA"
-    category_df["igdb_id"] = category_df["igdb_id"].replace("", "NA")
-    category_df["box_art_url"] = category_df["box_art_url"].replace("", "NA")
+    partition = Partition(raw_category_data["day_date_id"], raw_category_data["time_of_day_id"])
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
+    metrics.count("rows_in", len(raw_category_data["data"]))
 
     # Upload CSV to processed layer in S3
-    processed_bucket_name = "twitch-project-processed-layer"
-    processed_categories_key = f"processed_categories_data/{day_date_id}/processed_categories_data_{day_date_id}_{time_of_day_id}.csv"
-    processed_categories_path = f"s3://{processed_bucket_name}/{processed_categories_key}"
-    wr.s3.to_csv(
-        df=category_df,
-        path=processed_categories_path,
-        index=False
-    )
+    processed_categories_path = DataPath.for_partition(processed_bucket_name, "processed_categories_data", partition)
+    with metrics.span("transform"):
+        processed_rows = get_processed_category_rows(raw_category_data)
+    metrics.count("rows_out", len(processed_rows))
+    storage.write_csv_rows(category_columns.values(), processed_rows, processed_categories_path)
 
     output_info = {
         "day_date_id": day_date_id,
         "time_of_day_id": time_of_day_id,
-        "bucket_name": processed_bucket_name,
-        "file_key": processed_categories_key
+        "bucket_name": processed_categories_path.bucket_name,
+        "file_key": processed_categories_path.key
     }
 
     return {
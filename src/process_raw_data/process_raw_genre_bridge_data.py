@@ -1,91 +1,40 @@
-import pandas as pd
 import json
-import boto3
-import awswrangler as wr
-import time
+from pipeline_core.partitions import Partition, DataPath, processed_bucket_name, curated_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.igdb_category_index import get_igdb_category_index, get_processed_bridge_df
+from pipeline_core.metrics import metrics
 
 ############################ SUMMARY ############################
 '''
     Processes the raw genre bridge data. Converts it into
-    tabular format and adds the appropriate category IDs.
+    tabular format and adds the appropriate category IDs
+    using the IGDB id index in pipeline_core.igdb_category_index.
 '''
 #################################################################
 
-# Gets category id associated with IGDB ID
-def get_associated_category_id(category_df, igdb_id):
-    category_row = category_df[category_df["igdb_id"] == str(igdb_id)]
-    category_id = category_row["category_id"].iloc[0]
-
-    return category_id
+storage = S3Storage()
 
 
+@metrics.instrument
 def lambda_handler(event, context):
-    start = time.time()
-
-    # Get file location details
-    bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-    file_key = event["Records"][0]["s3"]["object"]["key"]
-
-    s3_client = boto3.client("s3")
-
     # Load in JSON data
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        raw_genre_bridge_data = json.loads(response["Body"].read().decode("utf-8"))
-    else:
-        print(f"Error: {status}")
-        exit()
+    raw_genre_bridge_path = DataPath.from_s3_event(event)
+    raw_genre_bridge_data = storage.read_json(raw_genre_bridge_path)
+    partition = Partition(raw_genre_bridge_data["day_date_id"], raw_genre_bridge_data["time_of_day_id"])
+    metrics.set_partition(partition)
+    metrics.count("rows_in", len(raw_genre_bridge_data["data"]))
 
-    # Get day_date_id and time_of_day_id
-    day_date_id = raw_genre_bridge_data["day_date_id"]
-    time_of_day_id = raw_genre_bridge_data["time_of_day_id"]
+    # Load in the curated category data the raw data was requested for, changed categories are in the file with the same suffix
+    category_df = storage.read_csv(DataPath.for_partition(curated_bucket_name, "curated_categories_data", partition, suffix=raw_genre_bridge_path.suffix), schema="curated_categories_data", columns=["category_id", "igdb_id"])
 
-    # Load in curated category data
-    response = s3_client.get_object(Bucket="twitch-project-curated-layer", Key=f"curated_categories_data/{day_date_id}/curated_categories_data_{day_date_id}_{time_of_day_id}.csv")
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        data_types = {
-            'category_id': str, 
-            'category_name': str,
-            'igdb_id': str
-        }
-        category_df = pd.read_csv(response["Body"], keep_default_na=False, dtype=data_types)
-        category_df = category_df.drop_duplicates(subset=["igdb_id"]).reset_index(drop=True)
-    else:
-        print(f"Error: {status}")
-        exit()
-
-    processed_genre_bridge_data_dict = {
-        "igdb_id": [],
-        "category_id": [],
-        "game_name": [],
-        "genre_id": []
-    }
-
-    # Add genre data to processed genre bridge data dict
-    for game_info in raw_genre_bridge_data["data"]: # some games have no associated genres
-        if "genres" in game_info.keys():
-            category_id = get_associated_category_id(category_df, game_info["id"])
-            for genre_id in game_info["genres"]:
-                processed_genre_bridge_data_dict["igdb_id"].append(game_info["id"])
-                processed_genre_bridge_data_dict["category_id"].append(category_id)
-                processed_genre_bridge_data_dict["game_name"].append(game_info["name"])
-                processed_genre_bridge_data_dict["genre_id"].append(genre_id)
-
-    # Convert data to dataframe
-    processed_genre_bridge_df = pd.DataFrame(processed_genre_bridge_data_dict)
+    # Link every game to all categories with its IGDB id
+    with metrics.span("transform"):
+        igdb_category_index = get_igdb_category_index(category_df)
+        processed_genre_bridge_df = get_processed_bridge_df(raw_genre_bridge_data, igdb_category_index, "genres", "genre_id")
+    metrics.count("rows_out", len(processed_genre_bridge_df))
 
     # Upload CSV to processed layer in S3
-    wr.s3.to_csv(
-        df=processed_genre_bridge_df,
-        path=f"s3://twitch-project-processed-layer/processed_genre_bridge_data/{day_date_id}/processed_genre_bridge_data_{day_date_id}_{time_of_day_id}.csv",
-        index=False
-    )
-
-    end = time.time()
-    duration = end - start
-    print("Duration: " + str(duration))
+    storage.write_csv(processed_genre_bridge_df, DataPath.for_partition(processed_bucket_name, "processed_genre_bridge_data", partition, suffix=raw_genre_bridge_path.suffix), schema="processed_genre_bridge_data")
 
     return {
         'statusCode': 200,
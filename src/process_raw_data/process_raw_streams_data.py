@@ -1,85 +1,42 @@
-import os
-import requests
-import pandas as pd
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-import boto3
-import awswrangler as wr
+import sys
 import json
-import time
+from pipeline_core.partitions import DataPath, raw_bucket_name, processed_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.dates import get_current_partition
+from pipeline_core.metrics import metrics
 
 ######################## SUMMARY ########################
 '''
     Converts raw streams json data to a CSV and uploads
     it to the processed layer S3 bucket.
+
+    Only uses the standard library and boto3, so cold
+    starts do not pay for importing pandas or awswrangler.
+    The storage client is made once per container.
+
+    A cycle has tens of thousands of streams but only a few
+    thousand categories and a few dozen languages, so the
+    category ids and names and the languages are interned,
+    and every row refers to one string per value instead of
+    its own copy, like a categorical column. Thumbnail URLs
+    are the same template around the user login, so they
+    are rebuilt when the CSV is written instead of being
+    kept for every row.
 '''
 #########################################################
 
+storage = S3Storage()
 
-# Gets current date id based of date when script is executed
-def get_day_date_id(s3_client, current_date):
-    current_date = current_date.astimezone(ZoneInfo("US/Pacific")).replace(tzinfo=None)
-    response = s3_client.get_object(Bucket="twitch-project-raw-layer", Key="raw_day_dates_data/raw_day_dates_data.csv")
-    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
-    if status == 200:
-        print(f"Successful S3 get_object response for date dimension. Status - {status}")
-        date_df = pd.read_csv(response.get("Body"), keep_default_na=False)
-    else:
-        print(f"Unsuccessful S3 get_object response for date dimension. Status - {status}")
-        print(response)
-        exit()
-        
-    # If later than 23:52, the day will be considered the next day
-    if current_date.hour == 23 and current_date.minute > 52:
-        current_date += timedelta(days=1)
-        day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-    else:
-        day_date_id = date_df[date_df["the_date"] == str(current_date.date())].iloc[0, 0]
-   
-    return str(day_date_id)
-
-
-# Gets time of day id based off of current time of script execution
-def get_time_of_day_id(s3_client, current_date):
-    current_date = current_date.astimezone(ZoneInfo("US/Pacific")).replace(tzinfo=None)
-    response = s3_client.get_object(Bucket="twitch-project-raw-layer", Key="raw_time_of_day_data/raw_time_of_day_data.csv")
-    status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
-    if status == 200:
-        print(f"Successful S3 get_object response for time of day dimension. Status - {status}")
-        time_of_day_df = pd.read_csv(response.get("Body"), keep_default_na=False, dtype={"time_of_day_id": str})
-    else:
-        print(f"Unsuccessful S3 get_object response for time of day dimension. Status - {status}")
-        print(response)
-        exit()
-
-    # If later than 23:52, next nearest time will be 00:00
-    if current_date.hour == 23 and current_date.minute > 52:
-        return "0000"
-    
-    minimum_diff = 1000
-    time_of_day_id = ""
-    for row in time_of_day_df.iterrows():
-        time = row[1]["time_24h"]
-        date_time_compare = datetime(current_date.year, current_date.month, current_date.day, int(time[0:2]), int(time[3:5]))
-        diff = abs((current_date - date_time_compare).total_seconds())
-        if diff < minimum_diff:
-            minimum_diff = diff
-            time_of_day_id = row[1]["time_of_day_id"]
-
-    return str(time_of_day_id)
+# Twitch gives the thumbnail URL of a live stream as https://static-cdn.jtvnw.net/previews-ttv/live_user_{user_login}-{width}x{height}.jpg
+thumbnail_url_prefix = "https://static-cdn.jtvnw.net/previews-ttv/live_user_"
+thumbnail_url_suffix = "-{width}x{height}.jpg"
 
 
+# Gets the paths to most recently collected stream data
+def get_stream_data_paths(storage, day_date_id, time_of_day_id):
+    data_paths = storage.list_paths(raw_bucket_name, f"raw_streams_data/{day_date_id}/{time_of_day_id}/")
 
-# Gets the S3 object paths to most recently collected stream data
-def get_stream_data_paths(s3_client, day_date_id, time_of_day_id):
-    data_paths = []
-    response = s3_client.list_objects_v2(Bucket="twitch-project-raw-layer", Delimiter='/', Prefix=f"raw_streams_data/{day_date_id}/{time_of_day_id}/")
-    if "Contents" in response:
-        for obj in response["Contents"]:
-            if obj["Key"].endswith(".json"):
-                data_paths.append(obj["Key"])
-
-    return data_paths
+    return [data_path for data_path in data_paths if data_path.key.endswith(".json")]
 
 
 def is_integer(s):
@@ -98,35 +55,51 @@ def process_language_id(language_id):
         return language_id
 
 
-# Converts the raw stream data in JSON format to a dataframe
+# Gets the thumbnail URL of a live stream from the user's login
+def get_thumbnail_url(user_login):
+    return f"{thumbnail_url_prefix}{user_login}{thumbnail_url_suffix}"
+
+
+# Gets the thumbnail URL of every processed stream, rebuilding the ones that follow the template
+def get_thumbnail_urls(processed_stream_data_dict):
+    for user_login, thumbnail_url in zip(processed_stream_data_dict["user_login"], processed_stream_data_dict["thumbnail_url"]):
+        yield get_thumbnail_url(user_login) if thumbnail_url is None else thumbnail_url
+
+
+# Converts the raw stream data in JSON format to columns of a table
 # Removes some data since it wouldn't fit in tabular format
-def process_raw_stream_data(raw_stream_data, processed_stream_data_dict):
+# Streams already seen in another file are skipped, the first one collected is kept
+def process_raw_stream_data(raw_stream_data, processed_stream_data_dict, seen_stream_ids):
     for stream in raw_stream_data["data"]:
+        if stream["id"] in seen_stream_ids:
+            continue
         # Check to see if stream is valid, sometimes there are test streams where stream id and user id are weird
         if is_integer(stream["id"]) and is_integer(stream["user_id"]):
+            seen_stream_ids.add(stream["id"])
             processed_stream_data_dict["id"].append(stream["id"])
             processed_stream_data_dict["user_id"].append(stream["user_id"])
         else:
             continue
         processed_stream_data_dict["user_login"].append(stream["user_login"])
         processed_stream_data_dict["user_name"].append(stream["user_name"])
-        processed_stream_data_dict["game_id"].append(stream["game_id"])
-        processed_stream_data_dict["game_name"].append(stream["game_name"])
+        processed_stream_data_dict["game_id"].append(sys.intern(stream["game_id"]))
+        processed_stream_data_dict["game_name"].append(sys.intern(stream["game_name"]))
         processed_stream_data_dict["title"].append(stream["title"])
         processed_stream_data_dict["viewer_count"].append(stream["viewer_count"])
         processed_stream_data_dict["started_at"].append(stream["started_at"])
-        processed_stream_data_dict["language"].append(process_language_id(stream["language"]))
-        processed_stream_data_dict["thumbnail_url"].append(stream["thumbnail_url"])
+        processed_stream_data_dict["language"].append(sys.intern(process_language_id(stream["language"])))
+        # Only thumbnail URLs that do not follow the template are kept
+        thumbnail_url = stream["thumbnail_url"]
+        processed_stream_data_dict["thumbnail_url"].append(None if thumbnail_url == get_thumbnail_url(stream["user_login"]) else thumbnail_url)
         processed_stream_data_dict["is_mature"].append(stream["is_mature"])
 
 
 
+@metrics.instrument
 def lambda_handler(event, context):
-    start = time.time()
-    s3_client = boto3.client("s3")
-    todays_date = datetime.today()
-    day_date_id = get_day_date_id(s3_client, todays_date)
-    time_of_day_id = get_time_of_day_id(s3_client, todays_date)
+    partition = get_current_partition(storage)
+    day_date_id, time_of_day_id = partition
+    metrics.set_partition(partition)
 
     processed_stream_data_dict = {
             "id": [],
@@ -144,34 +117,23 @@ def lambda_handler(event, context):
         }
     
     # Get paths of JSON files of most recently collected stream data
-    stream_data_paths = get_stream_data_paths(s3_client, day_date_id, time_of_day_id)
+    stream_data_paths = get_stream_data_paths(storage, day_date_id, time_of_day_id)
 
     # Process raw stream data
+    seen_stream_ids = set()
     if len(stream_data_paths) != 0:
         for path in stream_data_paths:
-            response = s3_client.get_object(Bucket="twitch-project-raw-layer", Key=path)
-            status = response["ResponseMetadata"]["HTTPStatusCode"]
-            if status == 200:
-                raw_stream_data = json.loads(response["Body"].read().decode("utf-8"))
-                process_raw_stream_data(raw_stream_data, processed_stream_data_dict)    
-            else:
-                print(f"Error: {status}")
-                print("Unable to retrieve one of the stream files. Ending program.")
-                exit()
-        
-        # Drop duplicate streams
-        processed_stream_df = pd.DataFrame(processed_stream_data_dict).drop_duplicates(subset=["id"], keep="first")
+            raw_stream_data = storage.read_json(path)
+            metrics.count("rows_in", len(raw_stream_data["data"]))
+            with metrics.span("transform"):
+                process_raw_stream_data(raw_stream_data, processed_stream_data_dict, seen_stream_ids)
+        metrics.count("files_in", len(stream_data_paths))
+        metrics.count("rows_out", len(processed_stream_data_dict["id"]))
 
         # Upload CSV to processed layer
-        processed_stream_file_path = f"s3://twitch-project-processed-layer/processed_streams_data/{day_date_id}/processed_streams_data_{day_date_id}_{time_of_day_id}.csv"
-        wr.s3.to_csv(
-            df=processed_stream_df,
-            path=processed_stream_file_path,
-            index=False
-        )
-
-        end = time.time()
-        print("Duration: " + str(end - start))
+        processed_streams_path = DataPath.for_partition(processed_bucket_name, "processed_streams_data", partition)
+        output_columns = {**processed_stream_data_dict, "thumbnail_url": get_thumbnail_urls(processed_stream_data_dict)}
+        storage.write_csv_rows(output_columns.keys(), zip(*output_columns.values()), processed_streams_path)
 
         return {
             'statusCode': 200,
@@ -1,56 +1,66 @@
-import pandas as pd
 import json
-import boto3
-import awswrangler as wr
-import time
+from pipeline_core.partitions import Partition, DataPath, processed_bucket_name
+from pipeline_core.storage import S3Storage
+from pipeline_core.metrics import metrics
+from pipeline_core.schemas import get_columns
 
 ################################# SUMMARY #################################
 '''
     This script processes the raw user data by converting it into a 
     CSV file. Slight modifications will also be made.
+
+    The conversion is a plain JSON to CSV reshape done with the standard
+    library, so cold starts do not pay for importing pandas or
+    awswrangler. The storage client is made once per container.
 '''
 ###########################################################################
 
-def lambda_handler(event, context):
-    start = time.time()
+storage = S3Storage()
+
 
-    # Get file location details
-    bucket_name = event["Records"][0]["s3"]["bucket"]["name"]
-    file_key = event["Records"][0]["s3"]["object"]["key"]
+# Converts raw users to CSV columns and rows, dropping duplicate users and replacing empty types with "normal"
+# Raw data without users gets the columns of the processed users schema and no rows
+def get_processed_user_rows(raw_user_data):
+    if not raw_user_data["data"]:
+        return get_columns("processed_users_data"), []
+    columns = list(dict.fromkeys(field for user in raw_user_data["data"] for field in user))
+    if "view_count" in columns:
+        columns.remove("view_count") # view count column is deprecated
+    processed_rows = []
+    seen_users = set()
+    for user in raw_user_data["data"]:
+        row = tuple(user.get(field) for field in columns + ["view_count"])
+        if row in seen_users:
+            continue
+        seen_users.add(row)
+        processed_user = {field: user.get(field) for field in columns}
+        processed_user["type"] = processed_user["type"] or "normal"
+        processed_user["broadcaster_type"] = processed_user["broadcaster_type"] or "normal"
+        processed_rows.append(list(processed_user.values()))
 
-    s3_client = boto3.client("s3")
+    return columns, processed_rows
 
+
+@metrics.instrument
+def lambda_handler(event, context):
     # Load in JSON data
-    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    status = response["ResponseMetadata"]["HTTPStatusCode"]
-    if status == 200:
-        raw_user_data = json.loads(response["Body"].read().decode("utf-8"))
-    else:
-        print(f"Error: {status}")
-        exit()
-
-    # Convert to dataframe and remove useless columns
-    user_df = pd.DataFrame(raw_user_data["data"]).drop_duplicates()
-    user_df = user_df.drop(columns=["view_count"]) # view count column is deprecated
-
-    # Replace empty strings with relevant value
-    user_df["type"] = user_df["type"].replace("", "normal")
-    user_df["broadcaster_type"] = user_df["broadcaster_type"].replace("", "normal")
+    raw_user_data = storage.read_json(DataPath.from_s3_event(event))
 
     # Get day_date_id and time_of_day_id
-    day_date_id = raw_user_data["day_date_id"]
-    time_of_day_id = raw_user_data["time_of_day_id"]
+    partition = Partition(raw_user_data["day_date_id"], raw_user_data["time_of_day_id"])
+    metrics.set_partition(partition)
+    metrics.count("rows_in", len(raw_user_data["data"]))
 
     # Upload CSV to processed layer in S3
-    wr.s3.to_csv(
-        df=user_df,
-        path=f"s3://twitch-project-processed-layer/processed_users_data/{day_date_id}/processed_users_data_{day_date_id}_{time_of_day_id}.csv",
-        index=False
-    )
-
-    end = time.time()
-    duration = end - start
-    print("Duration: " + str(duration))
+    with metrics.span("transform"):
+        columns, processed_rows = get_processed_user_rows(raw_user_data)
+    metrics.count("rows_out", len(processed_rows))
+    if not processed_rows:
+        return {
+            'statusCode': 200,
+            'body': json.dumps('No user data to process.')
+        }
+    storage.write_csv_rows(columns, processed_rows, DataPath.for_partition(processed_bucket_name, "processed_users_data", partition))
 
     return {
         'statusCode': 200,
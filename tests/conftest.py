@@ -0,0 +1,19 @@
+import os
+import sys
+from pathlib import Path
+
+########################### SUMMARY ###########################
+'''
+    Makes the function modules importable by the tests. The AWS
+    clients they make at import need a region but do not call
+    AWS, so no credentials are needed.
+'''
+###############################################################
+
+src_path = Path(__file__).parents[1] / "src"
+
+# Function modules import their siblings and pipeline_core the same way they do when packaged
+for directory in ["get_raw_data", "process_raw_data", "curate_data", "other"]:
+    sys.path.append(str(src_path / directory))
+sys.path.append(str(src_path))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
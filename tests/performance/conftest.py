@@ -0,0 +1,148 @@
+import gc
+import json
+import time
+import tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+########################### SUMMARY ###########################
+'''
+    Performance regression harness for the core transformations
+    of the Lambda functions. Every test runs one transformation
+    against fixed synthetic data from synthetic_data.py and
+    compares its fastest time and its peak traced allocation to
+    the baselines committed in baselines.json. A test fails when
+    it is slower than its baseline times the time threshold, or
+    allocates more than its baseline times the memory threshold.
+
+    Timings depend on the machine and on what else it is doing,
+    so a fixed calibration workload is timed before every
+    transformation, and the baseline time is scaled by how much
+    slower or faster the calibration ran than when the baseline
+    was recorded. Baselines are still best recorded on the machine
+    the harness runs on and committed with the change that moved
+    them:
+
+        python -m pytest tests/performance                      compare to the baselines
+        python -m pytest tests/performance --update-baselines   record new baselines
+
+    The function modules are importable through tests/conftest.py.
+'''
+###############################################################
+
+baselines_path = Path(__file__).parent / "baselines.json"
+
+# Timings under a few milliseconds are mostly noise, they are allowed this much on top of the threshold
+time_slack_ms = 2
+
+
+def pytest_addoption(parser):
+    parser.addoption("--update-baselines", action="store_true", default=False, help="Record the measured performance as the new baselines")
+    parser.addoption("--time-threshold", type=float, default=1.5, help="Fail when slower than the baseline times this")
+    parser.addoption("--memory-threshold", type=float, default=1.2, help="Fail when allocating more than the baseline times this")
+    parser.addoption("--runs", type=int, default=7, help="Timed runs per transformation, the fastest is compared")
+
+
+def load_baselines():
+    if not baselines_path.exists():
+        return {}
+    with open(baselines_path) as baselines_file:
+        return json.load(baselines_file)
+
+
+# A fixed workload of interpreter and pandas work, timed to scale the baselines to the machine's current speed
+def calibration_workload():
+    total = 0
+    for i in range(100000):
+        total += i % 7
+    frame = pd.DataFrame({"key": np.arange(100000) % 100, "value": np.arange(100000)})
+    frame.groupby("key")["value"].sum()
+
+
+# Times a function on fresh inputs from make_inputs and returns the fastest run in milliseconds
+# The fastest run is the one least disturbed by other work on the machine, and like timeit runs are timed without garbage collection
+# Inputs are made outside of the measurement, since some transformations update their inputs in place
+def time_best_ms(function, make_inputs, runs):
+    durations_ms = []
+    for _ in range(runs):
+        inputs = make_inputs()
+        gc.collect()
+        gc.disable() # collections depend on what earlier tests left on the heap
+        try:
+            start = time.perf_counter()
+            function(*inputs)
+            durations_ms.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+
+    return round(min(durations_ms), 3)
+
+
+# Runs a transformation on fresh inputs from make_inputs
+# Returns its fastest time, the calibration time just before it and the peak memory it allocated
+def measure(transformation, make_inputs, runs):
+    transformation(*make_inputs()) # warm up caches and lazy imports
+    calibration_ms = time_best_ms(calibration_workload, tuple, runs)
+    best_ms = time_best_ms(transformation, make_inputs, runs)
+
+    inputs = make_inputs()
+    tracemalloc.start()
+    try:
+        transformation(*inputs)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"best_ms": best_ms, "calibration_ms": calibration_ms, "peak_bytes": peak_bytes}
+
+
+class PerformanceChecker:
+    def __init__(self, config):
+        self.update_baselines = config.getoption("--update-baselines")
+        self.time_threshold = config.getoption("--time-threshold")
+        self.memory_threshold = config.getoption("--memory-threshold")
+        self.runs = config.getoption("--runs")
+        self.baselines = load_baselines()
+        self.results = {}
+
+    # Measures a transformation and checks it against its baseline, or records it when updating baselines
+    def check(self, name, transformation, make_inputs):
+        result = measure(transformation, make_inputs, self.runs)
+        self.results[name] = result
+        print(f"{name}: {result['best_ms']} ms, {result['peak_bytes']} bytes peak")
+        if self.update_baselines:
+            return
+
+        baseline = self.baselines.get(name)
+        if baseline is None:
+            pytest.fail(f"No baseline for {name}, record one with --update-baselines")
+
+        expected_ms = baseline["best_ms"] * result["calibration_ms"] / baseline["calibration_ms"]
+        allowed_ms = max(expected_ms * self.time_threshold, expected_ms + time_slack_ms)
+        allowed_bytes = baseline["peak_bytes"] * self.memory_threshold
+        problems = []
+        if result["best_ms"] > allowed_ms:
+            problems.append(f"fastest {result['best_ms']} ms is over {allowed_ms:.3f} ms (baseline {baseline['best_ms']} ms, {expected_ms:.3f} ms at the machine's current speed)")
+        if result["peak_bytes"] > allowed_bytes:
+            problems.append(f"peak {result['peak_bytes']} bytes is over {allowed_bytes:.0f} bytes (baseline {baseline['peak_bytes']} bytes)")
+        if problems:
+            pytest.fail(f"{name} regressed: " + "; ".join(problems))
+
+    # Writes the recorded baselines, keeping the ones of transformations that were not run
+    def save(self):
+        if not self.update_baselines or not self.results:
+            return
+        baselines = load_baselines()
+        baselines.update(self.results)
+        with open(baselines_path, "w") as baselines_file:
+            json.dump(dict(sorted(baselines.items())), baselines_file, indent=4)
+            baselines_file.write("\n")
+
+
+@pytest.fixture(scope="session")
+def performance(request):
+    checker = PerformanceChecker(request.config)
+    yield checker
+    checker.save()
@@ -0,0 +1,143 @@
+import json
+import random
+import numpy as np
+import pandas as pd
+from pipeline_core.scd2_dimension import compute_row_hash
+
+########################### SUMMARY ###########################
+'''
+    Fixed synthetic inputs of the performance harness. Every
+    dataset is made from a fixed seed, so each run of the harness
+    measures the same data. Sizes are a busy collection cycle
+    scaled down so the whole harness runs in seconds.
+'''
+###############################################################
+
+seed = 20260111
+
+stream_file_count = 20
+streams_per_file = 1000
+duplicate_stream_share = 0.05 # streams collected by two functions, skipped the second time
+category_count = 3000
+current_user_count = 200000
+incoming_user_count = 10000
+igdb_game_count = 1500
+
+languages = ["en", "es", "ja", "ko", "de", "fr", "pt", "ru", ""]
+broadcaster_types = ["normal", "affiliate", "partner"]
+
+
+# Gets the streamers of every category, a few categories have most of the streamers like on Twitch
+def get_category_streamer_counts():
+    rng = np.random.default_rng(seed)
+    return np.minimum(rng.zipf(1.6, category_count), 15000)
+
+
+# Gets raw stream files as collected by get_raw_streams_data, as the JSON text read from S3
+# Streams are spread over the categories, so category names and languages repeat like in a real cycle
+def get_raw_stream_files():
+    rng = random.Random(seed)
+    raw_stream_files = []
+    stream_id = 40000000000
+    for _ in range(stream_file_count):
+        streams = []
+        for _ in range(streams_per_file):
+            if streams and rng.random() < duplicate_stream_share:
+                streams.append(dict(rng.choice(streams)))
+                continue
+            stream_id += 1
+            user_id = rng.randrange(1, 1000000000)
+            category_id = rng.randrange(1, category_count + 1)
+            streams.append({
+                "id": str(stream_id),
+                "user_id": str(user_id),
+                "user_login": f"user{user_id}",
+                "user_name": f"User{user_id}",
+                "game_id": str(category_id),
+                "game_name": f"Category {category_id}",
+                "title": f"Stream title {stream_id} with some words in it",
+                "viewer_count": rng.randrange(0, 5000),
+                "started_at": "2026-01-11T16:00:00Z",
+                "language": rng.choice(languages),
+                "thumbnail_url": f"https://static-cdn.jtvnw.net/previews-ttv/live_user_user{user_id}-{{width}}x{{height}}.jpg",
+                "is_mature": rng.random() < 0.2
+            })
+        raw_stream_files.append(json.dumps({"day_date_id": "20260111", "time_of_day_id": "1645", "data": streams}))
+
+    return raw_stream_files
+
+
+# Gets categories with their number of streamers, most popular first, as create_category_group_messages has them
+def get_weighted_categories():
+    streamer_counts = np.sort(get_category_streamer_counts())[::-1]
+    return pd.DataFrame({
+        "category_id": [str(category_id) for category_id in range(1, category_count + 1)],
+        "category_name": [f"Category {category_id}" for category_id in range(1, category_count + 1)],
+        "num_of_streamers": streamer_counts
+    })
+
+
+# Gets curated stream data with the streamers of every category
+def get_curated_streams():
+    streamer_counts = get_category_streamer_counts()
+    category_ids = np.repeat(np.arange(1, category_count + 1), streamer_counts)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "stream_id": np.arange(40000000000, 40000000000 + len(category_ids)),
+        "day_date_id": 20260111,
+        "time_of_day_id": 1645,
+        "user_id": rng.integers(1, 1000000000, len(category_ids)),
+        "category_id": rng.permutation(category_ids),
+        "language_id": "en",
+        "viewer_count": rng.integers(0, 5000, len(category_ids)),
+        "hours_watched": 0.25
+    })
+
+
+def get_user_df(user_ids, rng):
+    return pd.DataFrame({
+        "user_id": user_ids,
+        "user_name": [f"User{user_id}" for user_id in user_ids],
+        "login_name": [f"user{user_id}" for user_id in user_ids],
+        "broadcaster_type": rng.choice(broadcaster_types, len(user_ids))
+    })
+
+
+# Gets the current users dimension data and a batch of processed users, a third new and a fifth of the rest changed
+def get_user_dimension_data():
+    rng = np.random.default_rng(seed)
+    current_user_ids = np.sort(rng.choice(np.arange(1, 1000000000, 7), current_user_count, replace=False))
+    current_users_df = get_user_df(current_user_ids, rng)
+    current_users_df["row_hash"] = compute_row_hash(current_users_df, ["user_name", "login_name", "broadcaster_type"])
+    current_users_df["valid_from"] = "2026-01-10 16:45:00"
+
+    new_user_count = incoming_user_count // 3
+    known_user_ids = rng.choice(current_user_ids, incoming_user_count - new_user_count, replace=False)
+    new_user_ids = np.arange(3, 3 + 7 * new_user_count, 7) # current ids are all 1 more than a multiple of 7, these never are
+    incoming_users_df = get_user_df(np.concatenate([known_user_ids, new_user_ids]), rng)
+    known_users_df = current_users_df.set_index("user_id").loc[known_user_ids]
+    is_unchanged = rng.random(len(known_user_ids)) >= 0.2
+    incoming_users_df.loc[:len(known_user_ids) - 1, "broadcaster_type"] = np.where(is_unchanged, known_users_df["broadcaster_type"], "partner")
+    incoming_users_df["user_id"] = incoming_users_df["user_id"].astype(str)
+
+    return current_users_df, incoming_users_df
+
+
+# Gets curated category data and raw IGDB bridge data of the field, as the bridge processing functions read them
+def get_bridge_data(field):
+    rng = random.Random(seed)
+    categories = []
+    for category_id in range(1, category_count + 1):
+        igdb_id = str(rng.randrange(1, igdb_game_count + 1)) if rng.random() < 0.7 else "NA"
+        categories.append({"category_id": str(category_id), "category_name": f"Category {category_id}", "igdb_id": igdb_id})
+    category_df = pd.DataFrame(categories)
+
+    games = []
+    for igdb_id in range(1, igdb_game_count + 1):
+        game = {"id": igdb_id, "name": f"Game {igdb_id}"}
+        if rng.random() < 0.9: # some games have no data for the field
+            game[field] = rng.sample(range(1, 40), rng.randrange(1, 5))
+        games.append(game)
+    raw_bridge_data = {"day_date_id": "20260111", "time_of_day_id": "1645", "data": games}
+
+    return category_df, raw_bridge_data
@@ -0,0 +1,85 @@
+import json
+import pytest
+import synthetic_data
+from process_raw_streams_data import process_raw_stream_data
+from create_category_group_messages import split_categories_into_groups
+from get_category_popularity import get_category_popularity
+from pipeline_core.scd2_dimension import apply_scd2_changes
+from pipeline_core.dates import get_valid_from
+from pipeline_core.igdb_category_index import get_igdb_category_index, get_processed_bridge_df
+
+########################### SUMMARY ###########################
+'''
+    Times the core transformation of each function against the
+    synthetic data and checks it against its baseline, see
+    conftest.py. Each test also checks the size of the output,
+    so a transformation that gets faster by dropping data does
+    not pass.
+'''
+###############################################################
+
+
+stream_columns = ["id", "user_id", "user_login", "user_name", "game_id", "game_name", "title", "viewer_count", "started_at", "language", "thumbnail_url", "is_mature"]
+
+
+# Processes every raw stream file of a cycle, as the process_raw_streams_data handler does
+# Each file is parsed only when it is processed, so the memory measured is what the processed streams keep
+def process_raw_stream_files(raw_stream_files):
+    processed_stream_data_dict = {column: [] for column in stream_columns}
+    seen_stream_ids = set()
+    for raw_stream_file in raw_stream_files:
+        process_raw_stream_data(json.loads(raw_stream_file), processed_stream_data_dict, seen_stream_ids)
+
+    return processed_stream_data_dict
+
+
+def test_process_raw_stream_data(performance):
+    raw_stream_files = synthetic_data.get_raw_stream_files()
+    unique_stream_count = len({stream["id"] for raw_stream_file in raw_stream_files for stream in json.loads(raw_stream_file)["data"]})
+
+    performance.check("process_raw_stream_data", process_raw_stream_files, lambda: (raw_stream_files,))
+    assert len(process_raw_stream_files(raw_stream_files)["id"]) == unique_stream_count
+
+
+def test_split_categories_into_groups(performance):
+    weighted_category_df = synthetic_data.get_weighted_categories()
+
+    performance.check("split_categories_into_groups", split_categories_into_groups, lambda: (weighted_category_df,))
+    category_groups, _ = split_categories_into_groups(weighted_category_df)
+    assert sum(len(group) for group in category_groups) == len(weighted_category_df)
+
+
+def test_get_category_popularity(performance):
+    curated_stream_df = synthetic_data.get_curated_streams()
+
+    performance.check("get_category_popularity", get_category_popularity, lambda: (curated_stream_df,))
+    assert get_category_popularity(curated_stream_df)["num_of_streamers"].sum() == len(curated_stream_df)
+
+
+# The curate users function's new and changed user detection, which replaced add_new_user_data
+def test_apply_scd2_changes_users(performance):
+    current_users_df, incoming_users_df = synthetic_data.get_user_dimension_data()
+    attribute_columns = ["user_name", "login_name", "broadcaster_type"]
+    valid_from = get_valid_from("20260111", "1645")
+
+    # The current users are updated in place, so every run gets its own copy
+    make_inputs = lambda: (current_users_df.copy(), incoming_users_df, "user_id", attribute_columns, valid_from)
+    performance.check("apply_scd2_changes_users", apply_scd2_changes, make_inputs)
+    updated_users_df, history_df = apply_scd2_changes(*make_inputs())
+    new_user_count = len(updated_users_df) - len(current_users_df)
+    assert new_user_count == synthetic_data.incoming_user_count // 3
+    assert new_user_count < len(history_df) < len(incoming_users_df)
+
+
+# Category index and bridge rows of the genre and game mode bridge processing functions
+@pytest.mark.parametrize("field, id_column", [("genres", "genre_id"), ("game_modes", "game_mode_id")])
+def test_process_bridge_data(performance, field, id_column):
+    category_df, raw_bridge_data = synthetic_data.get_bridge_data(field)
+
+    def process_bridge_data(category_df, raw_bridge_data):
+        return get_processed_bridge_df(raw_bridge_data, get_igdb_category_index(category_df), field, id_column)
+
+    performance.check(f"process_{field}_bridge_data", process_bridge_data, lambda: (category_df, raw_bridge_data))
+    processed_bridge_df = process_bridge_data(category_df, raw_bridge_data)
+    assert set(processed_bridge_df.columns) == {"igdb_id", "category_id", "game_name", id_column}
+    assert len(processed_bridge_df) > len(raw_bridge_data["data"])
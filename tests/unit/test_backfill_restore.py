@@ -0,0 +1,91 @@
+import pytest
+import backfill_curated_layer
+from pipeline_core.partitions import DataPath, misc_bucket_name
+from pipeline_core.storage import LocalStorage
+
+########################### SUMMARY ###########################
+'''
+    Checks that restoring the constraints and indexes deferred
+    by a backfill can be run again after it failed partway,
+    without adding a constraint that is already there.
+'''
+###############################################################
+
+
+checkpoint_path = DataPath(misc_bucket_name, "backfill_data/backfill_checkpoint_20260111_20260111.json")
+
+
+# Database with the given constraints, name -> validated, that fails on the statements given
+class FakeConnection:
+    def __init__(self, constraints, failing_statement=None):
+        self.constraints = constraints
+        self.failing_statement = failing_statement
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.row = None
+
+    def execute(self, query, params=None):
+        if query.startswith("SELECT convalidated"):
+            constraint_name = params[1]
+            self.row = (self.conn.constraints[constraint_name],) if constraint_name in self.conn.constraints else None
+            return
+        if self.conn.failing_statement and self.conn.failing_statement in query:
+            raise RuntimeError("connection lost")
+        self.conn.statements.append(query)
+        constraint_name = query.split('"')[1]
+        self.conn.constraints[constraint_name] = "NOT VALID" not in query
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(backfill_curated_layer, "build_index_concurrently", lambda conn, index_name, definition: conn.statements.append(index_name))
+    monkeypatch.setattr(backfill_curated_layer, "create_streams_indexes", lambda conn: None)
+
+    return LocalStorage(tmp_path)
+
+
+def get_checkpoint():
+    return {
+        "deferred": {
+            "constraints": [
+                ["streams", "streams_pkey", "PRIMARY KEY (stream_id, day_date_id, time_of_day_id)"],
+                ["streams", "streams_day_date_id_fkey", "FOREIGN KEY (day_date_id) REFERENCES day_dates(day_date_id)"],
+                ["genre_bridge", "genre_bridge_genre_id_fkey", "FOREIGN KEY (genre_id) REFERENCES genres(genre_id)"]
+            ],
+            "indexes": [["streams_user_id_idx", "CREATE INDEX streams_user_id_idx ON public.streams USING btree (user_id)"]]
+        }
+    }
+
+
+def test_restore_resumes_after_failing_partway(storage):
+    checkpoint = get_checkpoint()
+    conn = FakeConnection({}, failing_statement="VALIDATE CONSTRAINT \"streams_day_date_id_fkey\"")
+
+    with pytest.raises(RuntimeError):
+        backfill_curated_layer.restore_constraints_and_indexes(conn, storage, checkpoint_path, checkpoint)
+    assert [constraint[1] for constraint in storage.read_json(checkpoint_path)["deferred"]["constraints"]] == ["streams_day_date_id_fkey", "genre_bridge_genre_id_fkey"]
+
+    # The rerun validates the foreign key added before the failure instead of adding it again
+    conn = FakeConnection(conn.constraints)
+    backfill_curated_layer.restore_constraints_and_indexes(conn, storage, checkpoint_path, storage.read_json(checkpoint_path))
+
+    assert conn.statements[0] == 'ALTER TABLE streams VALIDATE CONSTRAINT "streams_day_date_id_fkey";'
+    assert not any("streams_pkey" in statement or "ADD CONSTRAINT \"streams_day_date_id_fkey\"" in statement for statement in conn.statements)
+    assert conn.statements[-1] == "streams_user_id_idx"
+    assert storage.read_json(checkpoint_path)["deferred"] == {"constraints": [], "indexes": []}
@@ -0,0 +1,78 @@
+import json
+import base64
+import pytest
+import get_raw_category_data
+from pipeline_core.storage import LocalStorage
+from pipeline_core.twitch_api import PaginationCheckpoint
+
+########################### SUMMARY ###########################
+'''
+    Checks that the single sweep of "Get Top Games" gets every
+    category when a category moves up or down the ranking while
+    the pages are requested.
+'''
+###############################################################
+
+
+# Ranking served by the fake endpoint, with moves applied before given requests
+class FakeTopGames:
+    def __init__(self, category_count, moves=None):
+        self.ranking = [str(i) for i in range(category_count)]
+        self.moves = moves or {}
+        self.request_count = 0
+
+    def get_helix_page(self, url, headers, params, max_attempts=5):
+        if self.request_count in self.moves:
+            old_rank, new_rank = self.moves[self.request_count]
+            self.ranking.insert(new_rank, self.ranking.pop(old_rank))
+        self.request_count += 1
+
+        offset = json.loads(base64.b64decode(params["after"]))["s"] if params["after"] else 0
+        data = [{"id": category_id, "name": f"Category {category_id}"} for category_id in self.ranking[offset:offset + params["first"]]]
+        pagination = {}
+        if offset + params["first"] < len(self.ranking):
+            pagination["cursor"] = base64.b64encode(json.dumps({"s": offset + params["first"], "d": False, "t": True}, separators=(",", ":")).encode()).decode()
+
+        return {"data": data, "pagination": pagination}
+
+
+def get_snapshot_ids(tmp_path, monkeypatch, top_games):
+    monkeypatch.setattr(get_raw_category_data, "get_helix_page", top_games.get_helix_page)
+    raw_category_data = {"data": []}
+    checkpoint = PaginationCheckpoint(LocalStorage(tmp_path), "pagination_checkpoints/categories/")
+
+    get_raw_category_data.get_category_snapshot({}, raw_category_data, checkpoint)
+
+    category_ids = [category["id"] for category in raw_category_data["data"]]
+    assert len(category_ids) == len(set(category_ids))
+    return set(category_ids)
+
+
+def test_snapshot_without_drift_requests_each_page_once(tmp_path, monkeypatch):
+    top_games = FakeTopGames(450)
+
+    assert get_snapshot_ids(tmp_path, monkeypatch, top_games) == set(top_games.ranking)
+    assert top_games.request_count == 5
+
+
+# Category "20" drops from page 0 to page 3 after page 1 is requested, shifting the first category of page 2 onto page 1
+@pytest.mark.parametrize("moves", [{2: (20, 330)}, {2: (20, 330), 3: (30, 340)}, {1: (5, 150), 2: (6, 160)}])
+def test_snapshot_gets_categories_when_a_category_moves_down(tmp_path, monkeypatch, moves):
+    top_games = FakeTopGames(450, moves)
+
+    assert get_snapshot_ids(tmp_path, monkeypatch, top_games) == set(top_games.ranking)
+
+
+# Category "400" jumps from a page not requested yet onto a page already requested
+@pytest.mark.parametrize("moves", [{2: (400, 150)}, {2: (400, 10)}, {3: (400, 5), 4: (420, 250)}])
+def test_snapshot_gets_categories_when_a_category_moves_up(tmp_path, monkeypatch, moves):
+    top_games = FakeTopGames(450, moves)
+
+    assert get_snapshot_ids(tmp_path, monkeypatch, top_games) == set(top_games.ranking)
+
+
+def test_overlap_cursor_starts_one_category_earlier():
+    cursor = base64.b64encode(b'{"s":100,"d":false,"t":true}').decode()
+
+    assert base64.b64decode(get_raw_category_data.get_overlap_cursor(cursor)) == b'{"s":99,"d":false,"t":true}'
+    assert get_raw_category_data.get_overlap_cursor("not a cursor") is None
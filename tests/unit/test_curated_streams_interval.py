@@ -0,0 +1,61 @@
+import psycopg2
+import pytest
+import process_curated_streams_interval
+
+########################### SUMMARY ###########################
+'''
+    Checks that a failed database load of a curated streams
+    interval fails the invocation so it is retried, unless the
+    interval was already loaded by an earlier attempt.
+'''
+###############################################################
+
+
+class FakeConnection:
+    def __init__(self):
+        self.committed = False
+        self.rolled_back = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor()
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def close(self):
+        pass
+
+
+def use_database(monkeypatch, error):
+    conn = FakeConnection()
+    monkeypatch.setattr(process_curated_streams_interval, "get_db_connection", lambda: conn)
+
+    def insert_streams_from_csv(cursor, curated_stream_csv):
+        raise error
+    monkeypatch.setattr(process_curated_streams_interval, "insert_streams_from_csv", insert_streams_from_csv)
+
+    return conn
+
+
+def test_failed_load_is_rolled_back_and_raised(monkeypatch):
+    conn = use_database(monkeypatch, psycopg2.OperationalError("server closed the connection"))
+
+    with pytest.raises(psycopg2.OperationalError):
+        process_curated_streams_interval.insert_stream_data(b"stream_id\n1\n")
+    assert conn.rolled_back and not conn.committed and conn.closed
+
+
+def test_interval_already_loaded_is_skipped(monkeypatch):
+    conn = use_database(monkeypatch, psycopg2.errors.UniqueViolation("duplicate key value violates unique constraint \"streams_pkey\""))
+
+    process_curated_streams_interval.insert_stream_data(b"stream_id\n1\n")
+    assert conn.rolled_back and not conn.committed and conn.closed
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+import refresh_stale_dimension_data
+from pipeline_core.partitions import Partition, DataPath, curated_bucket_name, misc_bucket_name
+from pipeline_core.storage import LocalStorage, WriteConflictError, missing_version
+
+########################### SUMMARY ###########################
+'''
+    Checks that current dimension data rewritten by another
+    function between a read and a write is not overwritten,
+    such as users curated while stale users are refreshed.
+'''
+###############################################################
+
+
+current_users_path = DataPath(misc_bucket_name, "current_data/current_users.csv")
+partition = Partition("20260111", "1645")
+
+
+def get_users_df(users):
+    return pd.DataFrame({
+        "user_id": [user[0] for user in users],
+        "user_name": [user[1] for user in users],
+        "login_name": [user[1].lower() for user in users],
+        "broadcaster_type": [user[2] for user in users],
+        "row_hash": "",
+        "valid_from": ""
+    })
+
+
+def test_write_with_old_version_conflicts(tmp_path):
+    storage = LocalStorage(tmp_path)
+    path = DataPath(misc_bucket_name, "current_data/example.csv")
+    storage.put_bytes(b"a\n1\n", path, expected_version=missing_version)
+    _, version = storage.get_bytes_and_version(path)
+    storage.put_bytes(b"a\n2\n", path)
+
+    with pytest.raises(WriteConflictError):
+        storage.put_bytes(b"a\n3\n", path, expected_version=version)
+    with pytest.raises(WriteConflictError):
+        storage.put_bytes(b"a\n3\n", path, expected_version=missing_version)
+    assert storage.get_bytes(path) == b"a\n2\n"
+
+
+def test_refresh_keeps_users_curated_while_fetching(tmp_path):
+    storage = LocalStorage(tmp_path)
+    storage.write_csv(get_users_df([("1", "One", "normal"), ("2", "Two", "normal")]), current_users_path)
+
+    # The curate stage adds a user while the refresh is fetching from Twitch
+    def fetch_users(user_ids, headers, rate_budget):
+        storage.write_csv(get_users_df([("1", "One", "normal"), ("2", "Two", "normal"), ("3", "Three", "affiliate")]), current_users_path)
+        return get_users_df([("1", "One", "partner"), ("2", "Two", "normal")]).drop(columns=["row_hash", "valid_from"])
+
+    changed_users = refresh_stale_dimension_data.refresh_dimension(storage, "users", fetch_users, 10, set(), None, None, partition)
+
+    current_users_df = storage.read_csv(current_users_path, schema="current_users").set_index("user_id")
+    assert changed_users == 1
+    assert sorted(current_users_df.index) == ["1", "2", "3"]
+    assert current_users_df.loc["1", "broadcaster_type"] == "partner"
+    refreshed_df = storage.read_csv(DataPath.for_partition(curated_bucket_name, "curated_users_data", partition, suffix="_refresh"), schema="curated_users_data")
+    assert refreshed_df["user_id"].tolist() == ["1"]
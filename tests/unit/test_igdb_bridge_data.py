@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+import get_raw_igdb_bridge_data
+import process_raw_genre_bridge_data
+from pipeline_core.partitions import Partition, DataPath, raw_bucket_name, processed_bucket_name, curated_bucket_name
+from pipeline_core.storage import LocalStorage
+
+########################### SUMMARY ###########################
+'''
+    Checks that categories whose IGDB id changed get their
+    bridge data again, in files of their own that do not
+    replace the bridge data of the new categories of the same
+    interval.
+'''
+###############################################################
+
+
+partition = Partition("20260111", "1645")
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(tmp_path)
+    for module in [get_raw_igdb_bridge_data, process_raw_genre_bridge_data]:
+        monkeypatch.setattr(module, "storage", storage)
+    monkeypatch.setattr(get_raw_igdb_bridge_data, "make_wrapper", lambda: None)
+    games = {100: {"id": 100, "name": "Old Game", "genres": [5]}, 200: {"id": 200, "name": "New Game", "genres": [8, 9]}}
+    monkeypatch.setattr(get_raw_igdb_bridge_data, "get_raw_igdb_game_data", lambda wrapper, igdb_ids, fields: [games[igdb_id] for igdb_id in igdb_ids])
+
+    return storage
+
+
+def write_curated_categories(storage, categories, suffix=""):
+    categories_df = pd.DataFrame(categories, columns=["category_id", "category_name", "igdb_id"]).assign(valid_from="2026-01-11 16:45:00")
+    path = DataPath.for_partition(curated_bucket_name, "curated_categories_data", partition, suffix=suffix)
+    storage.write_csv(categories_df, path, schema="curated_categories_data")
+
+    return path
+
+
+def get_sns_event(path):
+    return {"Records": [{"Sns": {"Message": str({"Records": [{"s3": {"bucket": {"name": path.bucket_name}, "object": {"key": path.key}}}]})}}]}
+
+
+def test_changed_categories_are_linked_again_in_their_own_files(storage):
+    new_categories_path = write_curated_categories(storage, [("1", "Old Game", "100")])
+    changed_categories_path = write_curated_categories(storage, [("2", "Renamed", "200")], suffix="_changed")
+
+    get_raw_igdb_bridge_data.lambda_handler(get_sns_event(new_categories_path), None)
+    get_raw_igdb_bridge_data.lambda_handler(get_sns_event(changed_categories_path), None)
+
+    raw_changed_path = DataPath.for_partition(raw_bucket_name, "raw_genre_bridge_data", partition, suffix="_changed", extension="json")
+    assert [game["id"] for game in storage.read_json(raw_changed_path)["data"]] == [200]
+    raw_new_path = DataPath.for_partition(raw_bucket_name, "raw_genre_bridge_data", partition, extension="json")
+    assert [game["id"] for game in storage.read_json(raw_new_path)["data"]] == [100]
+
+    process_raw_genre_bridge_data.lambda_handler({"Records": [{"s3": {"bucket": {"name": raw_bucket_name}, "object": {"key": raw_changed_path.key}}}]}, None)
+
+    processed_df = storage.read_csv(DataPath.for_partition(processed_bucket_name, "processed_genre_bridge_data", partition, suffix="_changed"), schema="processed_genre_bridge_data")
+    assert list(zip(processed_df["category_id"], processed_df["genre_id"])) == [("2", "8"), ("2", "9")]
+
+
+def test_suffix_of_data_paths():
+    assert DataPath.for_partition(curated_bucket_name, "curated_categories_data", partition).suffix == ""
+    assert DataPath.for_partition(curated_bucket_name, "curated_categories_data", partition, suffix="_refresh").suffix == "_refresh"
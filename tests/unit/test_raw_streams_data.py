@@ -0,0 +1,79 @@
+import pytest
+import get_raw_streams_data
+from pipeline_core.partitions import raw_bucket_name
+from pipeline_core.storage import LocalStorage
+
+########################### SUMMARY ###########################
+'''
+    Checks that an invocation retried after it uploaded its data
+    and handed off the rest of its batches overwrites the files
+    it uploaded and does not send the continuation messages
+    again.
+'''
+###############################################################
+
+
+# Has time for the given number of pages, then is about to time out
+class FakeContext:
+    def __init__(self, page_count):
+        self.page_count = page_count
+
+    def get_remaining_time_in_millis(self):
+        self.page_count -= 1
+        return 900000 if self.page_count >= 0 else 0
+
+
+# Queue whose message deletes fail until it is told otherwise
+class FakeSQS:
+    def __init__(self):
+        self.sent_messages = []
+        self.fail_deletes = True
+
+    def send_message(self, QueueUrl, MessageBody, MessageAttributes):
+        self.sent_messages.append((MessageBody, MessageAttributes))
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        if self.fail_deletes:
+            raise RuntimeError("connection lost")
+
+
+def get_helix_page(url, headers, params):
+    page = int(params["after"]) if params["after"] else 0
+    data = [{"id": f"{params['game_id'][0]}_{page}"}]
+
+    return {"data": data, "pagination": {"cursor": str(page + 1)} if page < 2 else {}}
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(tmp_path)
+    monkeypatch.setattr(get_raw_streams_data, "storage", storage)
+    monkeypatch.setattr(get_raw_streams_data, "get_helix_page", get_helix_page)
+    monkeypatch.setattr(get_raw_streams_data, "get_twitch_headers", lambda: {})
+
+    return storage
+
+
+def get_event():
+    attributes = {"day_date_id": {"stringValue": "20260111"}, "time_of_day_id": {"stringValue": "1645"}}
+    return {"Records": [{"body": str([str(i) for i in range(150)]), "messageAttributes": attributes, "receiptHandle": "handle"}]}
+
+
+def test_retry_after_handing_off_overwrites_its_files_and_sends_nothing(storage, monkeypatch):
+    sqs_client = FakeSQS()
+    monkeypatch.setattr(get_raw_streams_data, "sqs_client", sqs_client)
+
+    with pytest.raises(RuntimeError):
+        get_raw_streams_data.lambda_handler(get_event(), FakeContext(page_count=4))
+    raw_paths = storage.list_paths(raw_bucket_name, "raw_streams_data/20260111/1645/")
+    uploaded_data = [storage.read_json(path)["data"] for path in raw_paths]
+    assert len(sqs_client.sent_messages) == 1
+
+    # The retry has time for every page, but the rest of the interrupted batch belongs to the continuation
+    sqs_client.fail_deletes = False
+    get_raw_streams_data.lambda_handler(get_event(), FakeContext(page_count=100))
+
+    assert storage.list_paths(raw_bucket_name, "raw_streams_data/20260111/1645/") == raw_paths
+    assert [storage.read_json(path)["data"] for path in raw_paths] == uploaded_data
+    assert len(sqs_client.sent_messages) == 1
+    assert sqs_client.sent_messages[0][1]["cursor"]["StringValue"] == "1"
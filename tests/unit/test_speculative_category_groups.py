@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+import send_speculative_category_groups
+from create_category_group_messages import category_popularity_path, previous_categories_path
+from pipeline_core.storage import LocalStorage
+
+########################### SUMMARY ###########################
+'''
+    Checks that the popularity data used for the speculative
+    category groups is kept when sending them fails, so the
+    retried run weights the groups with it again.
+'''
+###############################################################
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(tmp_path)
+    monkeypatch.setattr(send_speculative_category_groups, "storage", storage)
+    monkeypatch.setattr(send_speculative_category_groups, "get_current_partition", lambda storage: ("20260111", "1645"))
+    storage.write_csv(pd.DataFrame({"category_id": ["1", "2"], "category_name": ["One", "Two"]}), previous_categories_path, schema="category_ids")
+    storage.write_csv(pd.DataFrame({"category_id": ["1", "2"], "num_of_streamers": [40.0, 2.0]}), category_popularity_path, schema="category_popularity_data")
+
+    return storage
+
+
+def test_popularity_data_is_kept_until_the_groups_are_sent(storage, monkeypatch):
+    def send_SQS_messages(category_groups, day_date_id, time_of_day_id):
+        raise RuntimeError("connection lost")
+    monkeypatch.setattr(send_speculative_category_groups, "send_SQS_messages", send_SQS_messages)
+
+    with pytest.raises(RuntimeError):
+        send_speculative_category_groups.lambda_handler({}, None)
+    assert storage.exists(category_popularity_path)
+
+    sent_groups = []
+    monkeypatch.setattr(send_speculative_category_groups, "send_SQS_messages", lambda category_groups, day_date_id, time_of_day_id: sent_groups.extend(category_groups))
+    send_speculative_category_groups.lambda_handler({}, None)
+
+    assert sorted(category_id for group in sent_groups for category_id in group) == ["1", "2"]
+    assert not storage.exists(category_popularity_path)
@@ -0,0 +1,89 @@
+import pytest
+import requests
+import get_raw_streams_data
+from pipeline_core import twitch_api
+from pipeline_core.twitch_api import HelixRateBudget, PaginationCheckpoint, get_helix_batch, throttled_wait_seconds
+from pipeline_core.storage import LocalStorage
+
+########################### SUMMARY ###########################
+'''
+    Checks that a Helix batch throttled without rate limit
+    headers waits before it is retried, and that batches and
+    pages give up after too many 429 responses instead of
+    retrying until the function times out. A retried invocation
+    continues from the pages saved before giving up.
+'''
+###############################################################
+
+
+users_url = "https://api.twitch.tv/helix/users"
+
+
+class FakeContext:
+    def get_remaining_time_in_millis(self):
+        return 900000
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, cursor=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.text = ""
+        self.data = data
+        self.cursor = cursor
+
+    def json(self):
+        return {"data": self.data, "pagination": {} if self.cursor is None else {"cursor": self.cursor}}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(twitch_api.time, "sleep", sleeps.append)
+
+    return sleeps
+
+
+def use_responses(monkeypatch, responses):
+    responses = iter(responses)
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: next(responses))
+
+
+def test_throttled_batch_waits_before_retrying(monkeypatch, sleeps):
+    use_responses(monkeypatch, [FakeResponse(429), FakeResponse(200, [{"id": "1"}])])
+
+    data = get_helix_batch(users_url, {"id": ["1"]}, {}, HelixRateBudget())
+
+    assert data == [{"id": "1"}]
+    assert len(sleeps) == 1
+    assert sleeps[0] >= throttled_wait_seconds
+
+
+def test_batch_throttled_too_many_times_fails(monkeypatch, sleeps):
+    use_responses(monkeypatch, [FakeResponse(429)] * 3)
+
+    with pytest.raises(RuntimeError):
+        get_helix_batch(users_url, {"id": ["1"]}, {}, HelixRateBudget(), max_throttled_attempts=3)
+    assert len(sleeps) == 2
+
+
+def test_throttled_page_gives_up_and_resumes_from_checkpoint(tmp_path, monkeypatch, sleeps):
+    checkpoint = PaginationCheckpoint(LocalStorage(tmp_path), "pagination_checkpoints/streams/example/")
+    use_responses(monkeypatch, [FakeResponse(200, [{"id": "1"}], "page_2")] + [FakeResponse(429)] * twitch_api.max_throttled_attempts)
+
+    with pytest.raises(RuntimeError):
+        get_raw_streams_data.get_data_from_API({"data": []}, ["33214"], {}, FakeContext(), checkpoint)
+    assert len(sleeps) == twitch_api.max_throttled_attempts - 1
+
+    # The retried invocation only requests the page that was throttled
+    requested_cursors = []
+
+    def get(url, headers, params, timeout):
+        requested_cursors.append(params["after"])
+        return FakeResponse(200, [{"id": "2"}])
+    monkeypatch.setattr(requests, "get", get)
+    raw_stream_data = {"data": []}
+
+    assert get_raw_streams_data.get_data_from_API(raw_stream_data, ["33214"], {}, FakeContext(), PaginationCheckpoint(LocalStorage(tmp_path), "pagination_checkpoints/streams/example/")) is None
+    assert requested_cursors == ["page_2"]
+    assert raw_stream_data["data"] == [{"id": "1"}, {"id": "2"}]
@@ -0,0 +1,59 @@
+import io
+import numpy as np
+import pytest
+import get_raw_users_data
+import process_raw_users_data
+from pipeline_core.partitions import DataPath, raw_bucket_name, processed_bucket_name
+from pipeline_core.storage import LocalStorage
+from pipeline_core.schemas import get_columns
+
+########################### SUMMARY ###########################
+'''
+    Checks that a cycle without new users does not upload raw
+    user data, and that raw user data without users is
+    processed without failing.
+'''
+###############################################################
+
+
+raw_users_path = DataPath(raw_bucket_name, "raw_users_data/20260111/raw_users_data_20260111_1645.json")
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(tmp_path)
+    monkeypatch.setattr(process_raw_users_data, "storage", storage)
+
+    return storage
+
+
+def save_known_user_ids(storage, user_ids):
+    buffer = io.BytesIO()
+    np.save(buffer, np.array(sorted(user_ids), dtype=np.uint64))
+    storage.put_bytes(buffer.getvalue(), get_raw_users_data.known_user_ids_path)
+
+
+def test_no_new_users_uploads_nothing(storage):
+    save_known_user_ids(storage, [11, 22, 33])
+
+    get_raw_users_data.get_new_users_data({}, storage, ["22", "33"], "20260111", "1645")
+
+    assert not storage.exists(raw_users_path)
+    assert storage.list_paths(raw_bucket_name, "") == []
+
+
+def test_get_processed_user_rows_without_users():
+    columns, processed_rows = process_raw_users_data.get_processed_user_rows({"data": []})
+
+    assert columns == get_columns("processed_users_data")
+    assert processed_rows == []
+
+
+def test_processing_raw_data_without_users_uploads_nothing(storage):
+    storage.write_json({"day_date_id": "20260111", "time_of_day_id": "1645", "data": []}, raw_users_path)
+    event = {"Records": [{"s3": {"bucket": {"name": raw_bucket_name}, "object": {"key": raw_users_path.key}}}]}
+
+    response = process_raw_users_data.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert storage.list_paths(processed_bucket_name, "") == []